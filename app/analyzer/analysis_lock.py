@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from redis.asyncio import Redis
+from app.logger import logger
+
+# Renewing and releasing only touch the lock while it still holds the caller's token, so a
+# run whose lock lapsed can never extend or free the lock of the run that took over.
+_EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class AnalysisLock:
+    """Per-document Redis lock, so at most one analysis of a document runs at a time.
+
+    The task that starts an analysis holds the lock under the run's token, renewing it
+    every third of `ttl_seconds` while it works, so the lock lapses soon after its
+    worker dies instead of blocking the document's next delivery. A fanned-out
+    document's lock is handed to its chord: each chunk task renews it for a slice
+    deadline, and the chord's callback releases it.
+    """
+
+    def __init__(self, redis: Redis, ttl_seconds: int):
+        self.redis = redis
+        self.ttl_ms = ttl_seconds * 1000
+        self._extend = redis.register_script(_EXTEND_SCRIPT)
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    @staticmethod
+    def key(document_id: int) -> str:
+        return f"analysis_lock:{document_id}"
+
+    async def acquire(self, document_id: int, token: str) -> bool:
+        """Takes the lock if no run holds it, not even this one: a redelivered message of a
+        running analysis must not start it again."""
+        return bool(await self.redis.set(self.key(document_id), token, nx=True, px=self.ttl_ms))
+
+    async def extend(self, document_id: int, token: str,
+                     ttl_seconds: Optional[int] = None) -> bool:
+        """Renews the lock for `ttl_seconds`, by default the lock's TTL, if `token` holds it."""
+        ttl_ms = self.ttl_ms if ttl_seconds is None else ttl_seconds * 1000
+        return bool(await self._extend(keys=[self.key(document_id)], args=[token, ttl_ms]))
+
+    async def release(self, document_id: int, token: str) -> None:
+        await self._release(keys=[self.key(document_id)], args=[token])
+
+    async def held(self, document_id: int) -> bool:
+        return bool(await self.redis.exists(self.key(document_id)))
+
+    @asynccontextmanager
+    async def kept(self, document_id: int, token: str, ttl_seconds: Optional[int] = None):
+        """Renews the lock for `ttl_seconds` now and in the background while the block runs;
+        does not release it."""
+        interval = (self.ttl_ms / 1000 if ttl_seconds is None else ttl_seconds) / 3
+
+        async def renew() -> bool:
+            if await self.extend(document_id, token, ttl_seconds):
+                return True
+            logger.warning(f"Lost the analysis lock of document {document_id}")
+            return False
+
+        async def keep_renewing():
+            while True:
+                await asyncio.sleep(interval)
+                if not await renew():
+                    return
+
+        await renew()
+        renewal = asyncio.create_task(keep_renewing())
+        try:
+            yield
+        finally:
+            renewal.cancel()
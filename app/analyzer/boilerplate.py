@@ -0,0 +1,181 @@
+import math
+import re
+from collections import Counter, defaultdict
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.analyzer.chunk_packer import estimate_tokens
+from app.analyzer.layout import LinePosition, PageLayout
+from app.logger import logger
+
+_NUMBER_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def line_signature(text: str) -> str:
+    """Line text with numbers masked, so "Page 3 of 9" and "Page 4 of 9" match."""
+    return _SPACE_RE.sub(" ", _NUMBER_RE.sub("#", text)).strip().lower()
+
+
+class _ChunkTally:
+    """Chunks a document needs at `chunk_tokens` each, split at headings like the parser
+    splits chapters, or per page when it has no headings.
+
+    As in the parser, a chapter shorter than `min_chapter_chars` is carried into the next.
+    """
+
+    def __init__(self, chunk_tokens: int, min_chapter_chars: int):
+        self.chunk_tokens = chunk_tokens
+        self.min_chapter_chars = min_chapter_chars
+        self.has_headings = False
+        self.chapter_chunks = 0
+        self.chapter_tokens = 0
+        self.chapter_chars = 0
+        self.page_chunks = 0
+        self.page_tokens = 0
+
+    def _chunks(self, tokens: int) -> int:
+        return math.ceil(tokens / self.chunk_tokens)
+
+    def add_line(self, text: str, tokens: int, heading: bool) -> None:
+        if heading:
+            self.has_headings = True
+            if self.chapter_chars >= self.min_chapter_chars:
+                self.chapter_chunks += self._chunks(self.chapter_tokens)
+                self.chapter_tokens = 0
+                self.chapter_chars = 0
+        else:
+            self.chapter_tokens += tokens
+            self.chapter_chars += len(text) + 1
+        self.page_tokens += tokens
+
+    def end_page(self) -> None:
+        self.page_chunks += self._chunks(self.page_tokens)
+        self.page_tokens = 0
+
+    def total(self) -> int:
+        if self.has_headings:
+            return self.chapter_chunks + self._chunks(self.chapter_tokens)
+        return self.page_chunks
+
+
+class BoilerplateFilter:
+    """Strips running headers, footers, page numbers and banners before headings are detected.
+
+    Learns from the first `sample_pages` pages which lines in the top or bottom
+    `margin` of the page recur with the same text, numbers masked, at the same
+    vertical position (within `tolerance` of the page height) on at least
+    `min_share` of them and on two pages or more. Those lines are then dropped
+    from every page. Body text is never a candidate, so numbered clauses that
+    happen to line up across pages are kept. Pages are only buffered while
+    sampling, so parsing still streams.
+
+    With `estimate_chunks`, the chunks saved are estimated too, which takes a token
+    count and a heading match of every line of the document.
+    """
+
+    def __init__(self, sample_pages: int = 8, min_share: float = 0.5, margin: float = 0.12,
+                 tolerance: float = 0.01, chunk_tokens: int = 2000,
+                 estimate_chunks: bool = False):
+        self.sample_pages = sample_pages
+        self.min_share = min_share
+        self.margin = margin
+        self.tolerance = tolerance
+        self.chunk_tokens = chunk_tokens
+        self.estimate_chunks = estimate_chunks
+
+    @property
+    def config_fingerprint(self) -> list:
+        return [self.sample_pages, self.min_share, self.margin, self.tolerance]
+
+    def _is_candidate(self, text: str, position: LinePosition) -> bool:
+        return bool(text) and position is not None and (
+            position[1] < self.margin or position[1] > 1 - self.margin)
+
+    def learn(self, pages: List[PageLayout]) -> Dict[str, List[float]]:
+        """Returns the vertical positions of repeated lines, keyed by line signature."""
+        seen = defaultdict(list)
+        for page in pages:
+            for text, position in zip(page.lines, page.positions):
+                if self._is_candidate(text, position):
+                    seen[line_signature(text)].append((position[1], page.number))
+
+        min_pages = max(2, math.ceil(self.min_share * len(pages)))
+        repeated = {}
+        for signature, occurrences in seen.items():
+            positions = [y for y, _ in occurrences
+                         if len({number for other_y, number in occurrences
+                                 if abs(other_y - y) <= self.tolerance}) >= min_pages]
+            if positions:
+                repeated[signature] = positions
+        return repeated
+
+    def strip(self, pages: Iterable[PageLayout], stats: Optional[Counter] = None,
+              is_heading: Optional[Callable[[str], bool]] = None,
+              min_chapter_chars: int = 0) -> Iterator[PageLayout]:
+        """Yields pages without their repeated lines, counting what was removed in `stats`.
+
+        With `estimate_chunks`, `boilerplate_chunks` estimates the chunks saved,
+        from the token counts of the document split at `is_heading` lines with and
+        without the stripped ones: a running header the parser takes for a heading
+        starts a chapter, and so at least one chunk, on every page.
+        """
+        stats = stats if stats is not None else Counter()
+        is_heading = is_heading or (lambda text: False)
+        plain = _ChunkTally(self.chunk_tokens, min_chapter_chars)
+        stripped = _ChunkTally(self.chunk_tokens, min_chapter_chars)
+        pages = iter(pages)
+        sample = list(islice(pages, self.sample_pages))
+        repeated = self.learn(sample)
+        if not repeated:
+            # Nothing to strip, so there's nothing to estimate either
+            yield from chain(sample, pages)
+            return
+        for page in chain(sample, pages):
+            kept, keep = self._strip_page(page, repeated, stats)
+            if self.estimate_chunks:
+                self._tally(page, keep, is_heading, plain, stripped)
+            yield kept
+
+        if self.estimate_chunks:
+            stats["boilerplate_chunks"] += plain.total() - stripped.total()
+        if stats["boilerplate_lines"]:
+            chunks = (f", ~{stats['boilerplate_chunks']} chunks" if self.estimate_chunks
+                      else "")
+            logger.info(f"Stripped {stats['boilerplate_lines']} repeated header, footer and "
+                        f"page number lines: {stats['boilerplate_chars']} characters{chunks}")
+
+    def _is_repeated(self, repeated: Dict[str, List[float]], text: str, y: float) -> bool:
+        positions = repeated.get(line_signature(text), ())
+        return any(abs(y - other_y) <= self.tolerance for other_y in positions)
+
+    def _strip_page(self, page: PageLayout, repeated: Dict[str, List[float]],
+                    stats: Counter) -> Tuple[PageLayout, List[bool]]:
+        """Returns the page without repeated lines, and whether each line was kept."""
+        if not page.positions:
+            return page, [True] * len(page.lines)
+        keep = [not (self._is_candidate(text, position)
+                     and self._is_repeated(repeated, text, position[1]))
+                for text, position in zip(page.lines, page.positions)]
+        if all(keep):
+            return page, keep
+
+        for text, kept in zip(page.lines, keep):
+            if not kept:
+                stats["boilerplate_lines"] += 1
+                stats["boilerplate_chars"] += len(text)
+        return page._replace(
+            lines=[text for text, kept in zip(page.lines, keep) if kept],
+            positions=[position for position, kept in zip(page.positions, keep) if kept],
+            styles=[style for style, kept in zip(page.styles, keep) if kept]), keep
+
+    @staticmethod
+    def _tally(page: PageLayout, keep: List[bool], is_heading: Callable[[str], bool],
+               plain: _ChunkTally, stripped: _ChunkTally) -> None:
+        for text, kept in zip(page.lines, keep):
+            tokens = estimate_tokens(text)
+            heading = is_heading(text)
+            plain.add_line(text, tokens, heading)
+            if kept:
+                stripped.add_line(text, tokens, heading)
+        plain.end_page()
+        stripped.end_page()
@@ -0,0 +1,43 @@
+from typing import Optional
+from app.analyzer import schemas
+from app.analyzer.concurrency_limiter import ConcurrencyLimiter
+from app.analyzer.llm_backends import ChatModel
+from app.analyzer.rate_limiter import RateLimiter
+from app.analyzer.templates import prompt_template
+from app.enums import RiskLevel
+
+# Tiers recorded on stored results
+TRIAGE_TIER = "triage"
+PRIMARY_TIER = "primary"
+
+_RISK_ORDER = {level: rank for rank, level in enumerate(RiskLevel)}
+
+
+class TriageTier:
+    """Fast, cheap model that analyzes every chunk before the primary model.
+
+    Its answer is final unless the clause is rated `escalate_at` or riskier, or the
+    model's confidence is below `min_confidence`; those chunks, and chunks whose
+    triage failed, go on to the primary model. The tier has its own concurrency
+    pool and rate limiter, so triage traffic never takes the primary model's slots.
+    """
+
+    def __init__(self, llm: ChatModel, limiter: ConcurrencyLimiter,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 escalate_at: RiskLevel = RiskLevel.MEDIUM, min_confidence: float = 0.7):
+        self.llm = llm
+        self.chain = prompt_template | llm.with_structured_output(schemas.TriageAnalysis,
+                                                                  include_raw=True)
+        self.limiter = limiter
+        self.rate_limiter = rate_limiter
+        self.escalate_at = escalate_at
+        self.min_confidence = min_confidence
+
+    def should_escalate(self, triaged: schemas.TriageAnalysis) -> bool:
+        return (_RISK_ORDER[triaged.risk_level] >= _RISK_ORDER[self.escalate_at]
+                or triaged.confidence < self.min_confidence)
+
+    @staticmethod
+    def to_result(triaged: schemas.TriageAnalysis) -> schemas.ClauseAnalysis:
+        return schemas.ClauseAnalysis.model_validate(
+            {**triaged.model_dump(exclude={"confidence"}), "tier": TRIAGE_TIER})
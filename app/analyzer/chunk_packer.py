@@ -0,0 +1,101 @@
+import math
+import re
+from typing import Iterable, Iterator, List, Tuple
+from app.analyzer import schemas
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?;])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximates the model's tokenizer without a network round trip.
+
+    Punctuation marks count as one token and words as one token per four characters,
+    which tracks SentencePiece counts on English legal text closely enough for budgeting.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_RE.findall(text))
+
+
+class ChunkPacker:
+    """Sizes LLM requests in tokens.
+
+    `split` cuts oversized text on sentence boundaries, carrying up to
+    `overlap_tokens` of trailing sentences into the next piece for context.
+    `pack` groups consecutive small chunks into one request up to the same budget,
+    so every chunk keeps its own chapter metadata.
+    """
+
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def split(self, text: str) -> List[Tuple[str, int]]:
+        """Returns (text, token estimate) pieces of at most `max_tokens` each."""
+        text = text.strip()
+        if not text:
+            return []
+        tokens = estimate_tokens(text)
+        if tokens <= self.max_tokens:
+            return [(text, tokens)]
+
+        pieces = []
+        for sentence in _SENTENCE_BOUNDARY_RE.split(text):
+            sentence_tokens = estimate_tokens(sentence)
+            if sentence_tokens > self.max_tokens:
+                pieces.extend(self._split_words(sentence))
+            elif sentence_tokens:
+                pieces.append((sentence, sentence_tokens))
+        return self._merge(pieces)
+
+    def _split_words(self, sentence: str) -> List[Tuple[str, int]]:
+        """Last resort for a single sentence above the budget."""
+        return self._merge([(word, estimate_tokens(word)) for word in sentence.split()],
+                           overlap=False)
+
+    def _merge(self, pieces: List[Tuple[str, int]],
+               overlap: bool = True) -> List[Tuple[str, int]]:
+        chunks = []
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > self.max_tokens:
+                chunks.append((" ".join(text for text, _ in current), current_tokens))
+                current = self._overlap_tail(current, piece_tokens) if overlap else []
+                current_tokens = sum(tokens for _, tokens in current)
+            current.append((piece, piece_tokens))
+            current_tokens += piece_tokens
+        if current:
+            chunks.append((" ".join(text for text, _ in current), current_tokens))
+        return chunks
+
+    def _overlap_tail(self, pieces: List[Tuple[str, int]],
+                      next_tokens: int) -> List[Tuple[str, int]]:
+        budget = min(self.overlap_tokens, self.max_tokens - next_tokens)
+        tail = []
+        for piece, piece_tokens in reversed(pieces):
+            if piece_tokens > budget:
+                break
+            tail.insert(0, (piece, piece_tokens))
+            budget -= piece_tokens
+        return tail
+
+    def pack(self, chunks: Iterable[schemas.DocumentChunk], max_items: int,
+             max_item_tokens: int) -> Iterator[List[schemas.DocumentChunk]]:
+        """Groups consecutive chunks of at most `max_item_tokens` into shared requests.
+
+        Groups are yielded as soon as they are complete, so packing can run on a stream.
+        """
+        group: List[schemas.DocumentChunk] = []
+        group_tokens = 0
+        for chunk in chunks:
+            if max_items < 2 or chunk.tokens > max_item_tokens:
+                yield [chunk]
+                continue
+            if group and (len(group) == max_items
+                          or group_tokens + chunk.tokens > self.max_tokens):
+                yield group
+                group, group_tokens = [], 0
+            group.append(chunk)
+            group_tokens += chunk.tokens
+        if group:
+            yield group
@@ -0,0 +1,47 @@
+import uuid
+from typing import Iterable, List
+from redis.asyncio import Redis
+from app.analyzer import schemas
+
+
+class ChunkStoreMissError(LookupError):
+    """The chunks of a fanned-out document expired or were deleted before being analyzed."""
+
+
+class ChunkStore:
+    """Chunks of a fanned-out document in Redis, so broker messages carry a reference only.
+
+    A document's chunks are stored under one hash, by position, and analysis tasks
+    receive the key and a range of positions. Chapter text is dropped from the
+    stored chunks: results only need the chapter's name and pages. Entries expire
+    after `ttl_seconds` in case the document's final task never runs.
+    """
+
+    def __init__(self, redis: Redis, ttl_seconds: int):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+
+    async def put(self, document_id: int, chunks: Iterable[schemas.DocumentChunk]) -> str:
+        key = f"chunks:{document_id}:{uuid.uuid4().hex}"
+        mapping = {}
+        for position, chunk in enumerate(chunks):
+            if chunk.chapter is not None:
+                chunk = chunk.model_copy(
+                    update={"chapter": chunk.chapter.model_copy(update={"chapter_text": ""})})
+            mapping[position] = chunk.model_dump_json()
+        if mapping:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+        return key
+
+    async def get(self, key: str, start: int, stop: int) -> List[schemas.DocumentChunk]:
+        """Chunks at positions `start` to `stop`, exclusive."""
+        data = await self.redis.hmget(key, list(range(start, stop)))
+        if None in data:
+            raise ChunkStoreMissError(f"Chunks {start}-{stop} of {key} are no longer stored")
+        return [schemas.DocumentChunk.model_validate_json(item) for item in data]
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(key)
@@ -1,22 +1,138 @@
 import asyncio
 import logging
-from typing import List, Awaitable, Any
+from contextvars import ContextVar
+from typing import Dict, List, Awaitable, Any
+from google.api_core import exceptions as google_exceptions
 
 logger = logging.getLogger(__name__)
 
+# Errors that mean the backend is saturated, as opposed to a bad request
+OVERLOAD_ERRORS = (
+    TimeoutError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Checks the whole cause chain, since retry wrappers re-raise from the original error."""
+    while error is not None:
+        if isinstance(error, OVERLOAD_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
 
 class ConcurrencyLimiter:
     def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
         self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
 
     async def limit(self, task: Awaitable) -> Any:
         async with self.semaphore:
+            self.in_flight += 1
             try:
                 return await task
             except Exception as e:
                 logger.error(f"Task failed with error: {e}")
                 return e
+            finally:
+                self.in_flight -= 1
+
+    def observe(self, error: BaseException) -> None:
+        """Reports a failed attempt inside a running task; the fixed limiter ignores it."""
 
     async def execute(self, tasks: List[Awaitable]) -> List[Any]:
         wrapped_tasks = [self.limit(task) for task in tasks]
         return await asyncio.gather(*wrapped_tasks)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """Concurrency limiter whose window follows the backend's capacity (AIMD).
+
+    Each successful task widens the window by `increase / window`, so a full window
+    of successes adds `increase`. An overload error (throttling or timeout) shrinks it
+    by `decrease_factor`, at most once per window: errors from tasks started before
+    the last cut are ignored, because the cut already accounted for them.
+    The window stays between `min_concurrent` and the hard `max_concurrent` ceiling.
+
+    Tasks that retry internally should report each failed attempt with `observe`,
+    otherwise throttling that a retry recovered from goes unnoticed.
+    """
+
+    def __init__(self, max_concurrent: int, initial_concurrent: int = 1,
+                 min_concurrent: int = 1, increase: float = 1.0, decrease_factor: float = 0.5):
+        self.max_concurrent = max_concurrent
+        self.min_concurrent = min_concurrent
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.window = float(min(max(initial_concurrent, min_concurrent), max_concurrent))
+        self.in_flight = 0
+        self.cuts = 0
+        self._generation = 0
+        # Generation in which the current task was started, visible to `observe`
+        self._started_in: ContextVar[int] = ContextVar(f"started_in_{id(self)}")
+        self._condition = asyncio.Condition()
+
+    async def limit(self, task: Awaitable) -> Any:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.window))
+            self.in_flight += 1
+        generation = self._generation
+        token = self._started_in.set(generation)
+        completed = False
+        try:
+            try:
+                result = await task
+            except Exception as e:
+                logger.error(f"Task failed with error: {e}")
+                result = e
+            completed = True
+        finally:
+            self._started_in.reset(token)
+            # A cancelled task frees its slot too, but says nothing about the backend
+            async with self._condition:
+                self.in_flight -= 1
+                if completed and isinstance(result, Exception):
+                    self._observe(result, generation)
+                elif completed:
+                    self._widen()
+                self._condition.notify_all()
+        return result
+
+    def observe(self, error: BaseException) -> None:
+        self._observe(error, self._started_in.get(self._generation))
+
+    def _widen(self) -> None:
+        previous = int(self.window)
+        self.window = min(self.window + self.increase / self.window, self.max_concurrent)
+        if int(self.window) > previous:
+            logger.info(f"Concurrency window widened to {int(self.window)} "
+                        f"({self.in_flight} in flight)")
+
+    def _observe(self, error: BaseException, generation: int) -> None:
+        if not is_overload_error(error) or generation != self._generation:
+            return
+        self._generation += 1
+        self.cuts += 1
+        self.window = max(self.window * self.decrease_factor, self.min_concurrent)
+        logger.warning(f"Backend overloaded, concurrency window cut to {self.window:.1f} "
+                       f"({self.in_flight} in flight)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": round(self.window, 2),
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "cuts": self.cuts,
+        }
@@ -0,0 +1,92 @@
+import re
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+class ChunkDeduplicator:
+    """Groups near-duplicate chunks using MinHash signatures over word shingles.
+
+    LSH banding keeps candidate lookup linear in the number of chunks; a chunk joins
+    the first earlier representative whose estimated Jaccard similarity reaches
+    `threshold`, otherwise it becomes a representative itself.
+    """
+
+    def __init__(self, threshold: float = 0.9, shingle_size: int = 5,
+                 num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {
+            zlib.crc32(" ".join(words[i:i + size]).encode())
+            for i in range(max(len(words) - size + 1, 1))
+        }
+        return np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self._shingles(text)
+        # uint64 overflow wraps around, which is fine for hashing purposes
+        permuted = ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def new_index(self) -> "DedupIndex":
+        return DedupIndex(self)
+
+    def group(self, texts: List[str]) -> List[int]:
+        """Returns, for every text, the index of the representative it should share results with."""
+        index = self.new_index()
+        return [index.assign(position, text) for position, text in enumerate(texts)]
+
+
+class DedupIndex:
+    """Per-document state of a `ChunkDeduplicator`, fed one chunk at a time."""
+
+    def __init__(self, deduplicator: ChunkDeduplicator):
+        self.deduplicator = deduplicator
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def assign(self, index: int, text: str) -> int:
+        """Returns the representative for chunk `index`, which is `index` itself if it is new."""
+        signature = self.deduplicator.signature(text)
+        band_keys = self.deduplicator._band_keys(signature)
+        match = self._find_match(signature, band_keys)
+        if match is not None:
+            return match
+
+        self.signatures[index] = signature
+        for band_key in band_keys:
+            self.buckets.setdefault(band_key, []).append(index)
+        return index
+
+    def _find_match(self, signature: np.ndarray,
+                    band_keys: List[Tuple[int, bytes]]) -> Optional[int]:
+        checked = set()
+        for band_key in band_keys:
+            for candidate in self.buckets.get(band_key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(self.signatures[candidate] == signature) >= self.deduplicator.threshold:
+                    return candidate
+        return None
@@ -1,7 +1,8 @@
+import uuid
 from app.models import Document
 from app.enums import DocumentStatus
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Iterable, Optional
 
 
 class DocumentRepository:
@@ -14,3 +15,30 @@ class DocumentRepository:
     def update_status(self, document: Document, status: DocumentStatus):
         document.status = status
         self.session.commit()
+
+    def queue_for_analysis(self, document_id: int,
+                           from_statuses: Iterable[DocumentStatus]) -> Optional[str]:
+        """Marks the document as queued under a new run id, only if its status is still one
+        of `from_statuses`; returns the run id, or None if another request got there first."""
+        run_id = str(uuid.uuid4())
+        updated = self.session.query(Document).filter(
+            Document.id == document_id,
+            Document.status.in_(list(from_statuses))
+        ).update({Document.status: DocumentStatus.QUED_FOR_ANALYSIS,
+                  Document.analysis_run_id: run_id}, synchronize_session=False)
+        self.session.commit()
+        return run_id if updated else None
+
+    def transition_status(self, document_id: int, run_id: Optional[str],
+                          from_statuses: Iterable[DocumentStatus],
+                          status: DocumentStatus) -> bool:
+        """Compare-and-set: sets `status` only if the document's status is one of
+        `from_statuses` and `run_id`, unless None, is still its current run."""
+        query = self.session.query(Document).filter(
+            Document.id == document_id,
+            Document.status.in_(list(from_statuses)))
+        if run_id is not None:
+            query = query.filter(Document.analysis_run_id == run_id)
+        updated = query.update({Document.status: status}, synchronize_session=False)
+        self.session.commit()
+        return bool(updated)
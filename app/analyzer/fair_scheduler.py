@@ -0,0 +1,199 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, NamedTuple, Optional
+import redis.asyncio as aioredis
+from app.enums import Priority
+from app.logger import logger
+
+PRIORITY_RANKS = {Priority.HIGH: 0, Priority.NORMAL: 1, Priority.LOW: 2}
+# Finish tags stay far below this, so a lower class always sorts first
+_PRIORITY_SPAN = 1e12
+
+# KEYS: queue, deadlines, held, vtime. Every script below starts with this prelude.
+_PRELUDE = """
+local queue, deadlines, held, vtime = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+"""
+
+# Drops expired leases and tickets of crashed workers, then grants the lowest tags that
+# fit into the free capacity by pushing to each ticket's grant list.
+# ARGV: capacity, claim_ms, span, grant key prefix
+_DISPATCH = """
+local capacity, claim_ms, span, grant_prefix =
+    tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+redis.call('ZREMRANGEBYSCORE', held, '-inf', now)
+for _, expired in ipairs(redis.call('ZRANGEBYSCORE', deadlines, '-inf', now)) do
+    redis.call('ZREM', queue, expired)
+    redis.call('ZREM', deadlines, expired)
+end
+local free = capacity - redis.call('ZCARD', held)
+if free <= 0 then
+    return 0
+end
+local popped = redis.call('ZPOPMIN', queue, free)
+for i = 1, #popped, 2 do
+    local ticket, score = popped[i], tonumber(popped[i + 1])
+    redis.call('ZREM', deadlines, ticket)
+    redis.call('ZADD', held, now + claim_ms, ticket)
+    redis.call('RPUSH', grant_prefix .. ticket, 1)
+    redis.call('PEXPIRE', grant_prefix .. ticket, claim_ms)
+    local rank = math.floor(score / span)
+    local tag = score - rank * span
+    if tag > tonumber(redis.call('HGET', vtime, rank) or 0) then
+        redis.call('HSET', vtime, rank, string.format('%.6f', tag))
+    end
+end
+return #popped / 2
+"""
+
+# Tags a ticket with the virtual time at which its flow's share of service ends:
+# max(class virtual time, flow's last finish tag) + 1 / flow weight. A user's weight
+# is split across their documents seen within the active window.
+# KEYS (after the prelude's): flow key, user's active documents
+# ARGV (after dispatch's): ticket, document, user weight, priority rank, ticket_ms, active_ms
+_ENQUEUE = """
+local flow_key, active_key = KEYS[5], KEYS[6]
+local ticket, document, user_weight, rank = ARGV[5], ARGV[6], tonumber(ARGV[7]), ARGV[8]
+local ticket_ms, active_ms = tonumber(ARGV[9]), tonumber(ARGV[10])
+
+redis.call('ZADD', active_key, now, document)
+redis.call('ZREMRANGEBYSCORE', active_key, '-inf', now - active_ms)
+redis.call('PEXPIRE', active_key, active_ms)
+local weight = user_weight / redis.call('ZCARD', active_key)
+
+local start = tonumber(redis.call('HGET', vtime, rank) or 0)
+local last = tonumber(redis.call('GET', flow_key) or 0)
+if last > start then
+    start = last
+end
+local tag = start + 1 / weight
+redis.call('SET', flow_key, string.format('%.6f', tag), 'PX', active_ms)
+redis.call('ZADD', queue, tonumber(rank) * tonumber(ARGV[3]) + tag, ticket)
+redis.call('ZADD', deadlines, now + ticket_ms, ticket)
+"""
+
+# Keeps a waiting ticket alive: 1 if still queued, 0 if it expired.
+# ARGV (after dispatch's): ticket, ticket_ms
+_TOUCH = """
+if redis.call('ZSCORE', queue, ARGV[5]) then
+    redis.call('ZADD', deadlines, now + tonumber(ARGV[6]), ARGV[5])
+    return 1
+end
+return 0
+"""
+
+# Turns a granted claim into a full lease: 1 on success, 0 if the claim already expired.
+# ARGV: ticket, lease_ms
+_CLAIM = """
+if redis.call('ZSCORE', held, ARGV[1]) then
+    redis.call('ZADD', held, now + tonumber(ARGV[2]), ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# ARGV (after dispatch's): ticket
+_RELEASE = """
+redis.call('ZREM', held, ARGV[5])
+redis.call('ZREM', queue, ARGV[5])
+redis.call('ZREM', deadlines, ARGV[5])
+"""
+
+
+class Flow(NamedTuple):
+    """Who an LLM request is made for; requests of one flow share its fair share."""
+
+    user_id: int
+    document_id: int
+    weight: float = 1.0
+    priority: Priority = Priority.NORMAL
+
+
+# Flow of the document being analyzed; set once per task and inherited by its pipeline tasks
+current_flow: ContextVar[Optional[Flow]] = ContextVar("current_flow", default=None)
+
+
+class FairScheduler:
+    """Cluster-wide LLM slots handed out by weighted fair queuing over Redis.
+
+    Every request takes a ticket tagged with its virtual finish time. Whenever a
+    ticket is queued or a slot released, the lowest tags that fit into the free
+    capacity are granted, and their waiters wake up from a blocking pop. Users get
+    equal shares (scaled by weight) no matter how many requests they queue, a user's
+    share is split across their active documents, and higher priority classes go
+    first. Tickets and leases expire, so a crashed worker never holds slots for long.
+    """
+
+    def __init__(self, redis: aioredis.Redis, capacity: int, prefix: str = "llm_sched",
+                 ticket_seconds: float = 10, lease_seconds: float = 120,
+                 active_seconds: float = 60):
+        self.redis = redis
+        self.capacity = capacity
+        self.prefix = prefix
+        self.ticket_seconds = ticket_seconds
+        self.ticket_ms = int(ticket_seconds * 1000)
+        self.lease_ms = int(lease_seconds * 1000)
+        self.active_ms = int(active_seconds * 1000)
+        self._enqueue = redis.register_script(_PRELUDE + _ENQUEUE + _DISPATCH)
+        self._touch = redis.register_script(_PRELUDE + _TOUCH)
+        self._claim = redis.register_script(_PRELUDE + _CLAIM)
+        self._release = redis.register_script(_PRELUDE + _RELEASE + _DISPATCH)
+        self._dispatch = redis.register_script(_PRELUDE + _DISPATCH)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    @property
+    def _keys(self):
+        return [self._key("queue"), self._key("deadlines"), self._key("held"),
+                self._key("vtime")]
+
+    @property
+    def _dispatch_args(self):
+        return [self.capacity, self.ticket_ms, _PRIORITY_SPAN, self._key("grant:")]
+
+    async def _enqueue_ticket(self, flow: Flow) -> str:
+        ticket = uuid.uuid4().hex
+        await self._enqueue(
+            keys=self._keys + [self._key(f"flow:{flow.user_id}:{flow.document_id}"),
+                               self._key(f"active:{flow.user_id}")],
+            args=self._dispatch_args + [ticket, flow.document_id, flow.weight,
+                                        PRIORITY_RANKS[flow.priority],
+                                        self.ticket_ms, self.active_ms])
+        return ticket
+
+    async def acquire(self, flow: Flow) -> str:
+        """Waits for a slot and returns the ticket to release it with."""
+        ticket = await self._enqueue_ticket(flow)
+        try:
+            while True:
+                granted = await self.redis.blpop([self._key(f"grant:{ticket}")],
+                                                 timeout=self.ticket_seconds / 2)
+                if granted and await self._claim(keys=self._keys, args=[ticket, self.lease_ms]):
+                    return ticket
+                if granted or not await self._touch(keys=self._keys,
+                                                    args=self._dispatch_args + [ticket,
+                                                                                self.ticket_ms]):
+                    # Claim or ticket expired, e.g. the event loop was blocked for too long
+                    logger.warning(f"Scheduler ticket of {flow} expired, re-queuing")
+                    ticket = await self._enqueue_ticket(flow)
+                    continue
+                # Nobody released in a while; leases of crashed workers may have expired
+                await self._dispatch(keys=self._keys, args=self._dispatch_args)
+        except BaseException:
+            await asyncio.shield(self.release(ticket))
+            raise
+
+    async def release(self, ticket: str) -> None:
+        await self._release(keys=self._keys, args=self._dispatch_args + [ticket])
+
+    @asynccontextmanager
+    async def slot(self, flow: Flow) -> AsyncIterator[None]:
+        ticket = await self.acquire(flow)
+        try:
+            yield
+        finally:
+            await self.release(ticket)
@@ -0,0 +1,49 @@
+import asyncio
+from collections import Counter
+from typing import List, NamedTuple, Tuple
+from app.analyzer.result_store import ResultStore
+from app.analyzer.service import AnalyzerService
+from app.logger import logger
+
+
+class FanOutPlan(NamedTuple):
+    """Chunks of a document still to analyze, stored under `key` and cut into slices of
+    positions, one per analysis task."""
+
+    key: str
+    with_chapter: bool
+    slices: List[Tuple[int, int]]
+    # Parsing stats and the counts of chunks stored by earlier runs
+    stats: Counter
+
+
+async def plan_fan_out(service: AnalyzerService, store: ResultStore, pdf_path: str,
+                       chunks_per_task: int) -> FanOutPlan:
+    """Parses and chunks the whole document, and stores the chunks without a result yet.
+
+    Every chunk of the run is known at this point, so stale results are pruned here
+    rather than after the analysis tasks.
+    """
+    stats = Counter()
+    has_chapters, chunks = await asyncio.to_thread(service.split, pdf_path, stats)
+    pending = await asyncio.to_thread(
+        lambda: [chunk for chunk in chunks if not store.is_completed(chunk)])
+    key = await service.chunk_store.put(store.document_id, pending)
+    await store.prune()
+
+    slices = [(start, min(start + chunks_per_task, len(pending)))
+              for start in range(0, len(pending), chunks_per_task)]
+    stats.update(store.stats)
+    logger.info(f"Document {store.document_id}: {len(pending)} of {len(store.seen)} chunks "
+                f"to analyze in {len(slices)} tasks")
+    return FanOutPlan(key, has_chapters, slices, stats)
+
+
+async def analyze_slice(service: AnalyzerService, store: ResultStore, key: str, start: int,
+                        stop: int, with_chapter: bool, user_context: str) -> Counter:
+    """Analyzes one slice of a plan, saving outcomes as they complete; returns its stats."""
+    chunks = await service.chunk_store.get(key, start, stop)
+    stats = await service.analyzer.stream_chunks(chunks, user_context, with_chapter,
+                                                 store.save)
+    stats.update(store.stats)
+    return stats
@@ -0,0 +1,124 @@
+import re
+from collections import Counter
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from app.analyzer.layout import LineStyle, PageLayout
+
+# "1.", "1.2", "IV.", "A.", optionally after "Section", "Article" and the like
+_NUMBERING_RE = re.compile(
+    r"^(?:(?i:section|article|clause|part)\s+)?(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.|[A-Z]\.)\s+(?=\S)")
+_NUMBER_RE = re.compile(r"\d+")
+# Dot leaders of a table of contents
+_LEADER_RE = re.compile(r"\.{3,}|(?:\.\s){3,}")
+_WORD_RE = re.compile(r"[^\W\d_]{4,}")
+
+# Font size and weight of a line
+StyleKey = Tuple[float, bool]
+
+
+class HeadingModel(NamedTuple):
+    """Fonts of one document: its body text, and its heading styles, most prominent first."""
+
+    body_size: float
+    body_bold: bool
+    levels: List[StyleKey]
+
+
+class HeadingClassifier:
+    """Finds headings from the font size, weight and spacing of lines, and their numbering.
+
+    Fitted per document on its first `sample_pages` pages: the body style is the
+    size and weight of most characters, and every style at least
+    `min_size_ratio` times larger than the body, or bold over a regular body, is
+    a heading level, ranked by size. A short line is a heading when it is set in
+    a heading style, or when it is numbered ("1. Termination", "Section 4"),
+    mostly capitalized, and set apart from the line above by at least
+    `min_gap_ratio` of its font size. Numbered headings in the body style rank
+    below the styled levels by their numbering depth, and headings deeper than
+    `max_level` stay in their chapter's text.
+    """
+
+    def __init__(self, sample_pages: int = 8, min_size_ratio: float = 1.15,
+                 min_gap_ratio: float = 0.5, max_words: int = 12, max_length: int = 100,
+                 max_level: int = 2):
+        self.sample_pages = sample_pages
+        self.min_size_ratio = min_size_ratio
+        self.min_gap_ratio = min_gap_ratio
+        self.max_words = max_words
+        self.max_length = max_length
+        self.max_level = max_level
+
+    @property
+    def config_fingerprint(self) -> list:
+        return [self.sample_pages, self.min_size_ratio, self.min_gap_ratio, self.max_words,
+                self.max_length, self.max_level]
+
+    def fit(self, pages: Iterable[PageLayout]) -> Optional[HeadingModel]:
+        """Learns the body and heading styles; None for pages without font metadata."""
+        chars = Counter()
+        for page in pages:
+            for text, style in zip(page.lines, page.styles):
+                if text and style is not None:
+                    chars[style.size, style.bold] += len(text)
+        if not chars:
+            return None
+
+        body_size, body_bold = chars.most_common(1)[0][0]
+        model = HeadingModel(body_size, body_bold, [])
+        model.levels.extend(sorted((key for key in chars if self._is_heading_style(model, key)),
+                                   key=lambda key: (-key[0], not key[1])))
+        return model
+
+    def _is_heading_style(self, model: HeadingModel, key: StyleKey) -> bool:
+        size, bold = key
+        return (size >= model.body_size * self.min_size_ratio
+                or (bold and not model.body_bold and size >= model.body_size))
+
+    def _is_short_line(self, text: str) -> bool:
+        words = text.split()
+        return (0 < len(words) <= self.max_words
+                and len(text) < self.max_length
+                and (text[0].isupper() or text[0].isdigit())
+                and not text.endswith((".", ",", ";"))
+                and not _LEADER_RE.search(text))
+
+    @staticmethod
+    def _is_capitalized(text: str) -> bool:
+        words = _WORD_RE.findall(text)
+        return not words or sum(word[0].isupper() for word in words) / len(words) >= 0.6
+
+    def level(self, model: HeadingModel, text: str, style: Optional[LineStyle]) -> Optional[int]:
+        """Heading level of a line, 1 being the most prominent; None for body text."""
+        if style is None or not self._is_short_line(text):
+            return None
+        key = (style.size, style.bold)
+        if self._is_heading_style(model, key):
+            # Styles first seen after the sample rank among the known ones by prominence
+            return 1 + sum(1 for level in model.levels
+                           if (-level[0], not level[1]) < (-key[0], not key[1]))
+
+        numbering = _NUMBERING_RE.match(text)
+        spaced = style.gap is None or style.gap >= self.min_gap_ratio * style.size
+        if numbering and spaced and self._is_capitalized(text[numbering.end():]):
+            depth = max(len(_NUMBER_RE.findall(numbering.group())), 1)
+            return len(model.levels) + depth
+        return None
+
+    def classify(self, pages: Iterable[PageLayout]) -> Iterator[PageLayout]:
+        """Yields pages with their heading lines marked, fitting the model on the first ones.
+
+        Only the sample pages are buffered, so parsing still streams.
+        """
+        pages = iter(pages)
+        sample = list(islice(pages, self.sample_pages))
+        model = self.fit(sample)
+        for page in chain(sample, pages):
+            if model is None or not page.styles:
+                yield page
+                continue
+            headings = []
+            for index, (text, style) in enumerate(zip(page.lines, page.styles)):
+                level = self.level(model, text, style)
+                if level is not None and level <= self.max_level:
+                    headings.append(index)
+            yield page._replace(headings=headings)
@@ -0,0 +1,174 @@
+import math
+import multiprocessing
+import threading
+import pymupdf
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from app.logger import logger
+
+# Same as the default "dict" flags, minus embedded image bytes we never read.
+TEXT_FLAGS = pymupdf.TEXTFLAGS_DICT & ~pymupdf.TEXT_PRESERVE_IMAGES
+
+# PyMuPDF is not thread-safe, and a threads pool worker parses several documents at
+# once, each on its own thread: every call into it takes this lock. Pages are extracted
+# one per turn, so documents parsed at the same time interleave page by page. Process
+# pools are unaffected, each process having its own lock.
+PDF_LOCK = threading.RLock()
+
+# Shard processes are forked from a single-threaded fork server, started once with this
+# module loaded: forking a multi-threaded process, such as a Celery worker with its
+# runtime loop thread, can leave the child stuck on a lock another thread held
+_POOL_CONTEXT = multiprocessing.get_context("forkserver")
+_POOL_CONTEXT.set_forkserver_preload([__name__])
+# Cleared by Celery workers unless configured otherwise, see `allow_process_pool`
+_process_pool_allowed = True
+
+
+def allow_process_pool(allowed: bool) -> None:
+    """Whether `extract_layout_parallel` may start a process pool in this process."""
+    global _process_pool_allowed
+    _process_pool_allowed = allowed
+
+
+# Top-left corner of a line as fractions of the page width and height
+LinePosition = Optional[Tuple[float, float]]
+# pymupdf span flag of bold text
+BOLD_FLAG = 16
+
+
+class LineStyle(NamedTuple):
+    """Font metadata of a line, as needed to tell headings from body text."""
+
+    size: float  # largest span font size, in points
+    bold: bool  # every span with text is bold
+    gap: Optional[float]  # space above the line in points; None for the first line of a page
+
+
+class PageLayout(NamedTuple):
+    """Stripped text lines of a single page, in reading order."""
+
+    number: int  # zero-based page index
+    lines: List[str]
+    # One per line; empty, or None for a line, when the page has no geometry
+    positions: Sequence[LinePosition] = ()
+    # One per line, like positions
+    styles: Sequence[Optional[LineStyle]] = ()
+    # Indexes of heading lines found from font metadata; None when not classified
+    headings: Optional[Sequence[int]] = None
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class DocumentLayout:
+    """Per-page line model of a PDF, extracted once and shared by all parsing steps."""
+
+    def __init__(self, pages: List[PageLayout]):
+        self.pages = pages
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+
+def _line_position(line: dict, width: Optional[float], height: Optional[float]) -> LinePosition:
+    bbox = line.get("bbox")
+    if bbox is None or not width or not height:
+        return None
+    return bbox[0] / width, bbox[1] / height
+
+
+def _line_style(line: dict, previous_bottom: Optional[float]) -> Optional[LineStyle]:
+    spans = [span for span in line["spans"] if span["text"].strip()] or line["spans"]
+    if "bbox" not in line or not spans or any("size" not in span for span in spans):
+        return None
+    bold = all(span.get("flags", 0) & BOLD_FLAG or "bold" in span.get("font", "").lower()
+               for span in spans)
+    gap = line["bbox"][1] - previous_bottom if previous_bottom is not None else None
+    return LineStyle(round(max(span["size"] for span in spans), 1), bold, gap)
+
+
+def extract_page(number: int, page: pymupdf.Page) -> PageLayout:
+    text = page.get_text("dict", flags=TEXT_FLAGS)
+    width, height = text.get("width"), text.get("height")
+    lines = []
+    positions = []
+    styles = []
+    previous_bottom = None
+    for block in text["blocks"]:
+        if "lines" not in block:
+            continue
+        for line in block["lines"]:
+            lines.append(" ".join(span["text"] for span in line["spans"]).strip())
+            positions.append(_line_position(line, width, height))
+            styles.append(_line_style(line, previous_bottom))
+            if "bbox" in line:
+                previous_bottom = line["bbox"][3]
+    return PageLayout(number, lines, positions, styles)
+
+
+def iter_pages(path: str) -> Iterator[PageLayout]:
+    """Lays out pages lazily, one at a time, so consumers can start before the last page."""
+    with PDF_LOCK:
+        doc = pymupdf.open(path)
+    try:
+        pages = enumerate(doc)
+        while True:
+            with PDF_LOCK:
+                number, page = next(pages, (None, None))
+                if page is None:
+                    return
+                layout = extract_page(number, page)
+                # Dropped inside the lock, since freeing a page calls into MuPDF too
+                del page
+            yield layout
+    finally:
+        with PDF_LOCK:
+            doc.close()
+
+
+def extract_layout(path: str) -> DocumentLayout:
+    """Walks the document once and builds its line model."""
+    return DocumentLayout(list(iter_pages(path)))
+
+
+def count_pages(path: str) -> int:
+    with PDF_LOCK:
+        doc = pymupdf.open(path)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[PageLayout]:
+    """Extracts pages [start, stop) with a document handle owned by the calling process."""
+    with PDF_LOCK:
+        doc = pymupdf.open(path)
+        try:
+            return [extract_page(number, doc[number]) for number in range(start, stop)]
+        finally:
+            doc.close()
+
+
+def extract_layout_parallel(path: str, page_count: int, workers: int) -> DocumentLayout:
+    """Shards contiguous page ranges across a process pool and merges them in page order.
+
+    Chapters are assembled afterwards from the merged layout, so a chapter spanning
+    two shards comes out exactly as it would from `extract_layout`.
+    """
+    if not _process_pool_allowed:
+        logger.debug("Parallel PDF extraction disabled in this process, extracting serially")
+        return extract_layout(path)
+
+    shard_size = math.ceil(page_count / workers)
+    ranges = [(start, min(start + shard_size, page_count))
+              for start in range(0, page_count, shard_size)]
+
+    pages = []
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=_POOL_CONTEXT) as pool:
+        futures = [pool.submit(extract_page_range, path, start, stop) for start, stop in ranges]
+        for future in futures:
+            pages.extend(future.result())
+    return DocumentLayout(pages)
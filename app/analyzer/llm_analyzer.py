@@ -1,39 +1,78 @@
 import asyncio
-from typing import List, Tuple, Iterable
-from app.analyzer.templates import prompt_template
+from collections import Counter
+from contextlib import nullcontext
+from typing import (Any, AsyncContextManager, Awaitable, Callable, Dict, Iterator, List,
+                    Optional, Tuple, Type, Iterable, Union)
+from pydantic import BaseModel
+from app.analyzer.templates import prompt_template, batch_prompt_template, format_batch_clauses
 from app.analyzer import schemas
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.runnables import Runnable
 from app.logger import logger
-from app.analyzer.rate_limiter import is_allowed
-from app.config import settings
+from app.analyzer.rate_limiter import RateLimiter
+from app.analyzer.fair_scheduler import FairScheduler, Flow, current_flow
+from app.analyzer.retry_policy import ErrorClass, RetryPolicy, current_retry_budget
+from app.analyzer.llm_backends import ChatModel
+from app.analyzer.relevance import RelevanceFilter
+from app.analyzer.cascade import PRIMARY_TIER, TriageTier
+from app.analyzer.output_repair import OutputRepairError, OutputRepairer
 from app.analyzer.concurrency_limiter import ConcurrencyLimiter
+from app.analyzer.result_cache import ResultCache
+from app.analyzer.dedup import ChunkDeduplicator
+from app.analyzer.chunk_packer import ChunkPacker
+
+# Receives each chunk's outcome as soon as it is known: an analysis, the exception it failed
+# with, or a note that the relevance pre-filter skipped it
+ResultSink = Callable[[schemas.DocumentChunk,
+                       Union[schemas.ClauseAnalysis, schemas.SkippedChunk, Exception]],
+                      Awaitable[None]]
+ChunkFilter = Callable[[schemas.DocumentChunk], bool]
+# Requests made outside a document task, e.g. from scripts, share one flow
+ANONYMOUS_FLOW = Flow(user_id=0, document_id=0)
 
 
 class LLMAnalyzer:
-    def __init__(self, llm: ChatGoogleGenerativeAI, max_chapter_length: int,
-                 chunck_text_overlap: int, limiter: ConcurrencyLimiter):
+    def __init__(self, llm: ChatModel, max_chunk_tokens: int,
+                 chunk_overlap_tokens: int, limiter: ConcurrencyLimiter,
+                 result_cache: Optional[ResultCache] = None,
+                 deduplicator: Optional[ChunkDeduplicator] = None,
+                 batch_max_items: int = 1, batch_max_chunk_tokens: int = 0,
+                 pipeline_workers: int = 4, pipeline_queue_depth: int = 8,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 scheduler: Optional[FairScheduler] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 output_repairer: Optional[OutputRepairer] = None,
+                 relevance_filter: Optional[RelevanceFilter] = None,
+                 triage: Optional[TriageTier] = None):
         self.llm = llm
-        self.max_chapter_length = max_chapter_length
-        self.chunck_text_overlap = chunck_text_overlap
-        self.structured_llm = self.llm.with_structured_output(schemas.ClauseAnalysis)
+        self.max_chunk_tokens = max_chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        # Raw output is kept so responses that fail validation can be repaired locally
+        self.structured_llm = self.llm.with_structured_output(schemas.ClauseAnalysis,
+                                                              include_raw=True)
         self.chain = prompt_template | self.structured_llm
+        self.batch_chain = (batch_prompt_template
+                            | self.llm.with_structured_output(schemas.ClauseAnalysisBatch,
+                                                              include_raw=True))
         self.limiter = limiter
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.max_chapter_length,
-            chunk_overlap=self.chunck_text_overlap,
-        )
+        self.rate_limiter = rate_limiter
+        self.scheduler = scheduler
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.output_repairer = output_repairer or OutputRepairer()
+        self.result_cache = result_cache
+        self.deduplicator = deduplicator
+        self.relevance_filter = relevance_filter
+        self.triage = triage
+        self.batch_max_items = batch_max_items
+        self.batch_max_chunk_tokens = batch_max_chunk_tokens
+        self.pipeline_workers = pipeline_workers
+        self.pipeline_queue_depth = pipeline_queue_depth
+        self.packer = ChunkPacker(max_tokens=max_chunk_tokens, overlap_tokens=chunk_overlap_tokens)
 
     async def analyze_document_per_page(self,
-                                        page_text_gen: Iterable[schemas.DocumentChapter],
+                                        page_text_gen: Iterable[str],
                                         user_context: str) -> List[schemas.ClauseAnalysis]:
-        tasks = []
-
-        for page_text in page_text_gen:
-            texts = self.splitter.split_text(page_text)
-            for text in texts:
-                tasks.append(self._analyze_chunk(text, user_context))
-        results = await self.limiter.execute(tasks)
+        chunks = self._split((page_text, None) for page_text in page_text_gen)
+        results = await self._analyze_chunks(chunks, user_context, with_chapter=False)
 
         successful, _, _ = self.categorise_results(results)
         if not successful:
@@ -41,48 +80,438 @@ class LLMAnalyzer:
             return []
         return successful
 
-    async def _analyze_chunk(self, text: str, user_context: str) -> schemas.ClauseAnalysis:
-        for attempt in range(1, settings.MAX_RETRIES + 1):
+    async def stream_document_per_page(self, page_text_gen: Iterable[str], user_context: str,
+                                       sink: ResultSink,
+                                       skip: Optional[ChunkFilter] = None) -> Counter:
+        """Like `analyze_document_per_page`, but hands every outcome to `sink` as it completes.
+
+        Chunks for which `skip` returns True, e.g. ones stored by an earlier run,
+        are neither analyzed nor passed to `sink`.
+        """
+        chunks = self._split((page_text, None) for page_text in page_text_gen)
+        return await self._run_pipeline(chunks, user_context, False, sink, skip)
+
+    async def stream_document_per_chapter(self, chapter_gen: Iterable[schemas.DocumentChapter],
+                                          user_context: str, sink: ResultSink,
+                                          skip: Optional[ChunkFilter] = None) -> Counter:
+        """Chapter-mode counterpart of `stream_document_per_page`."""
+        chunks = self._split((chapter.chapter_text, chapter) for chapter in chapter_gen)
+        return await self._run_pipeline(chunks, user_context, True, sink, skip)
+
+    async def stream_chunks(self, chunks: Iterable[schemas.DocumentChunk], user_context: str,
+                            with_chapter: bool, sink: ResultSink,
+                            skip: Optional[ChunkFilter] = None) -> Counter:
+        """Streams chunks split beforehand by `split_chapters`, e.g. one task's share of a
+        fanned-out document."""
+        return await self._run_pipeline(chunks, user_context, with_chapter, sink, skip)
+
+    def split_chapters(self, chapters: Iterable[schemas.DocumentChapter],
+                       with_chapter: bool) -> Iterator[schemas.DocumentChunk]:
+        """Chunks numbered as the streaming methods number them; page pseudo-chapters
+        (`with_chapter` unset) are not attached to their chunks."""
+        return self._split((chapter.chapter_text, chapter if with_chapter else None)
+                           for chapter in chapters)
+
+    def _split(self, sections: Iterable[Tuple[str, Optional[schemas.DocumentChapter]]]
+               ) -> Iterator[schemas.DocumentChunk]:
+        index = 0
+        for section_text, chapter in sections:
+            for text, tokens in self.packer.split(section_text):
+                yield schemas.DocumentChunk(index=index, text=text, tokens=tokens, chapter=chapter)
+                index += 1
+
+    async def _analyze_chunks(self, chunks: Iterable[schemas.DocumentChunk], user_context: str,
+                              with_chapter: bool) -> List[Union[schemas.ClauseAnalysis,
+                                                                Exception]]:
+        """Runs the pipeline to completion and returns outcomes in document order."""
+        results = {}
+
+        async def collect(chunk: schemas.DocumentChunk, result: Any) -> None:
+            results[chunk.index] = result
+
+        await self._run_pipeline(chunks, user_context, with_chapter, collect)
+        return [results[index] for index in sorted(results)]
+
+    def _plan_requests(self, chunks: Iterable[schemas.DocumentChunk], stats: Counter,
+                       skip: Optional[ChunkFilter] = None) -> Iterator[
+            Tuple[List[schemas.DocumentChunk], List[Tuple[schemas.DocumentChunk, int]],
+                  List[Tuple[schemas.DocumentChunk, schemas.SkippedChunk]]]]:
+        """Yields request groups of unique chunks, each with the near-duplicates and
+        irrelevant chunks found so far.
+
+        Duplicates come as (chunk, representative index) pairs; their representative is
+        always in the same or an earlier group, or in a group that is still being packed.
+        """
+        dedup_index = self.deduplicator.new_index() if self.deduplicator is not None else None
+        duplicates = []
+        irrelevant = []
+
+        def unique_chunks() -> Iterator[schemas.DocumentChunk]:
+            for chunk in chunks:
+                # Skipped before dedup, so a pending duplicate of a stored chunk is analyzed
+                if skip is not None and skip(chunk):
+                    stats["skipped_chunks"] += 1
+                    continue
+                skipped = self._check_relevance(chunk)
+                if skipped is not None:
+                    stats["irrelevant_chunks"] += 1
+                    irrelevant.append((chunk, skipped))
+                    continue
+                representative = (dedup_index.assign(chunk.index, chunk.text)
+                                  if dedup_index is not None else chunk.index)
+                if representative == chunk.index:
+                    yield chunk
+                else:
+                    duplicates.append((chunk, representative))
+
+        for group in self.packer.pack(unique_chunks(), self.batch_max_items,
+                                      self.batch_max_chunk_tokens):
+            found, filtered = duplicates[:], irrelevant[:]
+            duplicates.clear()
+            irrelevant.clear()
+            yield group, found, filtered
+        if duplicates or irrelevant:
+            yield [], duplicates, irrelevant
+
+    def _check_relevance(self, chunk: schemas.DocumentChunk) -> Optional[schemas.SkippedChunk]:
+        if self.relevance_filter is None:
+            return None
+        chapter_name = chunk.chapter.chapter_name if chunk.chapter else None
+        relevance = self.relevance_filter.score(chunk.text, chapter_name)
+        if relevance >= self.relevance_filter.threshold:
+            return None
+        return schemas.SkippedChunk(relevance=relevance,
+                                    threshold=self.relevance_filter.threshold)
+
+    async def _run_pipeline(self, chunks: Iterable[schemas.DocumentChunk], user_context: str,
+                            with_chapter: bool, sink: ResultSink,
+                            skip: Optional[ChunkFilter] = None) -> Counter:
+        """Streams chunks through a bounded queue to `pipeline_workers` LLM consumers.
+
+        The producer pulls chunks (and with them, parsed pages) in a worker thread only
+        while the queue has room, so a slow LLM throttles parsing instead of letting
+        work pile up in memory. Each outcome, failures included, is passed to `sink`
+        as soon as it is known; near-duplicates get their representative's outcome.
+        """
+        stats = Counter()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_depth)
+        outcomes: Dict[int, Any] = {}
+        waiting: Dict[int, List[schemas.DocumentChunk]] = {}
+
+        async def emit(chunk: schemas.DocumentChunk, result: Any) -> None:
+            if with_chapter and isinstance(result, schemas.ClauseAnalysis):
+                result = self._to_chapter_analysis(result, chunk.chapter)
+            await sink(chunk, result)
+
+        async def resolve(chunk: schemas.DocumentChunk, result: Any) -> None:
+            outcomes[chunk.index] = result
+            for member in [chunk] + waiting.pop(chunk.index, []):
+                await emit(member, result)
+
+        async def produce() -> None:
+            plan = self._plan_requests(chunks, stats, skip)
+            while (planned := await asyncio.to_thread(next, plan, None)) is not None:
+                group, duplicates, irrelevant = planned
+                for chunk, skipped in irrelevant:
+                    await emit(chunk, skipped)
+                for chunk, representative in duplicates:
+                    stats["dedup_saved_calls"] += 1
+                    if representative in outcomes:
+                        await emit(chunk, outcomes[representative])
+                    else:
+                        waiting.setdefault(representative, []).append(chunk)
+                if group:
+                    await queue.put(group)
+            for _ in range(self.pipeline_workers):
+                await queue.put(None)
+
+        async def consume() -> None:
+            while (group := await queue.get()) is not None:
+                lookup = True
+                if self.triage is not None:
+                    answered, group = await self._triage_group(group, user_context, stats)
+                    for chunk, result in answered:
+                        await resolve(chunk, result)
+                    # Triage already missed the cache for the chunks it escalates
+                    lookup = False
+                if not group:
+                    continue
+                if len(group) == 1:
+                    result = await self.limiter.limit(
+                        self._analyze_chunk(group[0].text, user_context, stats, lookup))
+                    await resolve(group[0], result)
+                    continue
+
+                batch = await self.limiter.limit(
+                    self._analyze_batch(group, user_context, stats, lookup))
+                if isinstance(batch, Exception):
+                    batch = {}
+                redispatch = []
+                for chunk in group:
+                    if chunk.index in batch:
+                        await resolve(chunk, batch[chunk.index])
+                    else:
+                        redispatch.append(chunk)
+                if redispatch:
+                    stats["batch_redispatched"] += len(redispatch)
+                    redispatched = await self.limiter.execute(
+                        [self._analyze_chunk(chunk.text, user_context, stats)
+                         for chunk in redispatch])
+                    for chunk, result in zip(redispatch, redispatched):
+                        await resolve(chunk, result)
+
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(produce())
+                for _ in range(self.pipeline_workers):
+                    tasks.create_task(consume())
+        except ExceptionGroup as e:
+            raise e.exceptions[0]
+
+        self._log_stats(stats)
+        logger.info(f"Concurrency limiter: {self.limiter.stats()}")
+        if self.triage is not None:
+            logger.info(f"Triage concurrency limiter: {self.triage.limiter.stats()}")
+        return stats
+
+    async def _triage_group(self, chunks: List[schemas.DocumentChunk], user_context: str,
+                            stats: Counter) -> Tuple[
+            List[Tuple[schemas.DocumentChunk, schemas.ClauseAnalysis]],
+            List[schemas.DocumentChunk]]:
+        """Asks the triage model about each chunk of a request group in parallel.
+
+        Returns the chunks answered from the cache or finally by triage, and the
+        chunks to escalate to the primary model: risky or low-confidence ones and
+        those whose triage failed.
+        """
+        async def triage(chunk: schemas.DocumentChunk) -> Optional[schemas.ClauseAnalysis]:
+            cached = await self._get_cached(chunk.text, user_context, stats)
+            if cached is not None:
+                return cached
+            triaged = await self.triage.limiter.limit(self._invoke_with_retries(
+                self.triage.chain, schemas.TriageAnalysis,
+                {"text": chunk.text, "user_context": user_context}, stats, tier=self.triage))
+            if isinstance(triaged, Exception):
+                stats["triage_failed"] += 1
+            elif not self.triage.should_escalate(triaged):
+                stats["triage_final"] += 1
+                result = self.triage.to_result(triaged)
+                await self._set_cached(chunk.text, user_context, result)
+                return result
+            stats["escalated"] += 1
+            return None
+
+        answered = []
+        escalated = []
+        for chunk, result in zip(chunks, await asyncio.gather(*map(triage, chunks))):
+            if result is None:
+                escalated.append(chunk)
+            else:
+                answered.append((chunk, result))
+        return answered, escalated
+
+    async def _analyze_batch(self, chunks: List[schemas.DocumentChunk], user_context: str,
+                             stats: Counter,
+                             lookup: bool = True) -> Dict[int, Any]:
+        """Analyzes several chunks in one request.
+
+        Returns results keyed by chunk index; chunks that didn't get exactly one
+        answer are left out so the caller can re-dispatch them individually. If only
+        one chunk missed the cache, it gets a single request, and like `_analyze_chunk`
+        its failure is returned as its result rather than re-dispatched.
+        """
+        results = {}
+        pending = []
+        for chunk in chunks:
+            cached = await self._get_cached(chunk.text, user_context, stats) if lookup else None
+            if cached is None:
+                pending.append(chunk)
+            else:
+                results[chunk.index] = cached
+        if len(pending) == 1:
+            try:
+                result = await self._request_analysis(pending[0].text, user_context, stats)
+            except Exception as e:
+                logger.error(f"Task failed with error: {e}")
+                results[pending[0].index] = e
+                return results
+            await self._set_cached(pending[0].text, user_context, result)
+            results[pending[0].index] = result
+        if len(pending) < 2:
+            return results
+
+        batch = await self._invoke_with_retries(self.batch_chain, schemas.ClauseAnalysisBatch, {
+            "clauses": format_batch_clauses(chunk.text for chunk in pending),
+            "user_context": user_context
+        }, stats)
+        stats["batched_requests"] += 1
+
+        answers = {}
+        for analysis in batch.analyses:
+            answers.setdefault(analysis.clause_id, []).append(analysis)
+        for clause_id, chunk in enumerate(pending, start=1):
+            if len(answers.get(clause_id, ())) != 1:
+                logger.warning(f"Batch returned {len(answers.get(clause_id, ()))} answers "
+                               f"for chunk {chunk.index}, re-dispatching it")
+                continue
+            result = schemas.ClauseAnalysis.model_validate(
+                {**answers[clause_id][0].model_dump(exclude={"clause_id"}),
+                 "tier": self._primary_tier()})
+            results[chunk.index] = result
+            await self._set_cached(chunk.text, user_context, result)
+        return results
+
+    async def _get_cached(self, text: str, user_context: str,
+                          stats: Counter) -> Optional[schemas.ClauseAnalysis]:
+        if self.result_cache is None:
+            return None
+        cached = await self.result_cache.get(self.result_cache.key(text, user_context))
+        stats["cache_hits" if cached is not None else "cache_misses"] += 1
+        return cached
+
+    async def _set_cached(self, text: str, user_context: str,
+                          result: schemas.ClauseAnalysis) -> None:
+        if self.result_cache is not None:
+            await self.result_cache.set(self.result_cache.key(text, user_context), result)
+
+    def _primary_tier(self) -> Optional[str]:
+        """Tier recorded on the primary model's results; only set with a cascade."""
+        return PRIMARY_TIER if self.triage is not None else None
+
+    async def _analyze_chunk(self, text: str, user_context: str, stats: Counter,
+                             lookup: bool = True) -> schemas.ClauseAnalysis:
+        cached = await self._get_cached(text, user_context, stats) if lookup else None
+        if cached is not None:
+            return cached
+
+        result = await self._request_analysis(text, user_context, stats)
+        await self._set_cached(text, user_context, result)
+        return result
+
+    async def _request_analysis(self, text: str, user_context: str,
+                                stats: Counter) -> schemas.ClauseAnalysis:
+        result = await self._invoke_with_retries(self.chain, schemas.ClauseAnalysis, {
+            "text": text,
+            "user_context": user_context
+        }, stats)
+        result.tier = self._primary_tier()
+        return result
+
+    async def _invoke_with_retries(self, chain: Runnable, schema: Type[BaseModel],
+                                   inputs: Dict[str, str], stats: Counter,
+                                   tier: Optional[TriageTier] = None) -> Any:
+        """Requests the primary model, or the triage tier's when `tier` is given."""
+        limiter = tier.limiter if tier is not None else self.limiter
+        rate_limiter = tier.rate_limiter if tier is not None else self.rate_limiter
+        policy = self.retry_policy
+        budget = current_retry_budget.get()
+        delay = 0.0
+        for attempt in range(1, policy.max_attempts + 1):
+            stats["llm_requests"] += 1
+            if budget is not None:
+                await budget.record("llm_requests")
             try:
-                await self._wait_for_rate_limit(attempt)
+                async with self._scheduled(tier):
+                    await self._wait_for_rate_limit(rate_limiter)
 
-                result = await self.chain.ainvoke({
-                    "text": text,
-                    "user_context": user_context
-                })
+                    result = await chain.ainvoke(inputs)
 
+                result = self._parse_output(result, schema, stats)
                 logger.info(f"Analysis completed successfully: {result}")
 
                 return result
 
             except Exception as e:
-                if attempt == settings.MAX_RETRIES:
+                limiter.observe(e)
+                error_class = policy.classify(e)
+                stats[f"{error_class.value}_errors"] += 1
+
+                if error_class == ErrorClass.PERMANENT:
+                    logger.error(f"Analysis failed with a permanent error: {e}")
+                    raise RuntimeError("Failed to analyze chunk, not retrying") from e
+                if attempt == policy.max_attempts:
                     logger.error(
-                        f"Analysis failed after {
-                            settings.MAX_RETRIES} attempts. Last error: {e}")
+                        f"Analysis failed after {policy.max_attempts} attempts. Last error: {e}")
                     raise RuntimeError(
-                        f"Failed to analyze chunk after {
-                            settings.MAX_RETRIES} retries") from e
+                        f"Failed to analyze chunk after {policy.max_attempts} attempts") from e
+                spent = stats if budget is None else await budget.spent(stats)
+                if not policy.within_budget(spent):
+                    logger.error(f"Retry budget of the document exhausted. Last error: {e}")
+                    raise RuntimeError("Failed to analyze chunk, retry budget exhausted") from e
 
-                wait_time = self._calculate_backoff_time(attempt)
+                delay = policy.delay(e, delay)
+                stats["retries"] += 1
+                if budget is not None:
+                    await budget.record("retries")
                 logger.warning(
-                    f"Analysis failed (attempt {attempt}/{settings.MAX_RETRIES}): {e}."
-                    f"Retrying in {wait_time}s")
-                await asyncio.sleep(wait_time)
-
-    async def _wait_for_rate_limit(self, attempt: int) -> None:
-        if not is_allowed(settings.LLM_LIMIT_KEY):
-            wait_time = self._calculate_backoff_time(attempt)
-            logger.warning(f"Rate limit exceeded, waiting {wait_time}s (attempt {attempt})")
-            await asyncio.sleep(wait_time)
-
-    def _calculate_backoff_time(self, attempt: int) -> float:
-        return settings.RETRY_BACKOFF_BASE * (3 ** attempt)
-
-    async def _analyze_chapter(
-        self, chapter_text: str, user_context: str, chapter: schemas.DocumentChapter
-    ) -> schemas.ChapterAnalysis:
-        clause_analysis = await self._analyze_chunk(chapter_text, user_context)
+                    f"Analysis failed with a {error_class.value} error "
+                    f"(attempt {attempt}/{policy.max_attempts}): {e}. Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _parse_output(self, output: Any, schema: Type[BaseModel], stats: Counter) -> Any:
+        """Returns the parsed result of a chain with raw output, repairing it if it didn't parse.
+
+        Raises OutputRepairError when the output can't be repaired, which the retry
+        loop treats as transient and re-requests.
+        """
+        if not isinstance(output, dict) or "raw" not in output:
+            return output
+        if output["parsed"] is not None:
+            return output["parsed"]
+        stats["invalid_outputs"] += 1
+        try:
+            return self.output_repairer.repair(output["raw"], schema, stats)
+        except OutputRepairError as e:
+            stats["unrepairable_outputs"] += 1
+            logger.warning(f"Model output failed validation and can't be repaired: {e}")
+            raise
+
+    def _scheduled(self, tier: Optional[TriageTier] = None) -> AsyncContextManager:
+        """Holds a cluster-wide slot of the fair scheduler for the current document.
+
+        The scheduler shares the primary model's capacity; triage requests only
+        go through their tier's own limits.
+        """
+        if self.scheduler is None or tier is not None:
+            return nullcontext()
+        return self.scheduler.slot(current_flow.get() or ANONYMOUS_FLOW)
+
+    async def _wait_for_rate_limit(self, rate_limiter: Optional[RateLimiter]) -> None:
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+
+    def _log_stats(self, stats: Counter) -> None:
+        if stats["invalid_outputs"]:
+            repairs = {key.removeprefix("repaired_"): count for key, count in stats.items()
+                       if key.startswith("repaired_")}
+            logger.info(f"Repaired {stats['invalid_outputs'] - stats['unrepairable_outputs']} "
+                        f"of {stats['invalid_outputs']} invalid model outputs locally: {repairs}")
+        if stats["retries"]:
+            logger.info(f"Retried {stats['retries']} of {stats['llm_requests']} LLM requests "
+                        f"({stats['throttle_errors']} throttled, "
+                        f"{stats['transient_errors']} transient errors, "
+                        f"{stats['permanent_errors']} permanent errors)")
+        if stats["triage_final"] or stats["escalated"]:
+            logger.info(f"Model cascade: {stats['triage_final']} chunks answered by triage, "
+                        f"{stats['escalated']} escalated ({stats['triage_failed']} after "
+                        f"triage failed)")
+        if stats["irrelevant_chunks"]:
+            logger.info(f"Relevance pre-filter skipped {stats['irrelevant_chunks']} chunks")
+        if stats["skipped_chunks"]:
+            logger.info(f"Skipped {stats['skipped_chunks']} chunks with stored results")
+        if stats["dedup_saved_calls"]:
+            logger.info(f"Near-duplicate chunks saved {stats['dedup_saved_calls']} LLM calls")
+        if stats["batched_requests"]:
+            logger.info(f"Sent {stats['batched_requests']} batched requests, "
+                        f"{stats['batch_redispatched']} chunks re-dispatched individually")
+        lookups = stats["cache_hits"] + stats["cache_misses"]
+        if lookups:
+            logger.info(
+                f"LLM result cache: {stats['cache_hits']}/{lookups} chunks served from cache "
+                f"({stats['cache_hits'] / lookups:.0%} hit rate)")
+
+    def _to_chapter_analysis(self, clause_analysis: schemas.ClauseAnalysis,
+                             chapter: schemas.DocumentChapter) -> schemas.ChapterAnalysis:
         return schemas.ChapterAnalysis(
             chapter_name=chapter.chapter_name,
             page_start=chapter.page_start,
@@ -93,13 +522,8 @@ class LLMAnalyzer:
     async def analyze_document_per_chapter(self,
                                            chapter_gen: Iterable[schemas.DocumentChapter],
                                            user_context: str) -> List[schemas.ChapterAnalysis]:
-        tasks = []
-        for chapter in chapter_gen:
-            texts = self.splitter.split_text(chapter.chapter_text)
-            for text in texts:
-                tasks.append(self._analyze_chapter(text, user_context, chapter))
-
-        results = await self.limiter.execute(tasks)
+        chunks = self._split((chapter.chapter_text, chapter) for chapter in chapter_gen)
+        results = await self._analyze_chunks(chunks, user_context, with_chapter=True)
 
         successful, _, _ = self.categorise_results(results)
         if not successful:
@@ -119,6 +543,8 @@ class LLMAnalyzer:
         for clause in results:
             if isinstance(clause, Exception):
                 failed_clauses.append(clause)
+            elif isinstance(clause, schemas.SkippedChunk):
+                continue
             elif clause.is_valid:
                 valid_clauses.append(clause)
             else:
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Type, Union
+from google.api_core import exceptions as google_exceptions
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import BaseModel, ValidationError
+from app.analyzer import schemas
+from app.constants import CATEGORIES
+from app.enums import RiskLevel
+
+_CLAUSE_ID_RE = re.compile(r"^Clause (\d+):", re.MULTILINE)
+_WORD_RE = re.compile(r"[A-Za-z]{4,}")
+# Most clauses of a typical terms of service are standard or low risk
+_RISK_WEIGHTS = (35, 30, 20, 10, 5)
+# Generating each further answer of a batch takes this share of a single request's latency
+_BATCH_ANSWER_COST = 0.25
+
+
+class CassetteMissError(google_exceptions.NotFound):
+    """No recorded response for a prompt; like a not-found API error, it isn't retried."""
+
+
+def _prompt_text(prompt: Any) -> str:
+    return prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+
+
+def _prompt_key(schema: Type[BaseModel], text: str) -> str:
+    return hashlib.sha256(f"{schema.__name__}\n{text}".encode()).hexdigest()
+
+
+def _structured_result(schema: Type[BaseModel], raw: AIMessage, include_raw: bool) -> Any:
+    """Parses a tool-call message the way `with_structured_output` does."""
+    parsed = parsing_error = None
+    try:
+        if not raw.tool_calls:
+            raise ValueError("Response contains no tool call")
+        parsed = schema.model_validate(raw.tool_calls[0]["args"])
+    except (ValueError, ValidationError) as e:
+        parsing_error = e
+    if include_raw:
+        return {"raw": raw, "parsed": parsed, "parsing_error": parsing_error}
+    if parsing_error is not None:
+        raise parsing_error
+    return parsed
+
+
+class FakeChatModel:
+    """Deterministic offline stand-in for the chat model.
+
+    Answers structured-output requests with schema-valid analyses after a
+    log-normally distributed latency, longer for batches as their answers are
+    generated, and fails a share of them with throttling (429) or server (503)
+    errors. Every outcome is derived from the seed, the
+    prompt and how often that prompt was requested before, so runs are
+    reproducible and retries of a failed prompt can succeed.
+    """
+
+    def __init__(self, latency_median: float = 0.5, latency_sigma: float = 0.5,
+                 throttle_rate: float = 0.0, error_rate: float = 0.0,
+                 throttle_retry_seconds: Optional[int] = None, seed: int = 0):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.throttle_retry_seconds = throttle_retry_seconds
+        self.seed = seed
+        self.requests = Counter()
+
+    def with_structured_output(self, schema: Type[BaseModel], include_raw: bool = False,
+                               **kwargs) -> Runnable:
+        async def respond(prompt: Any) -> Any:
+            return await self._respond(schema, _prompt_text(prompt), include_raw)
+        return RunnableLambda(respond)
+
+    def latency(self, rng: random.Random) -> float:
+        if self.latency_median <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    async def _respond(self, schema: Type[BaseModel], text: str, include_raw: bool) -> Any:
+        key = _prompt_key(schema, text)
+        rng = random.Random(f"{self.seed}:{key}:{self.requests[key]}")
+        self.requests[key] += 1
+        batch = issubclass(schema, schemas.ClauseAnalysisBatch)
+        clause_ids = _CLAUSE_ID_RE.findall(text) if batch else []
+        latency = self.latency(rng) * (1 + _BATCH_ANSWER_COST * max(len(clause_ids) - 1, 0))
+        await asyncio.sleep(latency)
+
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            hint = ""
+            if self.throttle_retry_seconds is not None:
+                hint = f" [retry_delay {{ seconds: {self.throttle_retry_seconds} }}]"
+            raise google_exceptions.ResourceExhausted(f"Fake quota exceeded{hint}")
+        if roll < self.throttle_rate + self.error_rate:
+            raise google_exceptions.ServiceUnavailable("Fake backend unavailable")
+
+        if batch:
+            args = {"analyses": [{**self._analysis(rng, text), "clause_id": int(clause_id)}
+                                 for clause_id in clause_ids]}
+        else:
+            args = self._analysis(rng, text)
+            if "confidence" in schema.model_fields:
+                args["confidence"] = round(rng.betavariate(8, 2), 2)
+        raw = AIMessage(content="", tool_calls=[
+            {"name": schema.__name__, "args": args, "id": key[:16]}])
+        return _structured_result(schema, raw, include_raw)
+
+    @staticmethod
+    def _analysis(rng: random.Random, text: str) -> Dict[str, Any]:
+        words = _WORD_RE.findall(text)[-200:] or ["clause"]
+        return {
+            "category": rng.sample(CATEGORIES, rng.randint(0, 2)),
+            "risk_level": rng.choices(RiskLevel.values(), weights=_RISK_WEIGHTS)[0],
+            "reason": f"The clause concerns {rng.choice(words).lower()}",
+            "key_points": [" ".join(rng.choices(words, k=6)) for _ in range(rng.randint(1, 3))],
+            "conclusion": f"Review the {rng.choice(words).lower()} terms",
+            "is_valid": rng.random() > 0.05,
+        }
+
+
+class CassetteChatModel:
+    """Records structured responses of a real model to disk, or replays them offline.
+
+    With `llm` given every request is passed through and its raw response saved as
+    a JSON cassette named after the schema and prompt; without it responses are
+    only replayed, and prompts without a cassette raise CassetteMissError.
+    Replayed responses are parsed again, so invalid ones still reach output repair.
+    """
+
+    def __init__(self, directory: Path, llm: Optional[ChatGoogleGenerativeAI] = None):
+        self.directory = Path(directory)
+        self.llm = llm
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def with_structured_output(self, schema: Type[BaseModel], include_raw: bool = False,
+                               **kwargs) -> Runnable:
+        recorder = None
+        if self.llm is not None:
+            recorder = self.llm.with_structured_output(schema, include_raw=True)
+
+        async def respond(prompt: Any) -> Any:
+            key = _prompt_key(schema, _prompt_text(prompt))
+            if recorder is None:
+                return _structured_result(schema, self._load(key), include_raw)
+            result = await recorder.ainvoke(prompt)
+            self._save(key, result["raw"])
+            if include_raw:
+                return result
+            if result["parsing_error"] is not None:
+                raise result["parsing_error"]
+            return result["parsed"]
+        return RunnableLambda(respond)
+
+    def _load(self, key: str) -> AIMessage:
+        try:
+            data = json.loads(self._path(key).read_text())
+        except FileNotFoundError:
+            raise CassetteMissError(f"No cassette recorded for prompt {key}") from None
+        return AIMessage(content=data["content"], tool_calls=data["tool_calls"])
+
+    def _save(self, key: str, raw: AIMessage) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"content": raw.content, "tool_calls": raw.tool_calls}, indent=1)
+        # Write to a temp file first so a concurrent replay never reads a partial cassette
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(data)
+        os.replace(tmp_path, self._path(key))
+
+
+# Anything whose `with_structured_output` LLMAnalyzer can build its chains from
+ChatModel = Union[ChatGoogleGenerativeAI, FakeChatModel, CassetteChatModel]
+
+
+def warm_up(llm: ChatModel) -> None:
+    """Opens the model's connection on the running event loop, ahead of its first request.
+
+    Gemini's async client keeps one gRPC channel per loop, and every later request
+    on that loop is multiplexed over it; the offline backends have nothing to open.
+    """
+    if isinstance(llm, CassetteChatModel):
+        llm = llm.llm
+    if isinstance(llm, ChatGoogleGenerativeAI):
+        # The property builds the client, bound to the running loop, on first access
+        llm.async_client
@@ -0,0 +1,180 @@
+import difflib
+import json
+import re
+import typing
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from app.constants import CATEGORIES
+from app.enums import RiskLevel
+
+Model = TypeVar("Model", bound=BaseModel)
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_PYTHON_LITERAL_RE = re.compile(r"\b(True|False|None)\b")
+
+# Values for fields the model sometimes leaves out that don't change the analysis
+# (a missing triage confidence escalates the clause)
+DEFAULTS = {"category": [], "reason": None, "key_points": [], "is_valid": True,
+            "confidence": 0.0}
+
+
+class OutputRepairError(ValueError):
+    """The model's output can't be turned into the schema; the request has to be repeated."""
+
+
+def _close_bracket_stack(text: str) -> str:
+    """Appends the quotes and brackets a truncated JSON text leaves open."""
+    stack = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    return text + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def _normalize(value: str) -> str:
+    return re.sub(r"[\s\-]+", "_", value.strip().lower())
+
+
+class OutputRepairer:
+    """Deterministically fixes structured model output that failed validation.
+
+    Repairs JSON syntax (code fences, trailing commas, Python literals, truncated
+    brackets), fuzzy-matches risk levels and categories onto the allowed
+    vocabularies, coerces single values into lists and fills defaults for
+    omitted fields that don't carry the analysis. Each repair is counted in
+    `stats` as `repaired_<kind>`; output that still doesn't validate raises
+    OutputRepairError.
+    """
+
+    def __init__(self, categories: Iterable[str] = CATEGORIES,
+                 risk_levels: Iterable[str] = RiskLevel.values(),
+                 cutoff: float = 0.75, defaults: Optional[Dict[str, Any]] = None):
+        self.categories = {category.lower(): category for category in categories}
+        self.risk_levels = {_normalize(level): level for level in risk_levels}
+        self.cutoff = cutoff
+        self.defaults = DEFAULTS if defaults is None else defaults
+
+    def repair(self, raw: Any, schema: Type[Model], stats: Counter) -> Model:
+        """`raw` is the model's message, a tool-call arguments dict or a JSON text."""
+        data = self._payload(raw, stats)
+        if not isinstance(data, dict):
+            raise OutputRepairError(f"Expected a JSON object, got {type(data).__name__}")
+        data = self._repair_model(data, schema, stats)
+        try:
+            return schema.model_validate(data)
+        except ValidationError as e:
+            raise OutputRepairError(f"Output can't be repaired: {e}") from e
+
+    def _payload(self, raw: Any, stats: Counter) -> Any:
+        tool_calls = getattr(raw, "tool_calls", None)
+        if tool_calls:
+            return tool_calls[0]["args"]
+        # Tool calls whose arguments weren't valid JSON
+        for call in getattr(raw, "invalid_tool_calls", None) or ():
+            if call.get("args"):
+                return self.parse_json(call["args"], stats)
+        content = getattr(raw, "content", raw)
+        if isinstance(content, str):
+            return self.parse_json(content, stats)
+        return content
+
+    def parse_json(self, text: str, stats: Counter) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        fenced = _FENCE_RE.search(text)
+        if fenced:
+            text = fenced.group(1)
+        starts = [position for position in (text.find("{"), text.find("[")) if position >= 0]
+        if not starts:
+            raise OutputRepairError("Output contains no JSON")
+        text = text[min(starts):]
+        text = _PYTHON_LITERAL_RE.sub(lambda match: _PYTHON_LITERALS[match.group(1)], text)
+        text = _TRAILING_COMMA_RE.sub(r"\1", _close_bracket_stack(text.rstrip().rstrip(",")))
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text)
+        except json.JSONDecodeError as e:
+            raise OutputRepairError(f"Output is not valid JSON: {e}") from e
+        stats["repaired_json_syntax"] += 1
+        return data
+
+    def _repair_model(self, data: Dict[str, Any], schema: Type[BaseModel],
+                      stats: Counter) -> Dict[str, Any]:
+        data = dict(data)
+        for name, field in schema.model_fields.items():
+            if name not in data:
+                if name in self.defaults:
+                    data[name] = self.defaults[name]
+                    stats[f"repaired_missing_{name}"] += 1
+                continue
+            value = data[name]
+            item_type = self._list_item_type(field.annotation)
+            if item_type is not None and value is not None and not isinstance(value, list):
+                value = [value]
+                stats["repaired_list_coercion"] += 1
+            if name == "risk_level":
+                value = self._match_risk_level(value, stats)
+            elif name == "category" and isinstance(value, list):
+                value = self._match_categories(value, stats)
+            elif isinstance(item_type, type) and issubclass(item_type, BaseModel):
+                value = [self._repair_model(item, item_type, stats) if isinstance(item, dict)
+                         else item for item in value]
+            data[name] = value
+        return data
+
+    @staticmethod
+    def _list_item_type(annotation: Any) -> Optional[Any]:
+        if typing.get_origin(annotation) is typing.Union:
+            annotation = next((arg for arg in typing.get_args(annotation)
+                               if arg is not type(None)), None)
+        if typing.get_origin(annotation) is list:
+            return typing.get_args(annotation)[0]
+        return None
+
+    def _closest(self, value: str, vocabulary: Dict[str, str]) -> Optional[str]:
+        matches = difflib.get_close_matches(value, vocabulary, n=1, cutoff=self.cutoff)
+        return vocabulary[matches[0]] if matches else None
+
+    def _match_risk_level(self, value: Any, stats: Counter) -> Any:
+        if not isinstance(value, str) or value in self.risk_levels.values():
+            return value
+        normalized = _normalize(value)
+        # "High risk", "risk: high"
+        mentioned = [level for key, level in self.risk_levels.items()
+                     if re.search(rf"(^|_){key}(_|$)", normalized)]
+        level = (self.risk_levels.get(normalized)
+                 or (mentioned[0] if len(mentioned) == 1 else None)
+                 or self._closest(normalized, self.risk_levels))
+        if level is None:
+            return value
+        stats["repaired_risk_level"] += 1
+        return level
+
+    def _match_categories(self, values: list, stats: Counter) -> list:
+        matched = []
+        for value in values:
+            if not isinstance(value, str):
+                continue
+            category = (self.categories.get(value.strip().lower())
+                        or self._closest(value.strip().lower(), self.categories))
+            if category != value:
+                stats["repaired_category" if category else "dropped_category"] += 1
+            if category and category not in matched:
+                matched.append(category)
+        return matched
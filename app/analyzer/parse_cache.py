@@ -0,0 +1,101 @@
+import hashlib
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+from app.analyzer import schemas
+from app.logger import logger
+
+# Bump when parser output changes in a way the configuration fingerprint doesn't capture
+PARSER_VERSION = 1
+
+
+class ParseCache:
+    """Content-addressed on-disk cache of parsed documents with size-based LRU eviction.
+
+    Entries are zlib-compressed JSON files named after the SHA-256 of the PDF bytes
+    and the parser configuration, so identical uploads share one entry.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, pdf_path: str, parser_fingerprint: str) -> str:
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+        digest.update(f"{PARSER_VERSION}:{parser_fingerprint}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json.z"
+
+    def get(self, key: str) -> Optional[schemas.ParsedDocument]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            parsed = schemas.ParsedDocument.model_validate_json(zlib.decompress(data))
+        except FileNotFoundError:
+            parsed = None
+        except OSError as e:
+            logger.warning(f"Parse cache lookup failed: {e}")
+            parsed = None
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Dropping corrupt parse cache entry {key}: {e}")
+            path.unlink(missing_ok=True)
+            parsed = None
+
+        if parsed is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        try:
+            os.utime(path)  # mtime doubles as the LRU timestamp
+        except OSError as e:
+            logger.warning(f"Parse cache entry {key} could not be touched: {e}")
+        return parsed
+
+    def put(self, key: str, parsed: schemas.ParsedDocument) -> None:
+        """Stores an entry; a full disk or unwritable directory only costs the entry, since
+        the document it was parsed for is analyzed anyway."""
+        data = zlib.compress(parsed.model_dump_json().encode())
+        tmp_path = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file first so concurrent workers never read a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Parse cache store failed: {e}")
+            if tmp_path is not None:
+                Path(tmp_path).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.json.z"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
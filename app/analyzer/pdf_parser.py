@@ -1,95 +1,160 @@
+import json
 import re
-import pymupdf
-from typing import Generator
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate, chain
+from typing import Generator, Iterable, Iterator, Optional, Tuple, Union
 from app.analyzer import schemas
+from app.analyzer.boilerplate import BoilerplateFilter
+from app.analyzer.headings import HeadingClassifier
+from app.analyzer.layout import (
+    DocumentLayout, PageLayout, count_pages, extract_layout, extract_layout_parallel, iter_pages)
 
 
 class PDFParser:
     def __init__(self, min_chapter_lenght: int = 100,
-                 max_chapter_heading_lenght: int = 100, max_words_per_heading: int = 5):
+                 max_chapter_heading_lenght: int = 100, max_words_per_heading: int = 5,
+                 parallel_min_pages: int = 200, parallel_workers: int = 1,
+                 boilerplate_filter: Optional[BoilerplateFilter] = None,
+                 heading_classifier: Optional[HeadingClassifier] = None):
+        # Patterns are matched line-wise over a whole page, so whitespace must not cross "\n"
         self.section_patterns = [
-            r'^[A-Z][A-Z\s,;\–-]{8,}(?:\n|$)',         # Catch big all-caps blocks
-            r'^[A-Z]\.\s+[A-Z][A-Z\s,;\-]{2,}$'     # Catch patterns like A. TERMS; PRIVACY
+            r'^[A-Z](?:[A-Z,;\–-]|[^\S\n]){8,}$',             # Catch big all-caps blocks
+            r'^[A-Z]\.[^\S\n]+[A-Z](?:[A-Z,;\-]|[^\S\n]){2,}$'  # Catch A. TERMS; PRIVACY
         ]
+        self.heading_matcher = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in self.section_patterns), re.MULTILINE)
         self.min_chapter_lenght = min_chapter_lenght
         self.max_chapter_heading_lenght = max_chapter_heading_lenght
         self.max_words_per_heading = max_words_per_heading
-
-    def _match_any_pattern(self, text: str) -> str:
-        stripped = text.strip()
-
-        if (
-            any((re.match(pattern, stripped) for pattern in self.section_patterns))
-            and len(stripped.split()) <= self.max_words_per_heading
+        self.parallel_min_pages = parallel_min_pages
+        self.parallel_workers = parallel_workers
+        self.boilerplate_filter = boilerplate_filter
+        self.heading_classifier = heading_classifier
+
+    def _is_heading_candidate(self, stripped: str) -> bool:
+        return (
+            len(stripped.split()) <= self.max_words_per_heading
             and not stripped.endswith(".")
             and len(stripped) < self.max_chapter_heading_lenght
-        ):
-            return True
-        return False
+        )
 
-    def iter_text(self, path: str) -> Generator[str, None, None]:
+    def _match_any_pattern(self, text: str) -> bool:
+        stripped = text.strip()
+        return bool(self.heading_matcher.match(stripped)) and self._is_heading_candidate(stripped)
+
+    def _iter_heading_indexes(self, page: PageLayout) -> Iterator[int]:
+        """Yields indexes of heading lines in order: lines matching the patterns, running
+        the combined matcher once per page, and lines the heading classifier marked."""
+        indexes = set(page.headings or ())
+        line_starts = list(accumulate((len(line) + 1 for line in page.lines), initial=0))
+        for match in self.heading_matcher.finditer(page.text):
+            index = bisect_right(line_starts, match.start()) - 1
+            if self._is_heading_candidate(page.lines[index]):
+                indexes.add(index)
+        return iter(sorted(indexes))
+
+    @property
+    def config_fingerprint(self) -> str:
+        """Everything that influences parser output, used to key cached parse results."""
+        return json.dumps([
+            self.section_patterns,
+            self.min_chapter_lenght,
+            self.max_chapter_heading_lenght,
+            self.max_words_per_heading,
+            self.boilerplate_filter.config_fingerprint if self.boilerplate_filter else None,
+            self.heading_classifier.config_fingerprint if self.heading_classifier else None,
+        ])
+
+    def _use_parallel(self, path: str) -> Tuple[bool, int]:
+        if self.parallel_workers < 2:
+            return False, 0
+        page_count = count_pages(path)
+        return page_count >= self.parallel_min_pages, page_count
+
+    def extract_layout(self, path: str) -> DocumentLayout:
+        parallel, page_count = self._use_parallel(path)
+        if parallel:
+            return extract_layout_parallel(path, page_count, self.parallel_workers)
+        return extract_layout(path)
+
+    def iter_pages(self, source: Union[str, DocumentLayout],
+                   stats: Optional[Counter] = None) -> Iterator[PageLayout]:
+        """Pages of an extracted layout, or lazily laid out pages of a PDF path.
+
+        Repeated headers, footers and page numbers are stripped when a boilerplate
+        filter is configured, counting what was removed in `stats`, and headings
+        are then marked from font metadata when a heading classifier is.
+        """
+        pages = self._iter_layout_pages(source)
+        if self.boilerplate_filter is not None:
+            pages = self.boilerplate_filter.strip(pages, stats, self._match_any_pattern,
+                                                  self.min_chapter_lenght)
+        if self.heading_classifier is not None:
+            pages = self.heading_classifier.classify(pages)
+        return pages
+
+    def _iter_layout_pages(self, source: Union[str, DocumentLayout]) -> Iterator[PageLayout]:
+        if isinstance(source, DocumentLayout):
+            return iter(source.pages)
+        parallel, page_count = self._use_parallel(source)
+        if parallel:
+            return iter(extract_layout_parallel(source, page_count, self.parallel_workers).pages)
+        return iter_pages(source)
+
+    def iter_text(self, source: Union[str, DocumentLayout]) -> Generator[str, None, None]:
         """Yields text from each page of the PDF document."""
-        doc = pymupdf.open(path)
-        for page in doc:
-            yield page.get_text()
+        for page in self.iter_pages(source):
+            yield page.text
 
     def _is_chapter_valid(self, chapter_text: str) -> bool:
         return len(chapter_text) >= self.min_chapter_lenght
 
-    def has_identifiable_chapters(self, path: str) -> bool:
-        doc = pymupdf.open(path)
+    def _has_heading(self, page: PageLayout) -> bool:
+        return next(self._iter_heading_indexes(page), None) is not None
 
-        for page in doc:
-            blocks = page.get_text("dict")["blocks"]
+    def has_identifiable_chapters(self, source: Union[str, DocumentLayout]) -> bool:
+        # Found a chapter heading, or no matching headings found
+        return any(self._has_heading(page) for page in self.iter_pages(source))
 
-            for block in blocks:
-                if "lines" not in block:
-                    continue
-                for line in block["lines"]:
-                    line_text = " ".join(span["text"] for span in line["spans"]).strip()
-                    if self._match_any_pattern(line_text):
-                        return True  # Found a chapter heading
-        return False  # No matching headings found
-
-    def parse_using_re(self, path: str) -> Generator[schemas.DocumentChapter, None, None]:
-        doc = pymupdf.open(path)
+    def parse_using_re(self, source: Union[str, DocumentLayout]
+                       ) -> Generator[schemas.DocumentChapter, None, None]:
+        return self._assemble_chapters(self.iter_pages(source))
 
+    def _assemble_chapters(self, pages: Iterable[PageLayout]
+                           ) -> Generator[schemas.DocumentChapter, None, None]:
         current_chapter_name = "File beginning"
         current_chapter_lines = []
         current_page_start = 1
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            blocks = page.get_text("dict")["blocks"]
-
-            for block in blocks:
-                if "lines" not in block:
-                    continue
-
-                for line in block["lines"]:
-                    line_text = " ".join(span["text"] for span in line["spans"]).strip()
-
-                    if self._match_any_pattern(line_text):
-                        chapter_text = " ".join(current_chapter_lines).strip()
-                        is_valid_chapter = self._is_chapter_valid(chapter_text)
-                        if is_valid_chapter:
-                            yield schemas.DocumentChapter(
-                                chapter_name=current_chapter_name,
-                                chapter_text=chapter_text,
-                                page_start=current_page_start + 1,
-                                page_end=page_num + 1
-                            )
-
-                        # Start new chapter
-                        current_chapter_name = line_text
-                        current_chapter_lines = []
-                        current_page_start = page_num
-
-                        # If chapter was not valid add to the next chapter to avoid missing context
-                        if not is_valid_chapter and chapter_text:
-                            current_chapter_lines.append(chapter_text)
-                    else:
-                        current_chapter_lines.append(line_text)
+        page_count = 0
+
+        for page in pages:
+            page_count = page.number + 1
+            page_num = page.number
+            headings = set(self._iter_heading_indexes(page))
+
+            for index, line_text in enumerate(page.lines):
+                if index in headings:
+                    chapter_text = " ".join(current_chapter_lines).strip()
+                    is_valid_chapter = self._is_chapter_valid(chapter_text)
+                    if is_valid_chapter:
+                        yield schemas.DocumentChapter(
+                            chapter_name=current_chapter_name,
+                            chapter_text=chapter_text,
+                            page_start=current_page_start + 1,
+                            page_end=page_num + 1
+                        )
+
+                    # Start new chapter
+                    current_chapter_name = line_text
+                    current_chapter_lines = []
+                    current_page_start = page_num
+
+                    # If chapter was not valid add to the next chapter to avoid missing context
+                    if not is_valid_chapter and chapter_text:
+                        current_chapter_lines.append(chapter_text)
+                else:
+                    current_chapter_lines.append(line_text)
 
         # Emit the last chapter
         final_text = " ".join(current_chapter_lines).strip()
@@ -98,5 +163,35 @@ class PDFParser:
                 chapter_name=current_chapter_name,
                 chapter_text=final_text,
                 page_start=current_page_start + 1,
-                page_end=len(doc)
+                page_end=page_count
+            )
+
+    def iter_parse(self, source: Union[str, DocumentLayout], stats: Optional[Counter] = None
+                   ) -> Tuple[bool, Iterator[schemas.DocumentChapter]]:
+        """Streaming variant of `parse`.
+
+        Pages are read only until the first heading decides between chapters and
+        pages; the rest of the document is laid out as the returned iterator is consumed.
+        """
+        pages = self.iter_pages(source, stats)
+        read = []
+        for page in pages:
+            read.append(page)
+            if self._has_heading(page):
+                return True, self._assemble_chapters(chain(read, pages))
+
+        return False, (
+            schemas.DocumentChapter(
+                chapter_name=f"Page {page.number + 1}",
+                chapter_text=page.text,
+                page_start=page.number + 1,
+                page_end=page.number + 1
             )
+            for page in read
+        )
+
+    def parse(self, source: Union[str, DocumentLayout],
+              stats: Optional[Counter] = None) -> schemas.ParsedDocument:
+        """Parses chapters, falling back to one pseudo-chapter per page."""
+        has_chapters, chapters = self.iter_parse(source, stats)
+        return schemas.ParsedDocument(has_chapters=has_chapters, chapters=list(chapters))
@@ -1,16 +1,58 @@
-from limits import RateLimitItemPerMinute
-from limits.strategies import MovingWindowRateLimiter
-from limits.storage import RedisStorage
-from app.config import settings
+import asyncio
+from typing import List
+import redis.asyncio as aioredis
+from app.logger import logger
 
-REDIS_URL = settings.REDIS_URL
+# Generic cell rate algorithm: the key holds the theoretical arrival time (TAT) of the
+# next free slot in microseconds of Redis server time, so all workers share one clock.
+# Each reserved slot pushes the TAT one emission interval further and gets a wait of
+# how far its start lies in the future, beyond the burst tolerance.
+_RESERVE_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local count = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local waits = {}
+for i = 1, count do
+    waits[i] = math.max(tat - tolerance - now, 0)
+    tat = tat + interval
+end
+redis.call('SET', KEYS[1], string.format('%.0f', tat),
+           'PX', math.ceil((tat - now) / 1000) + 1)
+return waits
+"""
 
-storage = RedisStorage(REDIS_URL)
-limiter = MovingWindowRateLimiter(storage)
 
-RATE_LIMIT = RateLimitItemPerMinute(settings.LLM_REQUESTS_PER_MINUTE)
+class RateLimiter:
+    """Cluster-wide requests-per-minute limit that reserves slots instead of polling.
 
+    A reservation is atomic and final: the returned wait is exactly how long until
+    the reserved slot starts, so callers sleep once and proceed without re-checking.
+    `burst` slots may start back to back after an idle period.
+    """
 
-def is_allowed(limit_key: str) -> bool:
-    key = f"rate_limit:{limit_key}"
-    return limiter.hit(RATE_LIMIT, key)
+    def __init__(self, redis: aioredis.Redis, key: str, requests_per_minute: int,
+                 burst: int = 1):
+        self.redis = redis
+        self.key = f"rate_limit:{key}"
+        self.interval_us = 60_000_000 // requests_per_minute
+        self.tolerance_us = (burst - 1) * self.interval_us
+        self._reserve = redis.register_script(_RESERVE_SCRIPT)
+
+    async def reserve(self, count: int = 1) -> List[float]:
+        """Reserves `count` consecutive slots in one round trip; returns the wait for each."""
+        waits = await self._reserve(keys=[self.key],
+                                    args=[self.interval_us, self.tolerance_us, count])
+        return [wait / 1_000_000 for wait in waits]
+
+    async def acquire(self) -> None:
+        """Waits until a freshly reserved slot starts."""
+        wait, = await self.reserve()
+        if wait > 0:
+            logger.debug(f"Rate limit reached, next slot in {wait:.2f}s")
+            await asyncio.sleep(wait)
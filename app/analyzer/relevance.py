@@ -0,0 +1,73 @@
+import math
+import re
+from typing import Dict, Optional
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*")
+_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)*\.?(?![\w])")
+# Terms that carry rights, duties or money; a clause worth analyzing has several
+_LEGAL_RE = re.compile(
+    r"\b(?:shall|must|may not|agree\w*|terminat\w*|suspend\w*|cancel\w*|liab\w*|warrant\w*|"
+    r"indemn\w*|arbitrat\w*|waive\w*|refund\w*|fees?|charge\w*|payment\w*|renew\w*|"
+    r"licen[cs]\w*|personal data|privacy|consent\w*|obligat\w*|responsib\w*|governing law|"
+    r"jurisdiction|disputes?|class action|modif\w*|third[- ]part\w*|reserve\w* the right|"
+    r"without notice|at any time|damages|breach\w*|prohibit\w*|restrict\w*)\b",
+    re.IGNORECASE)
+_LEADER_RE = re.compile(r"(?:\.\s?){4,}\s*\d+|\s\.{2,}\s")
+_CONTACT_RE = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+|https?://\S+|www\.\S+|\+?\d[\d\s().-]{7,}\d|"
+    r"\b(?:street|st\.|avenue|ave\.|suite|floor|p\.?\s?o\.? box|zip|postcode|phone|tel\.?|"
+    r"fax|e-?mail|inc\.|ltd\.?|llc|gmbh)(?!\w)",
+    re.IGNORECASE)
+_DEFINITION_RE = re.compile(
+    r"[\"“'‘][^\"”'’]{1,50}[\"”'’]\s*(?:means|refers to|shall mean|has the meaning|includes)\b",
+    re.IGNORECASE)
+
+# Chapters the parser puts before the first heading: titles, dates, company details
+PREAMBLE_CHAPTERS = {"file beginning"}
+
+
+class RelevanceFilter:
+    """Scores chunks for legal-risk relevance before they cost an LLM request.
+
+    A small hand-weighted logistic model over regex features: density of legal
+    terms, numbers (tables of contents, page lists), contact details,
+    definition entries, dot leaders and length, plus a penalty for the preamble
+    before the first heading. Chunks scoring below `threshold` are skipped.
+    Scores are cheap enough to compute on the parsing thread.
+    """
+
+    WEIGHTS = {
+        "bias": 0.5,
+        "legal": 1.2,        # legal terms per 20 words, capped at 4
+        "numbers": -9.0,     # numbers per word
+        "contact": -2.0,     # contact details per 20 words
+        "definitions": -1.5,  # definition entries per 50 words
+        "leaders": -1.5,     # dot leaders per 20 words
+        "short": -2.0,       # fewer than 12 words
+        "preamble": -1.0,
+    }
+
+    def __init__(self, threshold: float = 0.3, weights: Optional[Dict[str, float]] = None):
+        self.threshold = threshold
+        self.weights = {**self.WEIGHTS, **(weights or {})}
+
+    def features(self, text: str, chapter_name: Optional[str] = None) -> Dict[str, float]:
+        words = max(len(_WORD_RE.findall(text)), 1)
+        return {
+            "bias": 1.0,
+            "legal": min(len(_LEGAL_RE.findall(text)) * 20 / words, 4.0),
+            "numbers": min(len(_NUMBER_RE.findall(text)) / words, 1.0),
+            "contact": min(len(_CONTACT_RE.findall(text)) * 20 / words, 4.0),
+            "definitions": min(len(_DEFINITION_RE.findall(text)) * 50 / words, 4.0),
+            "leaders": min(len(_LEADER_RE.findall(text)) * 20 / words, 4.0),
+            "short": float(words < 12),
+            "preamble": float((chapter_name or "").strip().lower() in PREAMBLE_CHAPTERS),
+        }
+
+    def score(self, text: str, chapter_name: Optional[str] = None) -> float:
+        features = self.features(text, chapter_name)
+        z = sum(self.weights[name] * value for name, value in features.items())
+        return 1 / (1 + math.exp(-z))
+
+    def is_relevant(self, text: str, chapter_name: Optional[str] = None) -> bool:
+        return self.score(text, chapter_name) >= self.threshold
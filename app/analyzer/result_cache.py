@@ -0,0 +1,75 @@
+import hashlib
+import json
+import time
+from typing import Optional
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from app.analyzer import schemas
+from app.logger import logger
+
+
+class ResultCache:
+    """Cross-document cache of clause analyses in Redis, keyed by chunk content.
+
+    Entries expire after `ttl_seconds`; a sorted set of last-access times keeps at
+    most `max_entries` of them by evicting the least recently used.
+    Redis errors are logged and treated as misses so analysis never depends on the cache.
+    """
+
+    INDEX_KEY = "llm_cache:index"
+
+    def __init__(self, redis: Redis, model_name: str, temperature: float, prompt_version: int,
+                 ttl_seconds: int, max_entries: int):
+        self.redis = redis
+        self.model_name = model_name
+        self.temperature = temperature
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def key(self, text: str, user_context: str) -> str:
+        payload = json.dumps([
+            self.normalize(text),
+            self.normalize(user_context),
+            self.prompt_version,
+            self.model_name,
+            self.temperature,
+        ])
+        return "llm_cache:" + hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[schemas.ClauseAnalysis]:
+        try:
+            data = await self.redis.get(key)
+            if data is None:
+                return None
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.expire(key, self.ttl_seconds)
+                pipe.zadd(self.INDEX_KEY, {key: time.time()})
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"LLM result cache lookup failed: {e}")
+            return None
+        return schemas.ClauseAnalysis.model_validate_json(data)
+
+    async def set(self, key: str, analysis: schemas.ClauseAnalysis) -> None:
+        # Store only the clause fields, chapter metadata belongs to the requesting document
+        data = analysis.model_dump_json(include=set(schemas.ClauseAnalysis.model_fields))
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, data, ex=self.ttl_seconds)
+                pipe.zadd(self.INDEX_KEY, {key: time.time()})
+                pipe.zcard(self.INDEX_KEY)
+                *_, size = await pipe.execute()
+            if size > self.max_entries:
+                await self._evict(size - self.max_entries)
+        except RedisError as e:
+            logger.warning(f"LLM result cache store failed: {e}")
+
+    async def _evict(self, count: int) -> None:
+        evicted = await self.redis.zpopmin(self.INDEX_KEY, count)
+        if evicted:
+            await self.redis.delete(*(key for key, _ in evicted))
@@ -0,0 +1,129 @@
+import hashlib
+from collections import Counter
+from typing import Set, Union
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import PyMongoError
+from app.analyzer import schemas
+from app.enums import DocumentStatus
+from app.logger import logger
+
+# Clauses stored before results were keyed have no chunk_key; a plain unique index would
+# index them all under a null key and fail to build once there are two of them
+KEYED_ONLY = {"chunk_key": {"$exists": True}}
+
+
+async def ensure_indexes(collection: AsyncIOMotorCollection,
+                         failures: AsyncIOMotorCollection) -> None:
+    """Creates the unique chunk key indexes; run once at startup, not per analysis."""
+    for target in (collection, failures):
+        await target.create_index("chunk_key", unique=True, partialFilterExpression=KEYED_ONLY)
+
+
+class ResultStore:
+    """Writes chunk analyses to Mongo as they complete, so a re-run only pays for the rest.
+
+    Every stored analysis, valid or not, carries a `chunk_key` made of the document id,
+    the chunk index and a hash of the chunk text. A chunk whose key is already stored
+    is skipped on the next run; a changed chunking produces new keys, and `prune`
+    removes the results the finished run no longer produced.
+
+    Chunks that failed are recorded in `failures` with their error class until a later
+    run analyzes them, which is what the partially analyzed status is based on. Chunks
+    the relevance pre-filter skipped are stored with `skipped` set and no `is_valid`,
+    so they count as done but never show up as clauses.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection,
+                 failures: AsyncIOMotorCollection, document_id: int):
+        self.collection = collection
+        self.failures = failures
+        self.document_id = document_id
+        self.completed: Set[str] = set()
+        self.seen: Set[str] = set()
+        self.stats = Counter()
+
+    def chunk_key(self, chunk: schemas.DocumentChunk) -> str:
+        digest = hashlib.sha256(chunk.text.encode()).hexdigest()[:16]
+        return f"{self.document_id}:{chunk.index}:{digest}"
+
+    async def load_completed(self, retry_invalid: bool = False) -> None:
+        """Loads the keys to skip; with `retry_invalid`, invalid clauses are analyzed again."""
+        query = {"document_id": self.document_id}
+        if retry_invalid:
+            query["is_valid"] = True
+        self.completed = set(await self.collection.distinct("chunk_key", query))
+        if self.completed:
+            logger.info(f"Resuming document {self.document_id}: "
+                        f"{len(self.completed)} chunks already analyzed")
+
+    def is_completed(self, chunk: schemas.DocumentChunk) -> bool:
+        key = self.chunk_key(chunk)
+        self.seen.add(key)
+        if key in self.completed:
+            self.stats["skipped"] += 1
+            return True
+        return False
+
+    async def save(self, chunk: schemas.DocumentChunk,
+                   result: Union[schemas.ClauseAnalysis, schemas.SkippedChunk, Exception]
+                   ) -> None:
+        key = self.chunk_key(chunk)
+        if isinstance(result, Exception):
+            await self._save_failure(key, chunk, result)
+            return
+
+        clause_dict = result.model_dump()
+        if isinstance(result, schemas.SkippedChunk):
+            clause_dict["skipped"] = True
+            clause_dict["chapter_name"] = chunk.chapter.chapter_name if chunk.chapter else None
+            clause_dict["text"] = chunk.text
+        clause_dict["document_id"] = self.document_id
+        clause_dict["chunk_index"] = chunk.index
+        clause_dict["chunk_key"] = key
+        # Upsert so a chunk finished twice by overlapping runs is stored once
+        await self.collection.replace_one({"chunk_key": key}, clause_dict, upsert=True)
+        await self.failures.delete_one({"chunk_key": key})
+        self.stats["skipped_irrelevant" if isinstance(result, schemas.SkippedChunk)
+                   else "saved"] += 1
+
+    async def _save_failure(self, key: str, chunk: schemas.DocumentChunk,
+                            error: Exception) -> None:
+        # Retry wrappers raise from the underlying error, which is the useful one
+        cause = error.__cause__ or error
+        failure = {
+            "document_id": self.document_id,
+            "chunk_index": chunk.index,
+            "chunk_key": key,
+            "chapter_name": chunk.chapter.chapter_name if chunk.chapter else None,
+            "page_start": chunk.chapter.page_start if chunk.chapter else None,
+            "page_end": chunk.chapter.page_end if chunk.chapter else None,
+            "error_class": type(cause).__name__,
+            "error": str(cause),
+        }
+        await self.failures.replace_one({"chunk_key": key}, failure, upsert=True)
+        self.stats["failed"] += 1
+
+    async def prune(self) -> None:
+        """Drops results of chunks that no longer exist, e.g. after chunking settings changed."""
+        query = {"document_id": self.document_id, "chunk_key": {"$nin": list(self.seen)}}
+        try:
+            deleted = await self.collection.delete_many(query)
+            await self.failures.delete_many(query)
+        except PyMongoError as e:
+            logger.warning(f"Failed to prune stale results of document {self.document_id}: {e}")
+            return
+        if deleted.deleted_count:
+            logger.info(f"Pruned {deleted.deleted_count} stale results "
+                        f"of document {self.document_id}")
+
+    def document_status(self) -> DocumentStatus:
+        return document_status(self.stats)
+
+
+def document_status(stats: Counter) -> DocumentStatus:
+    """Status of a document from the counts of one or more ResultStores over its chunks."""
+    if not stats["failed"]:
+        return DocumentStatus.ANALYZED
+    if stats["saved"] or stats["skipped"]:
+        return DocumentStatus.PARTIALLY_ANALYZED
+    return DocumentStatus.FAILED
@@ -0,0 +1,163 @@
+import random
+import re
+from collections import Counter
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Optional
+from google.api_core import exceptions as google_exceptions
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from app.logger import logger
+
+
+class ErrorClass(str, Enum):
+    THROTTLE = "throttle"    # quota or rate limit; retry after the server's hint if any
+    TRANSIENT = "transient"  # timeouts and server errors; retry with backoff
+    PERMANENT = "permanent"  # same request would fail again; don't retry
+
+
+THROTTLE_ERRORS = (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted)
+TRANSIENT_ERRORS = (
+    google_exceptions.ServerError,
+    google_exceptions.DeadlineExceeded,
+    TimeoutError,
+    ConnectionError,
+)
+# Rejected requests (bad argument, auth, not found). Output that failed parsing is left
+# transient: sampling again usually fixes it.
+PERMANENT_ERRORS = (google_exceptions.ClientError,)
+
+# Gemini reports quota delays as a RetryInfo detail, e.g. "retry_delay { seconds: 27 }"
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)")
+
+
+def _causes(error: BaseException):
+    """The error followed by what it was raised from, outermost first."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def retry_hint(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from a RetryInfo detail or a Retry-After header."""
+    for cause in _causes(error):
+        for detail in getattr(cause, "details", None) or ():
+            delay = getattr(detail, "retry_delay", None)
+            if delay is not None:
+                return delay.seconds + delay.nanos / 1e9
+
+        headers = getattr(getattr(cause, "response", None), "headers", None)
+        if headers is not None and headers.get("retry-after") is not None:
+            hint = _parse_retry_after(headers.get("retry-after"))
+            if hint is not None:
+                return hint
+
+        match = _RETRY_DELAY_RE.search(str(cause))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """Decides whether and when to retry a failed LLM request.
+
+    Errors are classified by the first recognised error in their cause chain;
+    unrecognised ones count as transient. Retryable errors wait for the server's
+    hint if it gave one, otherwise for a decorrelated-jitter backoff
+    (uniform between `base_delay` and three times the previous delay, capped at
+    `max_delay`), which keeps workers from retrying in lockstep.
+
+    Retries are also capped per document: at most `budget_min_retries` plus
+    `budget_ratio` of its first attempts, so an outage fails documents quickly
+    instead of multiplying traffic. The chunk tasks of a fanned-out document draw
+    from one budget, see `SharedRetryBudget`. Override `classify` to plug in other rules.
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 60.0,
+                 budget_min_retries: int = 10, budget_ratio: float = 0.2,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_min_retries = budget_min_retries
+        self.budget_ratio = budget_ratio
+        self.rng = rng or random.Random()
+
+    def classify(self, error: BaseException) -> ErrorClass:
+        for cause in _causes(error):
+            if isinstance(cause, THROTTLE_ERRORS):
+                return ErrorClass.THROTTLE
+            if isinstance(cause, TRANSIENT_ERRORS):
+                return ErrorClass.TRANSIENT
+            if isinstance(cause, PERMANENT_ERRORS):
+                return ErrorClass.PERMANENT
+        return ErrorClass.TRANSIENT
+
+    def backoff(self, previous_delay: float) -> float:
+        upper = max(previous_delay * 3, self.base_delay)
+        return min(self.max_delay, self.rng.uniform(self.base_delay, upper))
+
+    def delay(self, error: BaseException, previous_delay: float) -> float:
+        hint = retry_hint(error)
+        if hint is not None:
+            return hint
+        return self.backoff(previous_delay)
+
+    def within_budget(self, stats: Counter) -> bool:
+        """`stats` are the document's counters of `llm_requests` and `retries` so far."""
+        first_attempts = stats["llm_requests"] - stats["retries"]
+        return stats["retries"] < self.budget_min_retries + self.budget_ratio * first_attempts
+
+
+class SharedRetryBudget:
+    """Counts of `llm_requests` and `retries` pooled in Redis by the chunk tasks of a
+    fanned-out document, so its retry budget holds however many tasks it is split into.
+
+    The counts are kept next to the run's chunks, under the same TTL. If Redis fails, a
+    task falls back to its own counts, i.e. a budget of its own.
+    """
+
+    def __init__(self, redis: Redis, chunk_key: str, ttl_seconds: int):
+        self.redis = redis
+        self.key = f"{chunk_key}:retry_budget"
+        self.ttl_seconds = ttl_seconds
+
+    async def record(self, field: str) -> None:
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hincrby(self.key, field, 1)
+                pipe.expire(self.key, self.ttl_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Shared retry budget update failed: {e}")
+
+    async def spent(self, stats: Counter) -> Counter:
+        """The document's counts so far, or the task's own `stats` if Redis failed."""
+        try:
+            counts = await self.redis.hgetall(self.key)
+        except RedisError as e:
+            logger.warning(f"Shared retry budget lookup failed: {e}")
+            return stats
+        return Counter({field.decode(): int(count) for field, count in counts.items()})
+
+
+# Retry budget of the fanned-out document being analyzed; set once per chunk task, None for
+# documents analyzed by a single task, whose pipeline stats are the whole document's
+current_retry_budget: ContextVar[Optional[SharedRetryBudget]] = ContextVar(
+    "current_retry_budget", default=None)
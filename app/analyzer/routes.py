@@ -1,18 +1,28 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.analyzer import schemas
+from app.analyzer.analysis_lock import AnalysisLock
+from app.analyzer.document_repository import DocumentRepository
 from app.db.db import get_db
 from app import utils, models
-from app.tasks import analyze_document
+from app.tasks import queue_analysis
 from app.enums import DocumentStatus
-from app.db.mongo import clauses_collection
+from app.db.mongo import clauses_collection, failed_chunks_collection
 from app.auth.dependencies import get_current_user
 from app.auth.schemas import User
+from functools import lru_cache
 from typing import List
 
 router = APIRouter()
 
 
+@lru_cache(maxsize=None)
+def get_analysis_lock() -> AnalysisLock:
+    # One Redis client for the server's event loop
+    return utils.get_analysis_lock()
+
+
 @router.post("/document/", response_model=schemas.Document)
 async def upload_document(
     current_user: User = Depends(get_current_user),
@@ -27,12 +37,15 @@ async def upload_document(
         )
 
     file_url = await utils.save_upload_file(document)
+    # Opening the PDF blocks, so it runs off the event loop
+    page_count = await run_in_threadpool(utils.read_page_count, file_url)
 
     db_document = models.Document(
         user_context=user_context,
         user_id=current_user.id,
         file_url=file_url,
-        status=DocumentStatus.UPLOADED
+        status=DocumentStatus.UPLOADED,
+        page_count=page_count
     )
 
     db.add(db_document)
@@ -44,8 +57,10 @@ async def upload_document(
 @router.post("/document/{document_id}/analyze")
 async def start_analysis(
     document_id: int,
+    retry_invalid: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    analysis_lock: AnalysisLock = Depends(get_analysis_lock)
 ):
     db_document = db.query(models.Document).filter(
         models.Document.id == document_id,
@@ -58,26 +73,41 @@ async def start_analysis(
             detail="Document not found"
         )
 
-    if db_document.status == DocumentStatus.UPLOADED or db_document.status == DocumentStatus.FAILED:
-        try:
-            analyze_document.delay(document_id)
-            db_document.status = DocumentStatus.QUED_FOR_ANALYSIS
-            db.commit()
-            db.refresh(db_document)
-            return {"status": db_document.status}
-        except Exception:
-            db_document.status = DocumentStatus.FAILED
-            db.commit()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to start analysis task"
-            )
-    else:
+    # Re-queued documents only analyze chunks without a stored result: the failed ones,
+    # plus the invalid ones if `retry_invalid` is set
+    restartable = [DocumentStatus.UPLOADED, DocumentStatus.FAILED,
+                   DocumentStatus.PARTIALLY_ANALYZED]
+    if retry_invalid:
+        restartable.append(DocumentStatus.ANALYZED)
+    # A processing document without a lock lost its worker; a new run supersedes the old one
+    if (db_document.status == DocumentStatus.PROCESSING
+            and not await analysis_lock.held(document_id)):
+        restartable.append(DocumentStatus.PROCESSING)
+
+    # Checked and set in one UPDATE, so of concurrent requests and client retries only one
+    # queues an analysis; the run id it gets makes its task the only one that may run
+    document_repo = DocumentRepository(db)
+    run_id = document_repo.queue_for_analysis(document_id, restartable)
+    if run_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Document is already being analyzed or has been analyzed."
         )
 
+    # Routed on the page count stored at upload; documents uploaded before it was stored
+    # have their PDF opened, and publishing blocks too, so both run off the event loop
+    try:
+        await run_in_threadpool(queue_analysis, document_id, db_document.file_url,
+                                retry_invalid, run_id, db_document.page_count)
+    except Exception:
+        document_repo.transition_status(document_id, run_id, [DocumentStatus.QUED_FOR_ANALYSIS],
+                                        DocumentStatus.FAILED)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start analysis task"
+        )
+    return {"status": DocumentStatus.QUED_FOR_ANALYSIS}
+
 
 @router.get("/document/{document_id}/status", response_model=schemas.DocumentStatusResponse)
 async def get_document_status(
@@ -143,15 +173,61 @@ async def get_clauses(
             detail="Document not found"
         )
 
-    if db_document.status != DocumentStatus.ANALYZED:
+    if db_document.status not in (DocumentStatus.ANALYZED, DocumentStatus.PARTIALLY_ANALYZED):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Document has not been analyzed yet"
         )
-    cursor = clauses_collection.find({"document_id": document_id})
+    cursor = clauses_collection.find(
+        {"document_id": document_id, "is_valid": True}).sort("chunk_index", 1)
     analysis = []
     async for clause in cursor:
         clause["id"] = str(clause["_id"])
         analysis.append(schemas.ClauseAnalysisResponse(**clause))
 
     return analysis
+
+
+@router.get("/document/{document_id}/skipped-chunks",
+            response_model=List[schemas.SkippedChunkResponse])
+async def get_skipped_chunks(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    db_document = db.query(models.Document).filter(
+        models.Document.id == document_id,
+        models.Document.user_id == current_user.id
+    ).first()
+
+    if not db_document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+
+    cursor = clauses_collection.find(
+        {"document_id": document_id, "skipped": True}).sort("chunk_index", 1)
+    return [schemas.SkippedChunkResponse(**skipped) async for skipped in cursor]
+
+
+@router.get("/document/{document_id}/failed-chunks",
+            response_model=List[schemas.FailedChunkResponse])
+async def get_failed_chunks(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    db_document = db.query(models.Document).filter(
+        models.Document.id == document_id,
+        models.Document.user_id == current_user.id
+    ).first()
+
+    if not db_document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+
+    cursor = failed_chunks_collection.find({"document_id": document_id}).sort("chunk_index", 1)
+    return [schemas.FailedChunkResponse(**failure) async for failure in cursor]
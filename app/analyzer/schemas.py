@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 from app import enums
 from typing import Optional, List
 
@@ -8,6 +9,7 @@ class Document(BaseModel):
     user_context: Optional[str] = None
     file_url: str
     status: str
+    page_count: Optional[int] = None
 
 
 class DocumentStatusResponse(BaseModel):
@@ -22,6 +24,22 @@ class DocumentChapter(BaseModel):
     page_end: Optional[int] = None
 
 
+class DocumentChunk(BaseModel):
+    """A piece of a chapter or page small enough to be analyzed in one LLM request."""
+
+    index: int
+    text: str
+    tokens: int = 0
+    chapter: Optional[DocumentChapter] = None
+
+
+class ParsedDocument(BaseModel):
+    """Parser output: chapters, or one pseudo-chapter per page when no headings were found."""
+
+    has_chapters: bool
+    chapters: List[DocumentChapter]
+
+
 class ClauseAnalysis(BaseModel):
     """Analysis result for a Terms & Conditions clause."""
 
@@ -47,6 +65,37 @@ class ClauseAnalysis(BaseModel):
         )
     )
 
+    # Set by the analyzer, never asked from the model
+    tier: SkipJsonSchema[Optional[str]] = Field(
+        default=None, description="Model tier that produced the analysis in cascade mode")
+
+
+class TriageAnalysis(ClauseAnalysis):
+    """Analysis by the fast triage model, which escalates doubtful clauses."""
+
+    confidence: float = Field(
+        description="How confident you are in the risk level, from 0 (guess) to 1 (certain)")
+
+
+class BatchClauseAnalysis(ClauseAnalysis):
+    """Analysis result for one clause of a batched request."""
+
+    clause_id: int = Field(description="Id of the clause this analysis belongs to")
+
+
+class ClauseAnalysisBatch(BaseModel):
+    """Analysis results for a batch of Terms & Conditions clauses."""
+
+    analyses: List[BatchClauseAnalysis] = Field(
+        description="Exactly one analysis for every clause in the batch")
+
+
+class SkippedChunk(BaseModel):
+    """Outcome of a chunk the relevance pre-filter kept from the LLM."""
+
+    relevance: float = Field(description="Relevance score the chunk got, between 0 and 1")
+    threshold: float = Field(description="Score a chunk needed to be analyzed")
+
 
 class ChapterAnalysis(ClauseAnalysis):
     """Analysis result for a chapter in the Terms & Conditions document."""
@@ -60,5 +109,29 @@ class ChapterAnalysis(ClauseAnalysis):
 class ClauseAnalysisResponse(ChapterAnalysis):
     """Response model for clause analysis with additional metadata."""
 
+    tier: Optional[str] = Field(
+        default=None, description="Model tier that produced the analysis in cascade mode")
     document_id: int = Field(description="ID of the document this clause belongs to")
     id: str = Field(description="Unique identifier for the clause in the database")
+
+
+class SkippedChunkResponse(SkippedChunk):
+    """A chunk that was judged non-substantive and not analyzed."""
+
+    document_id: int = Field(description="ID of the document this chunk belongs to")
+    chunk_index: int = Field(description="Position of the chunk in the document")
+    chapter_name: Optional[str] = Field(default=None, description="Chapter the chunk belongs to")
+    text: str = Field(description="Text of the chunk")
+
+
+class FailedChunkResponse(BaseModel):
+    """A chunk whose analysis failed; re-queuing the document retries it."""
+
+    document_id: int = Field(description="ID of the document this chunk belongs to")
+    chunk_index: int = Field(description="Position of the chunk in the document")
+    chunk_key: str = Field(description="Document, chunk index and text hash of the chunk")
+    chapter_name: Optional[str] = Field(default=None, description="Chapter the chunk belongs to")
+    page_start: Optional[int] = Field(default=None, description="Starting page of the chapter")
+    page_end: Optional[int] = Field(default=None, description="Ending page of the chapter")
+    error_class: str = Field(description="Exception type the analysis failed with")
+    error: str = Field(description="Error message")
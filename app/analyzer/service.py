@@ -1,21 +1,93 @@
+import asyncio
+from collections import Counter
 from app.analyzer.pdf_parser import PDFParser
-from app.analyzer.llm_analyzer import LLMAnalyzer
+from app.analyzer.llm_analyzer import ChunkFilter, LLMAnalyzer, ResultSink
+from app.analyzer.parse_cache import ParseCache
+from app.analyzer.chunk_store import ChunkStore
+from app.analyzer.analysis_lock import AnalysisLock
 from app.analyzer import schemas
-from typing import List, Union
+from app.logger import logger
+from typing import Iterator, List, Optional, Tuple, Union
 
 
 class AnalyzerService:
-    def __init__(self, analyzer: LLMAnalyzer, parser: PDFParser):
+    def __init__(self, analyzer: LLMAnalyzer, parser: PDFParser,
+                 parse_cache: Optional[ParseCache] = None,
+                 chunk_store: Optional[ChunkStore] = None,
+                 analysis_lock: Optional[AnalysisLock] = None):
         self.analyzer = analyzer
         self.parser = parser
+        self.parse_cache = parse_cache
+        # Where fanned-out documents keep their chunks; None disables fan-out
+        self.chunk_store = chunk_store
+        # Keeps tasks of different runs from analyzing a document at once; None disables it
+        self.analysis_lock = analysis_lock
+
+    def parse(self, pdf_path: str) -> schemas.ParsedDocument:
+        if self.parse_cache is None:
+            return self.parser.parse(pdf_path)
+
+        key = self.parse_cache.key(pdf_path, self.parser.config_fingerprint)
+        parsed = self.parse_cache.get(key)
+        if parsed is None:
+            parsed = self.parser.parse(pdf_path)
+            self.parse_cache.put(key, parsed)
+        logger.info(f"Parse cache stats: {self.parse_cache.stats()}")
+        return parsed
 
     async def analyze(self,
                       pdf_path: str,
                       user_context: str) -> Union[List[schemas.ClauseAnalysis],
                                                   List[schemas.ChapterAnalysis]]:
-        if self.parser.has_identifiable_chapters(pdf_path):
-            chapter_gen = self.parser.parse_using_re(pdf_path)
-            return await self.analyzer.analyze_document_per_chapter(chapter_gen, user_context)
+        parsed = self.parse(pdf_path)
+        if parsed.has_chapters:
+            return await self.analyzer.analyze_document_per_chapter(parsed.chapters, user_context)
         else:
-            page_text_gen = self.parser.iter_text(pdf_path)
+            page_text_gen = (page.chapter_text for page in parsed.chapters)
             return await self.analyzer.analyze_document_per_page(page_text_gen, user_context)
+
+    async def stream(self, pdf_path: str, user_context: str, sink: ResultSink,
+                     skip: Optional[ChunkFilter] = None) -> Counter:
+        """Analyzes the document while it is still being parsed, passing outcomes to `sink`.
+
+        Returns the parsing and analysis stats of the document.
+        """
+        stats = Counter()
+        has_chapters, chapters = await asyncio.to_thread(self._iter_parse, pdf_path, stats)
+        if has_chapters:
+            stats.update(await self.analyzer.stream_document_per_chapter(
+                chapters, user_context, sink, skip))
+        else:
+            page_text_gen = (page.chapter_text for page in chapters)
+            stats.update(await self.analyzer.stream_document_per_page(
+                page_text_gen, user_context, sink, skip))
+        return stats
+
+    def split(self, pdf_path: str,
+              stats: Counter) -> Tuple[bool, Iterator[schemas.DocumentChunk]]:
+        """Parses and chunks the document without analyzing it; True if it has chapters."""
+        has_chapters, chapters = self._iter_parse(pdf_path, stats)
+        return has_chapters, self.analyzer.split_chapters(chapters, has_chapters)
+
+    def _iter_parse(self, pdf_path: str,
+                    stats: Counter) -> Tuple[bool, Iterator[schemas.DocumentChapter]]:
+        if self.parse_cache is None:
+            return self.parser.iter_parse(pdf_path, stats)
+
+        key = self.parse_cache.key(pdf_path, self.parser.config_fingerprint)
+        parsed = self.parse_cache.get(key)
+        logger.info(f"Parse cache stats: {self.parse_cache.stats()}")
+        if parsed is not None:
+            return parsed.has_chapters, iter(parsed.chapters)
+
+        has_chapters, chapters = self.parser.iter_parse(pdf_path, stats)
+        return has_chapters, self._cache_when_exhausted(key, has_chapters, chapters)
+
+    def _cache_when_exhausted(self, key: str, has_chapters: bool,
+                              chapters: Iterator[schemas.DocumentChapter]
+                              ) -> Iterator[schemas.DocumentChapter]:
+        parsed = schemas.ParsedDocument(has_chapters=has_chapters, chapters=[])
+        for chapter in chapters:
+            parsed.chapters.append(chapter)
+            yield chapter
+        self.parse_cache.put(key, parsed)
@@ -4,6 +4,9 @@ from app.constants import CATEGORIES
 
 RISK_LEVELS = RiskLevel.values()
 
+# Bump whenever the prompt changes so cached LLM results from older prompts are not reused
+PROMPT_VERSION = 1
+
 prompt_template = PromptTemplate.from_template(f"""
 You are an AI legal assistant specializing in Terms &  Conditions analysis.
 Your primary responsibility is to protect the interests of users who are
@@ -45,4 +48,54 @@ Allowed categories: {', '.join(CATEGORIES)}
 Allowed risk levels: {', '.join(RISK_LEVELS)}
 
 Be objective, concise, and prioritize user protection in your analysis.
-""")
\ No newline at end of file
+""")
+
+batch_prompt_template = PromptTemplate.from_template(f"""
+You are an AI legal assistant specializing in Terms &  Conditions analysis.
+Your primary responsibility is to protect the interests of users who are
+about to accept these terms.
+
+Your task is to analyze EACH of the following numbered clauses independently and classify it
+according to predefined categories and risk levels, with a focus on identifying any terms
+that may negatively impact or limit user rights.
+
+Here is context provided by the user
+(You can use it to better understand the user's perspective):
+USER CONTEXT: 
+\"\"\"{{user_context}}\"\"\"
+
+Clauses:
+{{clauses}}
+
+Instructions:
+- Return exactly one analysis per clause and set `clause_id` to the number of that clause.
+- Analyze every clause on its own; do not merge clauses or carry conclusions between them.
+- Carefully read the clause and determine if it clearly and explicitly fits into one
+    or more of the categories below.
+- Assess the clause from the perspective of protecting the user's interests and rights.  
+- Highlight language that could be unfavorable, risky, or restrictive for the user.
+- DO NOT infer or assume meanings beyond what is clearly stated in the clause.
+- ONLY assign a category if the clause directly pertains to it.
+- If the clause does not unambiguously match any of the categories, return an empty list
+    for categories.
+- Determine if the clause is valid and coherent. If it appears broken, malformed, or incomplete,
+    set `is_valid` to false. Here are some examples of what to look for:
+    Example 1 — Valid:
+    Clause Text: "You may cancel your subscription at any time through your account settings."
+    is_valid: true
+
+    Example 2 — Invalid:
+    Clause Text: "A. PRIVACY B. DATA C. TERMINATION E. THIRD PARTY the cookie you accept clause not user"
+    is_valid: false
+                    
+
+Allowed categories: {', '.join(CATEGORIES)}
+Allowed risk levels: {', '.join(RISK_LEVELS)}
+
+Be objective, concise, and prioritize user protection in your analysis.
+""")
+
+
+def format_batch_clauses(texts) -> str:
+    return "\n\n".join(
+        f"Clause {clause_id}:\n\"\"\"{text}\"\"\"" for clause_id, text in enumerate(texts, start=1))
@@ -1,10 +1,20 @@
 from app.config import settings
 
 from celery import Celery
+from kombu import Queue
 
 
 celery = Celery(__name__)
 celery.conf.broker_url = settings.CELERY_BROKER_URL
 celery.conf.result_backend = settings.CELERY_RESULT_BACKEND
+celery.conf.worker_pool = settings.CELERY_WORKER_POOL
+celery.conf.worker_concurrency = settings.CELERY_WORKER_CONCURRENCY
+celery.conf.worker_prefetch_multiplier = settings.CELERY_WORKER_PREFETCH_MULTIPLIER
+# Workers consume from both queues unless started with -Q; analyze_document is routed by
+# document size when queued, and the short bookkeeping tasks take the default small queue
+celery.conf.task_queues = (Queue(settings.ANALYSIS_SMALL_QUEUE),
+                           Queue(settings.ANALYSIS_LARGE_QUEUE))
+celery.conf.task_default_queue = settings.ANALYSIS_SMALL_QUEUE
+celery.conf.task_routes = {"analyze_chunks": {"queue": settings.ANALYSIS_LARGE_QUEUE}}
 
 celery.autodiscover_tasks(['app.tasks'])
@@ -1,4 +1,6 @@
 from pathlib import Path
+from typing import Literal, Optional
+from app.enums import RiskLevel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,10 +12,39 @@ class Settings(BaseSettings):
     MONGO_URI: str
     MONGO_DB_NAME: str = "tos_analyzer"
     CLAUSES_COLLECTION_NAME: str = "clauses"
+    FAILED_CHUNKS_COLLECTION_NAME: str = "failed_chunks"
 
     # Celery configuration
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
+    # "prefork" analyzes one document per worker process. "threads" analyzes up to
+    # CELERY_WORKER_CONCURRENCY documents at once in a single process, all on its one event
+    # loop and behind its LLM concurrency limiter. Each process reserves
+    # CELERY_WORKER_PREFETCH_MULTIPLIER tasks per slot ahead of time. PyMuPDF is not
+    # thread-safe, so a "threads" worker parses one page at a time across its documents;
+    # LLM calls, where analysis spends its time, still overlap.
+    CELERY_WORKER_POOL: Literal["prefork", "threads"] = "prefork"
+    # Defaults to the number of CPUs
+    CELERY_WORKER_CONCURRENCY: Optional[int] = None
+    CELERY_WORKER_PREFETCH_MULTIPLIER: int = 1
+    # Documents of at most ANALYSIS_SMALL_MAX_PAGES pages and ANALYSIS_SMALL_MAX_BYTES bytes
+    # are queued on ANALYSIS_SMALL_QUEUE, for latency-oriented workers; larger ones go to
+    # ANALYSIS_LARGE_QUEUE, for throughput-oriented workers, with the chunk tasks of
+    # fanned-out documents
+    ANALYSIS_SMALL_QUEUE: str = "analysis.small"
+    ANALYSIS_LARGE_QUEUE: str = "analysis.large"
+    ANALYSIS_SMALL_MAX_PAGES: int = 20
+    ANALYSIS_SMALL_MAX_BYTES: int = 5 * 1024 * 1024
+    # Each queued analysis gets a run id; tasks of other runs, and redelivered messages of
+    # finished ones, do nothing. A run holds a per-document Redis lock, renewed while its
+    # tasks run, that lapses ANALYSIS_LOCK_TTL_SECONDS after its worker dies, or, for a
+    # fanned-out document, once no chunk task started or finished for
+    # ANALYSIS_SLICE_DEADLINE_SECONDS. A processing document whose lock lapsed can be
+    # queued again. Deliveries finding the lock held retry every
+    # ANALYSIS_LOCK_RETRY_SECONDS.
+    ANALYSIS_LOCK_TTL_SECONDS: int = 300
+    ANALYSIS_SLICE_DEADLINE_SECONDS: int = 1800
+    ANALYSIS_LOCK_RETRY_SECONDS: int = 30
 
     # Redis configuration
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -26,17 +57,111 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # PDF parsing settings
+    PDF_PARALLEL_MIN_PAGES: int = 200
+    PDF_PARALLEL_WORKERS: int = 1
+    # Shard large documents over processes inside Celery workers too
+    PDF_PARALLEL_IN_WORKERS: bool = False
+    # Lines repeated at the same position on at least PDF_BOILERPLATE_MIN_SHARE of the
+    # first PDF_BOILERPLATE_SAMPLE_PAGES pages (running headers, footers, page numbers)
+    # are stripped before headings are detected
+    PDF_STRIP_BOILERPLATE: bool = True
+    PDF_BOILERPLATE_SAMPLE_PAGES: int = 8
+    PDF_BOILERPLATE_MIN_SHARE: float = 0.5
+    # Also estimate the chunks stripping saved, at the cost of a pass over every line
+    PDF_BOILERPLATE_ESTIMATE_CHUNKS: bool = False
+    # Headings are also found from font size, weight, spacing and numbering, besides the
+    # all-caps patterns; headings deeper than PDF_MAX_HEADING_LEVEL don't start a chapter
+    PDF_FONT_HEADINGS: bool = True
+    PDF_MAX_HEADING_LEVEL: int = 2
+
+    # Parsed chapters cache, keyed by PDF hash and parser configuration
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_DIR: Path = Path(__file__).parent.parent / "cache" / "parsed"
+    PARSE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
     # LLM settings
+    # "gemini", "fake" (offline and deterministic), "record" (gemini, saving responses
+    # to cassettes) or "replay" (recorded cassettes only)
+    LLM_BACKEND: Literal["gemini", "fake", "record", "replay"] = "gemini"
+    LLM_CASSETTE_DIR: Path = Path(__file__).parent.parent / "cache" / "cassettes"
     LLM_MODEL_NAME: str = "gemini-2.0-flash"
     LLM_TEMPERATURE: float = 0.2
-    LLM_MAX_CHUNK_LENGTH: int = 8000
-    LLM_CHUNK_TEXT_OVERLAP: int = 150
+    # Chunk sizes are measured in estimated model tokens
+    LLM_MAX_CHUNK_TOKENS: int = 2000
+    LLM_CHUNK_OVERLAP_TOKENS: int = 40
 
     LLM_REQUESTS_PER_MINUTE: int = 15
     LLM_LIMIT_KEY: str = "llm"
-    LLM_MAX_CONCURRENT_REQUESTS: int = 2
+    # Requests that may start back to back after an idle period
+    LLM_RATE_LIMIT_BURST: int = 1
+    # Cluster-wide LLM slots shared fairly between users and documents
+    LLM_FAIR_SCHEDULER_ENABLED: bool = True
+    LLM_SCHEDULER_CAPACITY: int = 8
+    # The concurrency window adapts to the backend (AIMD) between 1 and the maximum
+    LLM_INITIAL_CONCURRENT_REQUESTS: int = 2
+    LLM_MAX_CONCURRENT_REQUESTS: int = 8
+    # Attempts per request, including the first one
     MAX_RETRIES: int = 4
-    RETRY_BACKOFF_BASE: int = 5
+    # Decorrelated-jitter backoff bounds, in seconds; server retry hints take precedence
+    RETRY_BACKOFF_BASE: float = 5
+    RETRY_BACKOFF_MAX: float = 120
+    # Retries per document: a fixed allowance plus a share of its requests. The chunk tasks
+    # of a fanned-out document share one budget through Redis
+    RETRY_BUDGET_MIN: int = 10
+    RETRY_BUDGET_RATIO: float = 0.2
+
+    # Two-tier cascade: the triage model analyzes every chunk, and only clauses it rates
+    # LLM_ESCALATE_RISK_LEVEL or riskier, or with a confidence below
+    # LLM_ESCALATE_MIN_CONFIDENCE, go to LLM_MODEL_NAME. The triage model has its own
+    # rate limit and concurrency pool.
+    LLM_CASCADE_ENABLED: bool = False
+    LLM_TRIAGE_MODEL_NAME: str = "gemini-2.0-flash-lite"
+    LLM_TRIAGE_REQUESTS_PER_MINUTE: int = 30
+    LLM_TRIAGE_LIMIT_KEY: str = "llm_triage"
+    LLM_TRIAGE_INITIAL_CONCURRENT_REQUESTS: int = 4
+    LLM_TRIAGE_MAX_CONCURRENT_REQUESTS: int = 16
+    LLM_ESCALATE_RISK_LEVEL: RiskLevel = RiskLevel.MEDIUM
+    LLM_ESCALATE_MIN_CONFIDENCE: float = 0.7
+
+    # Cross-document cache of LLM results for identical chunks
+    LLM_RESULT_CACHE_ENABLED: bool = True
+    LLM_RESULT_CACHE_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    LLM_RESULT_CACHE_MAX_ENTRIES: int = 100_000
+
+    # Near-duplicate chunks within a document share one LLM call
+    LLM_DEDUP_ENABLED: bool = True
+    LLM_DEDUP_THRESHOLD: float = 0.9
+
+    # Chunks scoring below the threshold for legal-risk relevance (0 to 1), such as
+    # tables of contents, contact details and glossaries, are not sent to the LLM
+    LLM_RELEVANCE_FILTER_ENABLED: bool = True
+    LLM_RELEVANCE_THRESHOLD: float = 0.3
+
+    # Short chunks are packed into one structured-output request
+    LLM_BATCH_MAX_ITEMS: int = 8
+    LLM_BATCH_MAX_CHUNK_TOKENS: int = 500
+
+    # Parsing and LLM calls overlap through a bounded queue of pending requests.
+    # Workers beyond LLM_MAX_CONCURRENT_REQUESTS only wait for a concurrency slot.
+    LLM_PIPELINE_WORKERS: int = 8
+    LLM_PIPELINE_QUEUE_DEPTH: int = 8
+
+    # Documents of at least ANALYSIS_FANOUT_MIN_PAGES pages are parsed and chunked by one
+    # task, then analyzed by tasks of ANALYSIS_FANOUT_CHUNKS_PER_TASK chunks each, spread
+    # over the workers; smaller ones are analyzed end to end by a single task. Chunks are
+    # passed through Redis and dropped after ANALYSIS_CHUNK_TTL_SECONDS at the latest.
+    ANALYSIS_FANOUT_ENABLED: bool = True
+    ANALYSIS_FANOUT_MIN_PAGES: int = 50
+    ANALYSIS_FANOUT_CHUNKS_PER_TASK: int = 8
+    ANALYSIS_CHUNK_TTL_SECONDS: int = 86400
+
+    # Fake LLM backend: log-normal latency in seconds and shares of failed requests
+    FAKE_LLM_LATENCY_MEDIAN: float = 0.5
+    FAKE_LLM_LATENCY_SIGMA: float = 0.5
+    FAKE_LLM_THROTTLE_RATE: float = 0.0
+    FAKE_LLM_ERROR_RATE: float = 0.0
+    FAKE_LLM_SEED: int = 0
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -4,7 +4,9 @@ from app.config import settings
 MONGO_URI = settings.MONGO_URI
 MONGO_DB_NAME = settings.MONGO_DB_NAME
 CLAUSES_COLLECTION_NAME = settings.CLAUSES_COLLECTION_NAME
+FAILED_CHUNKS_COLLECTION_NAME = settings.FAILED_CHUNKS_COLLECTION_NAME
 
 motor_client = AsyncIOMotorClient(MONGO_URI)
 motor_db = motor_client[MONGO_DB_NAME]
 clauses_collection = motor_db[CLAUSES_COLLECTION_NAME]
+failed_chunks_collection = motor_db[FAILED_CHUNKS_COLLECTION_NAME]
@@ -0,0 +1,7 @@
+import redis.asyncio as aioredis
+from app.config import settings
+
+
+def create_async_redis() -> aioredis.Redis:
+    """Async clients are bound to the event loop they are first used in, so create one per loop."""
+    return aioredis.from_url(settings.REDIS_URL)
@@ -6,9 +6,18 @@ class DocumentStatus(str, Enum):
     QUED_FOR_ANALYSIS = "queued_for_analysis"
     PROCESSING = "processing"
     ANALYZED = "analyzed"
+    # Some chunks failed; re-queuing analyzes only those
+    PARTIALLY_ANALYZED = "partially_analyzed"
     FAILED = "failed"
 
 
+class Priority(str, Enum):
+    """Scheduling class of a document's LLM requests; higher classes are served first."""
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+
 class RiskLevel(str, Enum):
     # "Standard industry practices, no significant concerns"
     STANDART_PRACTICE = "standard_practice"
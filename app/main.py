@@ -1,8 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.auth.routes import router as auth_router
 from app.analyzer.routes import router as analyzer_router
+from app.analyzer.result_store import ensure_indexes
+from app.db.mongo import clauses_collection, failed_chunks_collection
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes(clauses_collection, failed_chunks_collection)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(analyzer_router, tags=["analyzer"])
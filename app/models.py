@@ -21,5 +21,9 @@ class Document(Base):
     user_context = Column(String(500), nullable=False)
     file_url = Column(String(250), nullable=False)
     status = Column(String(50), nullable=False)
+    # Set when an analysis is queued; only the task of the current run may analyze the document
+    analysis_run_id = Column(String(36), nullable=True)
+    # Read at upload, so starting an analysis routes it without opening the PDF
+    page_count = Column(Integer, nullable=True)
 
     user = relationship("User", back_populates="documents")
@@ -1,33 +1,225 @@
-import asyncio
-from celery import shared_task
-from app.enums import DocumentStatus
+import os
+from collections import Counter
+from typing import Awaitable, List, Optional, TypeVar
+from celery import chord, shared_task
+from app.config import settings
+from app.enums import DocumentStatus, Priority
 from app.db.db import get_db
 from app.analyzer.document_repository import DocumentRepository
-from app import utils
+from app.analyzer.fair_scheduler import Flow, current_flow
+from app.analyzer.fan_out import FanOutPlan, analyze_slice, plan_fan_out
+from app.analyzer.layout import count_pages
+from app.analyzer.result_store import ResultStore, document_status
+from app.analyzer.retry_policy import SharedRetryBudget, current_retry_budget
+from app.analyzer.service import AnalyzerService
+from app.models import Document
+from app.db.mongo import clauses_collection, failed_chunks_collection
+from app.logger import logger
+from app.worker_runtime import WorkerRuntime, get_runtime
+
+T = TypeVar("T")
+
+# A run may start from either: a redelivered message of a run whose worker died while
+# processing resumes it, since results are saved per chunk
+STARTABLE = (DocumentStatus.QUED_FOR_ANALYSIS, DocumentStatus.PROCESSING)
 
 
 @shared_task(bind=True, name="analyze_document")
-def analyze_document(self, document_id: int):
+def analyze_document(self, document_id: int, retry_invalid: bool = False,
+                     priority: Priority = Priority.NORMAL, run_id: Optional[str] = None):
+    """Analyzes the document for run `run_id`; does nothing if the run is not the document's
+    current one, is finished, or is already being analyzed by another delivery."""
     session = next(get_db())
     document_repo = DocumentRepository(session)
+    runtime = get_runtime()
+    lock = runtime.service.analysis_lock
+    # Messages queued without a run id lock the document under their task id
+    token = run_id or self.request.id
     try:
         doc = document_repo.get_by_id(document_id)
         if not doc:
             return
+        if doc.status not in STARTABLE or run_id not in (None, doc.analysis_run_id):
+            logger.info(f"Run {run_id} of document {document_id} is finished or superseded, "
+                        "skipping")
+            return
+
+        if lock is not None and not runtime.run(lock.acquire(document_id, token)):
+            # Another delivery is analyzing the document: check again once it may be done,
+            # when this run will have finished, been superseded or lost its worker
+            logger.info(f"Document {document_id} is being analyzed, retrying in "
+                        f"{settings.ANALYSIS_LOCK_RETRY_SECONDS}s")
+            raise self.retry(countdown=settings.ANALYSIS_LOCK_RETRY_SECONDS, max_retries=None)
+        if not document_repo.transition_status(
+                document_id, run_id, STARTABLE, DocumentStatus.PROCESSING):
+            release_lock(runtime, document_id, token)
+            logger.info(f"Run {run_id} of document {document_id} was superseded, skipping")
+            return
+
+        status = DocumentStatus.FAILED
+        try:
+            status = analyze_locked(runtime, doc, run_id, token, retry_invalid, priority)
+        finally:
+            # None: the chord's callback sets the status and releases the lock. The lock is
+            # released first, so a delivery that finds it held will find the final status
+            # once it retries.
+            if status is not None:
+                release_lock(runtime, document_id, token)
+                document_repo.transition_status(
+                    document_id, run_id, [DocumentStatus.PROCESSING], status)
+    finally:
+        session.close()
+
+
+def analyze_locked(runtime: WorkerRuntime, doc: Document, run_id: Optional[str], token: str,
+                   retry_invalid: bool, priority: Priority) -> Optional[DocumentStatus]:
+    """Analyzes a document whose lock is held; returns its final status, or None once it is
+    handed to a chord of chunk tasks."""
+    flow = Flow(user_id=doc.user_id, document_id=doc.id, priority=Priority(priority))
+    if fans_out(runtime.service, doc):
+        plan = run_locked(runtime, doc.id, token, plan_document(
+            runtime.service, doc.file_url, flow, retry_invalid))
+        if plan.slices:
+            fan_out(plan, flow, doc.user_context or "", run_id, token)
+            return None
+        runtime.run(runtime.service.chunk_store.delete(plan.key))
+        return document_status(plan.stats)
+    return run_locked(runtime, doc.id, token, analyze_and_save(
+        runtime.service, doc.file_url, doc.user_context or "", flow, retry_invalid))
+
+
+# Acknowledged once done, and re-queued if their worker dies, so a lost slice does not leave
+# the chord, and the document, waiting forever; slices are idempotent
+@shared_task(name="analyze_chunks", acks_late=True, reject_on_worker_lost=True)
+def analyze_chunks(document_id: int, user_id: int, priority: Priority, key: str, start: int,
+                   stop: int, with_chapter: bool, user_context: str,
+                   token: Optional[str] = None) -> dict:
+    """Analyzes one slice of a fanned-out document; returns its stats for finish_document."""
+    runtime = get_runtime()
+    flow = Flow(user_id=user_id, document_id=document_id, priority=Priority(priority))
+    return dict(run_locked(runtime, document_id, token, analyze_and_save_slice(
+        runtime.service, flow, key, start, stop, with_chapter, user_context),
+        settings.ANALYSIS_SLICE_DEADLINE_SECONDS))
+
+
+@shared_task(name="finish_document")
+def finish_document(results: List[dict], document_id: int, key: str, stats: dict,
+                    run_id: Optional[str] = None, token: Optional[str] = None):
+    """Chord callback of a fanned-out document: sets its status from all slices' stats."""
+    stats = Counter(stats)
+    for result in results:
+        stats.update(result)
+    runtime = get_runtime()
+    runtime.run(runtime.service.chunk_store.delete(key))
+    logger.info(f"Document {document_id} analyzed by {len(results)} tasks: {dict(stats)}")
+    release_lock(runtime, document_id, token)
+    set_status(document_id, run_id, document_status(stats))
+
+
+@shared_task(name="fail_document")
+def fail_document(document_id: int, key: str, run_id: Optional[str] = None,
+                  token: Optional[str] = None):
+    """Error callback of a fanned-out document whose analysis task raised."""
+    runtime = get_runtime()
+    runtime.run(runtime.service.chunk_store.delete(key))
+    release_lock(runtime, document_id, token)
+    set_status(document_id, run_id, DocumentStatus.FAILED)
+
+
+def queue_analysis(document_id: int, pdf_path: str, retry_invalid: bool = False,
+                   run_id: Optional[str] = None, page_count: Optional[int] = None) -> None:
+    analyze_document.apply_async((document_id, retry_invalid), {"run_id": run_id},
+                                 queue=analysis_queue(pdf_path, page_count))
 
-        document_repo.update_status(doc, DocumentStatus.PROCESSING)
 
-        service = utils.create_analyzer_service()
+def analysis_queue(pdf_path: str, page_count: Optional[int] = None) -> str:
+    """Queue of a document's analysis by its size: its page count, read from the PDF's
+    metadata unless stored at upload, and its file size."""
+    try:
+        pages = count_pages(pdf_path) if page_count is None else page_count
+        size = os.path.getsize(pdf_path)
+    except (RuntimeError, OSError) as e:
+        # The analysis task fails on it and marks the document as such
+        logger.warning(f"Could not size {pdf_path}, queuing it as a large document: {e}")
+        return settings.ANALYSIS_LARGE_QUEUE
+    if pages <= settings.ANALYSIS_SMALL_MAX_PAGES and size <= settings.ANALYSIS_SMALL_MAX_BYTES:
+        return settings.ANALYSIS_SMALL_QUEUE
+    return settings.ANALYSIS_LARGE_QUEUE
+
+
+def fans_out(service: AnalyzerService, doc: Document) -> bool:
+    """Whether the document is spread over chunk tasks, by the page count stored at upload;
+    the PDF is only opened for documents uploaded before it was stored."""
+    if service.chunk_store is None:
+        return False
+    pages = count_pages(doc.file_url) if doc.page_count is None else doc.page_count
+    return pages >= settings.ANALYSIS_FANOUT_MIN_PAGES
+
+
+def fan_out(plan: FanOutPlan, flow: Flow, user_context: str, run_id: Optional[str] = None,
+            token: Optional[str] = None) -> None:
+    runtime = get_runtime()
+    if runtime.service.analysis_lock is not None and token is not None:
+        # The chunk tasks may wait behind other documents: the lock lapses only if none of
+        # them starts or finishes for a slice deadline
+        runtime.run(runtime.service.analysis_lock.extend(
+            flow.document_id, token, settings.ANALYSIS_SLICE_DEADLINE_SECONDS))
+    header = [analyze_chunks.s(flow.document_id, flow.user_id, flow.priority, plan.key, start,
+                               stop, plan.with_chapter, user_context, token)
+              for start, stop in plan.slices]
+    callback = finish_document.s(flow.document_id, plan.key, dict(plan.stats), run_id, token)
+    on_error = fail_document.si(flow.document_id, plan.key, run_id, token)
+    chord(header)(callback.on_error(on_error))
 
-        results = asyncio.run(
-            service.analyze(
-                pdf_path=doc.file_url,
-                user_context=doc.user_context or ""))
-        asyncio.run(utils.save_results(results, document_id))
 
-        document_repo.update_status(doc, DocumentStatus.ANALYZED)
-    except Exception as e:
-        document_repo.update_status(doc, DocumentStatus.FAILED)
-        raise e
+def set_status(document_id: int, run_id: Optional[str], status: DocumentStatus) -> None:
+    """Sets the final status of a run, unless the document has moved on to another one."""
+    session = next(get_db())
+    try:
+        DocumentRepository(session).transition_status(
+            document_id, run_id, [DocumentStatus.PROCESSING], status)
     finally:
         session.close()
+
+
+def run_locked(runtime: WorkerRuntime, document_id: int, token: Optional[str],
+               coro: Awaitable[T], ttl_seconds: Optional[int] = None) -> T:
+    """Runs `coro` on the worker runtime, renewing the document's analysis lock meanwhile."""
+    async def locked():
+        async with runtime.service.analysis_lock.kept(document_id, token, ttl_seconds):
+            return await coro
+
+    if runtime.service.analysis_lock is None or token is None:
+        return runtime.run(coro)
+    return runtime.run(locked())
+
+
+def release_lock(runtime: WorkerRuntime, document_id: int, token: Optional[str]) -> None:
+    if runtime.service.analysis_lock is not None and token is not None:
+        runtime.run(runtime.service.analysis_lock.release(document_id, token))
+
+
+async def analyze_and_save(service: AnalyzerService, pdf_path: str, user_context: str,
+                           flow: Flow, retry_invalid: bool = False) -> DocumentStatus:
+    current_flow.set(flow)
+    store = ResultStore(clauses_collection, failed_chunks_collection, flow.document_id)
+    await store.load_completed(retry_invalid)
+    await service.stream(pdf_path, user_context, store.save, skip=store.is_completed)
+    await store.prune()
+    return store.document_status()
+
+
+async def plan_document(service: AnalyzerService, pdf_path: str, flow: Flow,
+                        retry_invalid: bool = False) -> FanOutPlan:
+    store = ResultStore(clauses_collection, failed_chunks_collection, flow.document_id)
+    await store.load_completed(retry_invalid)
+    return await plan_fan_out(service, store, pdf_path, settings.ANALYSIS_FANOUT_CHUNKS_PER_TASK)
+
+
+async def analyze_and_save_slice(service: AnalyzerService, flow: Flow, key: str, start: int,
+                                 stop: int, with_chapter: bool, user_context: str) -> Counter:
+    current_flow.set(flow)
+    chunk_store = service.chunk_store
+    current_retry_budget.set(SharedRetryBudget(chunk_store.redis, key, chunk_store.ttl_seconds))
+    store = ResultStore(clauses_collection, failed_chunks_collection, flow.document_id)
+    return await analyze_slice(service, store, key, start, stop, with_chapter, user_context)
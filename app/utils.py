@@ -1,14 +1,29 @@
 from fastapi import UploadFile
 from pathlib import Path
 from app.config import settings
-from app.analyzer import schemas
-from app.db.mongo import clauses_collection
-from typing import List, Union
+from typing import Optional
 from app.analyzer.service import AnalyzerService
 from app.analyzer.pdf_parser import PDFParser
+from app.analyzer.layout import count_pages
+from app.analyzer.boilerplate import BoilerplateFilter
+from app.analyzer.headings import HeadingClassifier
 from app.analyzer.llm_analyzer import LLMAnalyzer
 from langchain_google_genai import ChatGoogleGenerativeAI
-from app.analyzer.concurrency_limiter import ConcurrencyLimiter
+from app.analyzer.llm_backends import CassetteChatModel, ChatModel, FakeChatModel
+from app.analyzer.concurrency_limiter import AdaptiveConcurrencyLimiter
+from app.analyzer.parse_cache import ParseCache
+from app.analyzer.chunk_store import ChunkStore
+from app.analyzer.analysis_lock import AnalysisLock
+from app.analyzer.rate_limiter import RateLimiter
+from app.analyzer.fair_scheduler import FairScheduler
+from app.analyzer.retry_policy import RetryPolicy
+from app.analyzer.result_cache import ResultCache
+from app.analyzer.dedup import ChunkDeduplicator
+from app.analyzer.relevance import RelevanceFilter
+from app.analyzer.cascade import TriageTier
+from app.analyzer.templates import PROMPT_VERSION
+from app.db.redis_client import create_async_redis
+from app.logger import logger
 
 
 async def save_upload_file(upload_file: UploadFile) -> str:
@@ -23,32 +38,160 @@ async def save_upload_file(upload_file: UploadFile) -> str:
     return str(file_path)
 
 
-async def save_results(results: Union[List[schemas.ClauseAnalysis],
-                       List[schemas.ChapterAnalysis]], document_id: int) -> None:
-    dict_list = []
-    for res in results:
-        clause_dict = res.model_dump()
-        clause_dict["document_id"] = document_id
-        dict_list.append(clause_dict)
-
-    await clauses_collection.insert_many(dict_list)
+def read_page_count(file_path: str) -> Optional[int]:
+    """Page count of an uploaded PDF, from its metadata; None if it can't be read, in which
+    case its analysis fails on it and marks the document as such."""
+    try:
+        return count_pages(file_path)
+    except (RuntimeError, OSError) as e:
+        logger.warning(f"Could not read the page count of {file_path}: {e}")
+        return None
 
 
 def create_analyzer_service() -> AnalyzerService:
-    parser = PDFParser()
+    parser = PDFParser(
+        parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+        parallel_workers=settings.PDF_PARALLEL_WORKERS,
+        boilerplate_filter=get_boilerplate_filter(),
+        heading_classifier=get_heading_classifier())
     llm = get_llm()
-    limiter = ConcurrencyLimiter(max_concurrent=settings.LLM_MAX_CONCURRENT_REQUESTS)
+    limiter = AdaptiveConcurrencyLimiter(
+        max_concurrent=settings.LLM_MAX_CONCURRENT_REQUESTS,
+        initial_concurrent=settings.LLM_INITIAL_CONCURRENT_REQUESTS)
     analyzer = LLMAnalyzer(
         llm=llm,
-        max_chapter_length=settings.LLM_MAX_CHUNK_LENGTH,
-        chunck_text_overlap=settings.LLM_CHUNK_TEXT_OVERLAP,
-        limiter=limiter)
-    return AnalyzerService(analyzer, parser)
+        max_chunk_tokens=settings.LLM_MAX_CHUNK_TOKENS,
+        chunk_overlap_tokens=settings.LLM_CHUNK_OVERLAP_TOKENS,
+        limiter=limiter,
+        result_cache=get_result_cache(),
+        deduplicator=get_deduplicator(),
+        relevance_filter=get_relevance_filter(),
+        triage=get_triage_tier(),
+        batch_max_items=settings.LLM_BATCH_MAX_ITEMS,
+        batch_max_chunk_tokens=settings.LLM_BATCH_MAX_CHUNK_TOKENS,
+        pipeline_workers=settings.LLM_PIPELINE_WORKERS,
+        pipeline_queue_depth=settings.LLM_PIPELINE_QUEUE_DEPTH,
+        rate_limiter=get_rate_limiter(),
+        scheduler=get_scheduler(),
+        retry_policy=RetryPolicy(
+            max_attempts=settings.MAX_RETRIES,
+            base_delay=settings.RETRY_BACKOFF_BASE,
+            max_delay=settings.RETRY_BACKOFF_MAX,
+            budget_min_retries=settings.RETRY_BUDGET_MIN,
+            budget_ratio=settings.RETRY_BUDGET_RATIO))
+    parse_cache = None
+    if settings.PARSE_CACHE_ENABLED:
+        parse_cache = ParseCache(settings.PARSE_CACHE_DIR, settings.PARSE_CACHE_MAX_BYTES)
+    return AnalyzerService(analyzer, parser, parse_cache, get_chunk_store(), get_analysis_lock())
+
+
+def get_chunk_store() -> Optional[ChunkStore]:
+    if not settings.ANALYSIS_FANOUT_ENABLED:
+        return None
+    return ChunkStore(redis=create_async_redis(), ttl_seconds=settings.ANALYSIS_CHUNK_TTL_SECONDS)
+
+
+def get_analysis_lock() -> AnalysisLock:
+    return AnalysisLock(redis=create_async_redis(), ttl_seconds=settings.ANALYSIS_LOCK_TTL_SECONDS)
+
+
+def get_boilerplate_filter() -> Optional[BoilerplateFilter]:
+    if not settings.PDF_STRIP_BOILERPLATE:
+        return None
+    return BoilerplateFilter(
+        sample_pages=settings.PDF_BOILERPLATE_SAMPLE_PAGES,
+        min_share=settings.PDF_BOILERPLATE_MIN_SHARE,
+        chunk_tokens=settings.LLM_MAX_CHUNK_TOKENS,
+        estimate_chunks=settings.PDF_BOILERPLATE_ESTIMATE_CHUNKS)
+
+
+def get_heading_classifier() -> Optional[HeadingClassifier]:
+    if not settings.PDF_FONT_HEADINGS:
+        return None
+    return HeadingClassifier(max_level=settings.PDF_MAX_HEADING_LEVEL)
+
+
+def get_triage_tier() -> Optional[TriageTier]:
+    if not settings.LLM_CASCADE_ENABLED:
+        return None
+    return TriageTier(
+        llm=get_llm(settings.LLM_TRIAGE_MODEL_NAME),
+        limiter=AdaptiveConcurrencyLimiter(
+            max_concurrent=settings.LLM_TRIAGE_MAX_CONCURRENT_REQUESTS,
+            initial_concurrent=settings.LLM_TRIAGE_INITIAL_CONCURRENT_REQUESTS),
+        rate_limiter=RateLimiter(
+            redis=create_async_redis(),
+            key=settings.LLM_TRIAGE_LIMIT_KEY,
+            requests_per_minute=settings.LLM_TRIAGE_REQUESTS_PER_MINUTE,
+            burst=settings.LLM_RATE_LIMIT_BURST),
+        escalate_at=settings.LLM_ESCALATE_RISK_LEVEL,
+        min_confidence=settings.LLM_ESCALATE_MIN_CONFIDENCE)
+
+
+def get_rate_limiter() -> RateLimiter:
+    return RateLimiter(
+        redis=create_async_redis(),
+        key=settings.LLM_LIMIT_KEY,
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        burst=settings.LLM_RATE_LIMIT_BURST)
+
+
+def get_scheduler() -> Optional[FairScheduler]:
+    if not settings.LLM_FAIR_SCHEDULER_ENABLED:
+        return None
+    return FairScheduler(
+        redis=create_async_redis(),
+        capacity=settings.LLM_SCHEDULER_CAPACITY)
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    if not settings.LLM_RESULT_CACHE_ENABLED:
+        return None
+    model_name = settings.LLM_MODEL_NAME
+    if settings.LLM_CASCADE_ENABLED:
+        # Cascade results come from either model, so they don't mix with single-model ones
+        model_name = f"{settings.LLM_TRIAGE_MODEL_NAME}>{model_name}"
+    if settings.LLM_BACKEND == "fake":
+        # Fake results must never be served for real requests
+        model_name = "fake"
+    return ResultCache(
+        redis=create_async_redis(),
+        model_name=model_name,
+        temperature=settings.LLM_TEMPERATURE,
+        prompt_version=PROMPT_VERSION,
+        ttl_seconds=settings.LLM_RESULT_CACHE_TTL_SECONDS,
+        max_entries=settings.LLM_RESULT_CACHE_MAX_ENTRIES)
+
+
+def get_deduplicator() -> Optional[ChunkDeduplicator]:
+    if not settings.LLM_DEDUP_ENABLED:
+        return None
+    return ChunkDeduplicator(threshold=settings.LLM_DEDUP_THRESHOLD)
+
+
+def get_relevance_filter() -> Optional[RelevanceFilter]:
+    if not settings.LLM_RELEVANCE_FILTER_ENABLED:
+        return None
+    return RelevanceFilter(threshold=settings.LLM_RELEVANCE_THRESHOLD)
+
 
+def get_llm(model_name: str = settings.LLM_MODEL_NAME) -> ChatModel:
+    if settings.LLM_BACKEND == "fake":
+        return FakeChatModel(
+            latency_median=settings.FAKE_LLM_LATENCY_MEDIAN,
+            latency_sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+            throttle_rate=settings.FAKE_LLM_THROTTLE_RATE,
+            error_rate=settings.FAKE_LLM_ERROR_RATE,
+            seed=settings.FAKE_LLM_SEED)
+    cassettes = settings.LLM_CASSETTE_DIR / model_name
+    if settings.LLM_BACKEND == "replay":
+        return CassetteChatModel(cassettes)
 
-def get_llm() -> ChatGoogleGenerativeAI:
-    return ChatGoogleGenerativeAI(
-        model=settings.LLM_MODEL_NAME,
+    llm = ChatGoogleGenerativeAI(
+        model=model_name,
         temperature=settings.LLM_TEMPERATURE,
         google_api_key=settings.GOOGLE_API_KEY,
     )
+    if settings.LLM_BACKEND == "record":
+        return CassetteChatModel(cassettes, llm)
+    return llm
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from app.analyzer.layout import allow_process_pool
+from app.analyzer.llm_backends import warm_up
+from app.analyzer.service import AnalyzerService
+from app.config import settings
+from app.logger import logger
+from app import utils
+
+
+class WorkerRuntime:
+    """Event loop and analyzer service shared by every task of a worker process.
+
+    The loop runs in a background thread, and tasks submit their coroutines to
+    it instead of starting a loop of their own. Everything bound to a loop, the
+    Redis and Motor clients and the Gemini channel, is created once on it, and
+    the concurrency limiter keeps the window it has learned from one document to
+    the next.
+    """
+
+    def __init__(self, service_factory: Callable[[], AnalyzerService]):
+        self.service_factory = service_factory
+        self.loop = asyncio.new_event_loop()
+        self.service: Optional[AnalyzerService] = None
+        self._thread = threading.Thread(target=self.loop.run_forever,
+                                        name="worker-runtime", daemon=True)
+
+    def start(self) -> "WorkerRuntime":
+        self._thread.start()
+        self.service = self.run(self._build_service())
+        return self
+
+    async def _build_service(self) -> AnalyzerService:
+        # Built on the loop, so that whatever binds to it lazily binds to this one
+        service = self.service_factory()
+        warm_up(service.analyzer.llm)
+        if service.analyzer.triage is not None:
+            warm_up(service.analyzer.triage.llm)
+        return service
+
+    def submit(self, coro: Coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine) -> Any:
+        """Runs the coroutine on the runtime's loop and waits for its result."""
+        return self.submit(coro).result()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if self._thread.is_alive():
+            self.run(self._cancel_pending())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+    async def _cancel_pending(self) -> None:
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await self.loop.shutdown_asyncgens()
+
+
+_runtime: Optional[WorkerRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> WorkerRuntime:
+    """The runtime of this process, started on first use outside of a prefork worker."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = WorkerRuntime(utils.create_analyzer_service).start()
+        return _runtime
+
+
+@worker_init.connect
+def configure_worker(**kwargs) -> None:
+    # Runs in the worker's main process, before any pool process is forked from it. Worker
+    # slots already parse documents side by side, so sharding each one's pages over a
+    # process pool of its own is opt-in
+    allow_process_pool(settings.PDF_PARALLEL_IN_WORKERS)
+
+
+@worker_process_init.connect
+def start_runtime(**kwargs) -> None:
+    global _runtime, _runtime_lock
+    # A runtime inherited from the parent lost its loop thread in the fork
+    _runtime, _runtime_lock = None, threading.Lock()
+    get_runtime()
+    logger.info("Worker runtime started")
+
+
+@worker_process_shutdown.connect
+def stop_runtime(**kwargs) -> None:
+    global _runtime
+    with _runtime_lock:
+        runtime, _runtime = _runtime, None
+    if runtime is not None:
+        runtime.stop(timeout=10)
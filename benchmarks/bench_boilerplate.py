@@ -0,0 +1,61 @@
+"""Measures what stripping running headers, footers and page numbers saves before chunking.
+
+Generates documents with an all-caps running header and a "Page n of N"
+footer on every page, parses them with and without the boilerplate filter and
+splits the chapters as LLMAnalyzer does. Reports chapters (the header is
+otherwise taken for a heading on every page), characters, chunks and estimated
+tokens sent to the model, and parsing time. The filter's own chunk estimate is
+printed next to the measured difference.
+
+Run with `python -m benchmarks.bench_boilerplate [pages] [chunk_tokens]`.
+"""
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.analyzer.boilerplate import BoilerplateFilter
+from app.analyzer.chunk_packer import ChunkPacker
+from app.analyzer.pdf_parser import PDFParser
+from benchmarks.fixtures import make_tos_pdf
+
+HEADER = "ACME CLOUD TERMS OF SERVICE"
+
+
+def run(pages: int = 100, chunk_tokens: int = 500) -> None:
+    packer = ChunkPacker(max_tokens=chunk_tokens)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_tos_pdf(str(Path(tmp) / "tos.pdf"), pages=pages, header=HEADER,
+                            page_numbers=True)
+        layout = PDFParser().extract_layout(path)
+
+        print(f"{pages} pages with a running header and page numbers, "
+              f"{chunk_tokens}-token chunks")
+        print(f"{'':<10}{'chapters':>10}{'characters':>12}{'chunks':>8}{'tokens':>9}"
+              f"{'parse':>10}")
+        rows = {}
+        for name, boilerplate_filter in (
+                ("plain", None),
+                ("stripped", BoilerplateFilter(chunk_tokens=chunk_tokens, estimate_chunks=True))):
+            parser = PDFParser(boilerplate_filter=boilerplate_filter)
+            stats = Counter()
+            started = time.perf_counter()
+            parsed = parser.parse(layout, stats)
+            elapsed = time.perf_counter() - started
+            chunks = [piece for chapter in parsed.chapters
+                      for piece in packer.split(chapter.chapter_text)]
+            rows[name] = stats, len(chunks)
+            print(f"{name:<10}{len(parsed.chapters):>10}"
+                  f"{sum(len(chapter.chapter_text) for chapter in parsed.chapters):>12}"
+                  f"{len(chunks):>8}{sum(tokens for _, tokens in chunks):>9}"
+                  f"{elapsed * 1000:>7.1f} ms")
+
+        stats, _ = rows["stripped"]
+        print(f"filter reported {stats['boilerplate_lines']} lines, "
+              f"{stats['boilerplate_chars']} characters and ~{stats['boilerplate_chunks']} "
+              f"chunks; measured {rows['plain'][1] - rows['stripped'][1]} chunks")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,78 @@
+"""Request count and tokens sent: character splitter vs token-budget packer.
+
+"Before" is the previous pipeline: RecursiveCharacterTextSplitter(8000, 150) per
+chapter or page and one request per chunk. "After" is ChunkPacker splitting on
+sentence boundaries and packing consecutive small chunks into shared requests.
+Tokens include the rendered prompt, since that overhead is paid once per request.
+
+Run with `python -m benchmarks.bench_chunk_packing`.
+"""
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.analyzer import schemas
+from app.analyzer.chunk_packer import ChunkPacker, estimate_tokens
+from app.analyzer.pdf_parser import PDFParser
+from app.analyzer.templates import batch_prompt_template, format_batch_clauses, prompt_template
+from app.config import settings
+from benchmarks.fixtures import make_tos_pdf
+
+CORPUS: Dict[str, dict] = {
+    "many short sections": dict(pages=40, paragraphs_per_page=3, paragraphs_per_section=1),
+    "mixed sections": dict(pages=40, paragraphs_per_page=3, paragraphs_per_section=3),
+    "long chapters": dict(pages=40, heading_pages=range(0, 40, 8)),
+    "no headings": dict(pages=40, heading_pages=[]),
+}
+
+
+def single_prompt_tokens(text: str) -> int:
+    return estimate_tokens(prompt_template.format(text=text, user_context=""))
+
+
+def before(sections: List[str]) -> Tuple[int, int]:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=8000, chunk_overlap=150)
+    chunks = [text for section in sections for text in splitter.split_text(section)]
+    return len(chunks), sum(single_prompt_tokens(text) for text in chunks)
+
+
+def after(sections: List[str]) -> Tuple[int, int]:
+    packer = ChunkPacker(settings.LLM_MAX_CHUNK_TOKENS, settings.LLM_CHUNK_OVERLAP_TOKENS)
+    chunks = [
+        schemas.DocumentChunk(index=index, text=text, tokens=tokens)
+        for index, (text, tokens) in enumerate(
+            piece for section in sections for piece in packer.split(section))
+    ]
+    groups = list(packer.pack(
+        chunks, settings.LLM_BATCH_MAX_ITEMS, settings.LLM_BATCH_MAX_CHUNK_TOKENS))
+
+    tokens = 0
+    for group in groups:
+        if len(group) == 1:
+            tokens += single_prompt_tokens(group[0].text)
+        else:
+            prompt = batch_prompt_template.format(
+                clauses=format_batch_clauses(chunk.text for chunk in group), user_context="")
+            tokens += estimate_tokens(prompt)
+    return len(groups), tokens
+
+
+def run() -> None:
+    parser = PDFParser()
+    print(f"{'document':<22}{'requests':>18}{'tokens sent':>26}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, options in CORPUS.items():
+            path = make_tos_pdf(str(Path(tmp) / "doc.pdf"), **options)
+            sections = [chapter.chapter_text for chapter in parser.parse(path).chapters]
+
+            requests_before, tokens_before = before(sections)
+            requests_after, tokens_after = after(sections)
+            print(f"{name:<22}{requests_before:>8} -> {requests_after:<6}"
+                  f"{tokens_before:>12} -> {tokens_after:<10}"
+                  f"x{requests_before / requests_after:.1f} fewer requests")
+
+
+if __name__ == "__main__":
+    run()
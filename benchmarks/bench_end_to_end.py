@@ -0,0 +1,174 @@
+"""End-to-end load: parse, split, analyze and save a corpus of generated PDFs offline.
+
+Documents go through the same steps as the analysis task (streamed parsing,
+chunking, the LLM pipeline with its limiter, scheduler, retries and output
+repair, and per-chunk saving through ResultStore) one after another, like a
+single worker. The LLM is FakeChatModel with log-normal latency and injected
+throttling and server errors; Redis is fakeredis and Mongo an in-memory
+collection that BSON-encodes what it stores. Chunk latency runs from the chunk
+being planned to its result being saved. Compare the numbers between commits to
+catch regressions.
+
+"single" sends every chunk to the primary model, rate limited to
+PRIMARY_REQUESTS_PER_SECOND. "cascade" first asks a triage model four times as
+fast, with its own rate limit and concurrency pool, and escalates only risky or
+low-confidence clauses to the primary model.
+
+Run with `python -m benchmarks.bench_end_to_end [documents] [latency_ms] [error_rate]`.
+"""
+import asyncio
+import logging
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import bson
+import fakeredis
+
+from app.analyzer.cascade import TriageTier
+from app.analyzer.concurrency_limiter import AdaptiveConcurrencyLimiter
+from app.analyzer.dedup import ChunkDeduplicator
+from app.analyzer.fair_scheduler import FairScheduler, Flow, current_flow
+from app.analyzer.llm_analyzer import LLMAnalyzer
+from app.analyzer.llm_backends import FakeChatModel
+from app.analyzer.pdf_parser import PDFParser
+from app.analyzer.rate_limiter import RateLimiter
+from app.analyzer.relevance import RelevanceFilter
+from app.analyzer.result_store import ResultStore
+from app.analyzer.retry_policy import RetryPolicy
+from app.analyzer.service import AnalyzerService
+from app.config import settings
+from benchmarks.fixtures import make_tos_pdf
+
+PRIMARY_REQUESTS_PER_SECOND = 10
+TRIAGE_REQUESTS_PER_SECOND = 40
+
+
+class MemoryCollection:
+    """The part of a Motor collection ResultStore uses, kept in a dict."""
+
+    def __init__(self):
+        self.documents: Dict[str, bytes] = {}
+
+    async def create_index(self, *args, **kwargs) -> None:
+        pass
+
+    async def distinct(self, field: str, query: dict) -> List[str]:
+        return []
+
+    async def replace_one(self, query: dict, document: dict, upsert: bool = False) -> None:
+        self.documents[query["chunk_key"]] = bson.encode(document)
+
+    async def delete_one(self, query: dict) -> None:
+        self.documents.pop(query["chunk_key"], None)
+
+    async def delete_many(self, query: dict):
+        return type("DeleteResult", (), {"deleted_count": 0})()
+
+
+def make_corpus(directory: Path, documents: int) -> List[str]:
+    paths = []
+    for number in range(documents):
+        pages = 10 + 10 * (number % 4)
+        # Every other document has no headings and is analyzed per page
+        heading_pages = None if number % 2 else []
+        paths.append(make_tos_pdf(str(directory / f"tos_{number}.pdf"), pages=pages,
+                                  heading_pages=heading_pages, seed=number))
+    return paths
+
+
+def make_service(latency: float, error_rate: float, cascade: bool = False,
+                 requests_per_second: int = PRIMARY_REQUESTS_PER_SECOND,
+                 redis: Optional[fakeredis.FakeAsyncRedis] = None,
+                 scheduler_capacity: int = settings.LLM_SCHEDULER_CAPACITY,
+                 slots: int = 1) -> AnalyzerService:
+    """Services given the same `redis` share their rate limits and scheduler, like workers.
+
+    The concurrency limits are those of a process analyzing `slots` documents at once.
+    """
+    if redis is None:
+        redis = fakeredis.FakeAsyncRedis()
+    llm = FakeChatModel(latency_median=latency, latency_sigma=0.5,
+                        throttle_rate=error_rate, error_rate=error_rate)
+    triage = None
+    if cascade:
+        triage = TriageTier(
+            llm=FakeChatModel(latency_median=latency / 4, latency_sigma=0.5,
+                              throttle_rate=error_rate, error_rate=error_rate, seed=1),
+            limiter=AdaptiveConcurrencyLimiter(
+                max_concurrent=settings.LLM_TRIAGE_MAX_CONCURRENT_REQUESTS,
+                initial_concurrent=settings.LLM_TRIAGE_INITIAL_CONCURRENT_REQUESTS),
+            rate_limiter=RateLimiter(redis, "llm_triage", TRIAGE_REQUESTS_PER_SECOND * 60),
+            escalate_at=settings.LLM_ESCALATE_RISK_LEVEL,
+            min_confidence=settings.LLM_ESCALATE_MIN_CONFIDENCE)
+    analyzer = LLMAnalyzer(
+        llm=llm,
+        max_chunk_tokens=settings.LLM_MAX_CHUNK_TOKENS,
+        chunk_overlap_tokens=settings.LLM_CHUNK_OVERLAP_TOKENS,
+        limiter=AdaptiveConcurrencyLimiter(
+            max_concurrent=settings.LLM_MAX_CONCURRENT_REQUESTS * slots,
+            initial_concurrent=settings.LLM_INITIAL_CONCURRENT_REQUESTS * slots),
+        deduplicator=ChunkDeduplicator(threshold=settings.LLM_DEDUP_THRESHOLD),
+        relevance_filter=RelevanceFilter(threshold=settings.LLM_RELEVANCE_THRESHOLD),
+        batch_max_items=settings.LLM_BATCH_MAX_ITEMS,
+        batch_max_chunk_tokens=settings.LLM_BATCH_MAX_CHUNK_TOKENS,
+        pipeline_workers=settings.LLM_PIPELINE_WORKERS,
+        pipeline_queue_depth=settings.LLM_PIPELINE_QUEUE_DEPTH,
+        rate_limiter=RateLimiter(redis, "llm", requests_per_second * 60),
+        scheduler=FairScheduler(redis, scheduler_capacity),
+        retry_policy=RetryPolicy(max_attempts=settings.MAX_RETRIES, base_delay=latency,
+                                 max_delay=latency * 10),
+        triage=triage)
+    return AnalyzerService(analyzer, PDFParser())
+
+
+async def analyze_corpus(service: AnalyzerService, paths: List[str]) -> List[float]:
+    latencies = []
+    for document_id, path in enumerate(paths, start=1):
+        current_flow.set(Flow(user_id=document_id, document_id=document_id))
+        store = ResultStore(MemoryCollection(), MemoryCollection(), document_id)
+        await store.load_completed()
+        planned = {}
+
+        def skip(chunk) -> bool:
+            planned[chunk.index] = time.perf_counter()
+            return store.is_completed(chunk)
+
+        async def save(chunk, result) -> None:
+            await store.save(chunk, result)
+            latencies.append(time.perf_counter() - planned[chunk.index])
+
+        await service.stream(path, "I am a regular user", save, skip=skip)
+        await store.prune()
+    return latencies
+
+
+def run(documents: int = 8, latency_ms: float = 200, error_rate: float = 0.02) -> None:
+    logging.disable(logging.INFO)
+    print(f"{documents} documents, fake LLM median {latency_ms:.0f} ms, "
+          f"{error_rate:.0%} throttled and {error_rate:.0%} failed requests, "
+          f"primary model limited to {PRIMARY_REQUESTS_PER_SECOND} requests/s")
+    print(f"{'':<8}{'documents/min':>14}{'chunks':>8}{'chunk p50':>12}{'chunk p99':>12}"
+          f"{'primary requests':>18}{'peak RSS':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(Path(tmp), documents)
+        for name, cascade in (("single", False), ("cascade", True)):
+            service = make_service(latency_ms / 1000, error_rate, cascade)
+            started = time.perf_counter()
+            latencies = asyncio.run(analyze_corpus(service, paths))
+            elapsed = time.perf_counter() - started
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{name:<8}{documents / elapsed * 60:>14.1f}{len(latencies):>8}"
+                  f"{statistics.median(latencies) * 1000:>9.0f} ms{p99 * 1000:>9.0f} ms"
+                  f"{sum(service.analyzer.llm.requests.values()):>18}{peak_rss / 1024:>8.0f} MiB")
+
+
+if __name__ == "__main__":
+    run(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:4])))
@@ -0,0 +1,98 @@
+"""Small-document latency next to large uploads: FIFO slots vs the fair scheduler.
+
+A few users each analyze a large document with a full pipeline of workers, while
+other users submit small documents at a steady pace. "Before" hands out the
+shared slots first come, first served, like workers contending for one global
+limit. "After" is FairScheduler on a fakeredis stand-in. Latency is measured
+from submitting a small document to its last chunk finishing.
+
+Run with `python -m benchmarks.bench_fair_scheduler`.
+"""
+import asyncio
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, Callable, List, Tuple
+
+import fakeredis
+
+from app.analyzer.fair_scheduler import FairScheduler, Flow
+
+CAPACITY = 4
+LLM_LATENCY = 0.1
+LARGE_DOCUMENTS = 3
+LARGE_CHUNKS = 60
+PIPELINE_WORKERS = 8
+SMALL_CHUNKS = 3
+SMALL_INTERVAL = 0.25
+
+Slot = Callable[[Flow], AsyncContextManager]
+
+
+def fifo_slots() -> Slot:
+    semaphore = asyncio.Semaphore(CAPACITY)
+
+    @asynccontextmanager
+    async def slot(flow: Flow):
+        async with semaphore:
+            yield
+    return slot
+
+
+async def analyze(slot: Slot, flow: Flow, chunks: int, workers: int) -> None:
+    remaining = iter(range(chunks))
+
+    async def worker():
+        for _ in remaining:
+            async with slot(flow):
+                await asyncio.sleep(LLM_LATENCY)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+
+async def simulate(slot: Slot) -> Tuple[List[float], float]:
+    started = time.perf_counter()
+    large = [
+        asyncio.create_task(analyze(slot, Flow(user_id=user, document_id=user),
+                                    LARGE_CHUNKS, PIPELINE_WORKERS))
+        for user in range(1, LARGE_DOCUMENTS + 1)
+    ]
+    latencies = []
+
+    async def small(user: int):
+        submitted = time.perf_counter()
+        await analyze(slot, Flow(user_id=user, document_id=user), SMALL_CHUNKS, SMALL_CHUNKS)
+        latencies.append(time.perf_counter() - submitted)
+
+    smalls = []
+    user = 100
+    while not all(task.done() for task in large):
+        smalls.append(asyncio.create_task(small(user)))
+        user += 1
+        await asyncio.sleep(SMALL_INTERVAL)
+    large_elapsed = time.perf_counter() - started
+    await asyncio.gather(*smalls)
+    return latencies, large_elapsed
+
+
+def report(name: str, latencies: List[float], large_elapsed: float) -> None:
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<8}{len(latencies):>7}{statistics.median(latencies) * 1000:>10.0f} ms"
+          f"{p99 * 1000:>10.0f} ms{latencies[-1] * 1000:>10.0f} ms{large_elapsed:>12.2f} s")
+
+
+def run() -> None:
+    print(f"{LARGE_DOCUMENTS} large documents x {LARGE_CHUNKS} chunks, small documents of "
+          f"{SMALL_CHUNKS} chunks every {SMALL_INTERVAL * 1000:.0f} ms, {CAPACITY} slots")
+    print(f"{'':<8}{'small':>7}{'p50':>13}{'p99':>13}{'max':>13}{'large done':>14}")
+    report("before", *asyncio.run(simulate(fifo_slots())))
+
+    async def fair():
+        scheduler = FairScheduler(fakeredis.FakeAsyncRedis(), CAPACITY)
+        return await simulate(scheduler.slot)
+    report("after", *asyncio.run(fair()))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,119 @@
+"""Measures how fanning one large document out over several workers shortens its analysis.
+
+A single generated document is analyzed end to end by one worker, as the
+single-task mode does, then planned once and cut into slices that 1, 2, 4 and 8
+simulated workers take from a shared queue, as Celery would hand out the chord's
+analysis tasks. Every worker has its own AnalyzerService, and so its own
+concurrency limiter and pipeline, while all of them share one Redis stand-in
+for the cluster-wide rate limit, the scheduler and the chunk store. The
+scheduler is sized for the cluster, with LLM_MAX_CONCURRENT_REQUESTS slots per
+worker, and the LLM is FakeChatModel. A fanned-out document is parsed in full
+before its analysis starts, so on a single worker the streaming single task is
+faster. Reports the document's wall time and the size of the analysis tasks'
+broker messages, with chunks passed by reference and, for comparison, inlined.
+
+Run with `python -m benchmarks.bench_fan_out [pages] [latency_ms] [requests_per_second]`.
+"""
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import fakeredis
+
+from app.analyzer.chunk_store import ChunkStore
+from app.analyzer.fair_scheduler import Flow, current_flow
+from app.analyzer.fan_out import FanOutPlan, analyze_slice, plan_fan_out
+from app.analyzer.result_store import ResultStore
+from app.analyzer.service import AnalyzerService
+from app.config import settings
+from benchmarks.bench_end_to_end import MemoryCollection, make_service
+from benchmarks.fixtures import make_tos_pdf
+
+FLOW = Flow(user_id=1, document_id=1)
+USER_CONTEXT = "I am a regular user"
+
+
+def make_worker(redis: fakeredis.FakeAsyncRedis, latency: float, requests_per_second: int,
+                workers: int) -> AnalyzerService:
+    service = make_service(latency, 0.02, requests_per_second=requests_per_second, redis=redis,
+                           scheduler_capacity=settings.LLM_MAX_CONCURRENT_REQUESTS * workers)
+    service.chunk_store = ChunkStore(redis, ttl_seconds=3600)
+    return service
+
+
+async def single_task(service: AnalyzerService, path: str) -> None:
+    current_flow.set(FLOW)
+    store = ResultStore(MemoryCollection(), MemoryCollection(), FLOW.document_id)
+    await service.stream(path, USER_CONTEXT, store.save)
+
+
+async def fanned_out(workers: List[AnalyzerService], path: str) -> FanOutPlan:
+    current_flow.set(FLOW)
+    clauses, failures = MemoryCollection(), MemoryCollection()
+    plan = await plan_fan_out(workers[0], ResultStore(clauses, failures, FLOW.document_id),
+                              path, settings.ANALYSIS_FANOUT_CHUNKS_PER_TASK)
+    queue: asyncio.Queue = asyncio.Queue()
+    for start, stop in plan.slices:
+        queue.put_nowait((start, stop))
+
+    async def work(service: AnalyzerService) -> None:
+        while not queue.empty():
+            start, stop = queue.get_nowait()
+            store = ResultStore(clauses, failures, FLOW.document_id)
+            await analyze_slice(service, store, plan.key, start, stop, plan.with_chapter,
+                                USER_CONTEXT)
+
+    await asyncio.gather(*map(work, workers))
+    return plan
+
+
+async def message_sizes(service: AnalyzerService, plan: FanOutPlan) -> Tuple[int, int]:
+    """Broker message bytes of the analysis tasks, by reference and with chunks inlined."""
+    by_reference = inlined = 0
+    for start, stop in plan.slices:
+        args = [FLOW.document_id, FLOW.user_id, FLOW.priority, plan.key, start, stop,
+                plan.with_chapter, USER_CONTEXT]
+        chunks = await service.chunk_store.get(plan.key, start, stop)
+        by_reference += len(json.dumps(args))
+        inlined += len(json.dumps(args[:3] + [[chunk.model_dump() for chunk in chunks]]
+                                  + args[6:]))
+    return by_reference, inlined
+
+
+def run(pages: int = 300, latency_ms: float = 200, requests_per_second: int = 200) -> None:
+    logging.disable(logging.WARNING)
+    latency = latency_ms / 1000
+    print(f"one {pages}-page document, fake LLM median {latency_ms:.0f} ms, "
+          f"{requests_per_second} requests/s cluster-wide, "
+          f"{settings.LLM_MAX_CONCURRENT_REQUESTS} concurrent requests per worker, "
+          f"{settings.ANALYSIS_FANOUT_CHUNKS_PER_TASK} chunks per task")
+    print(f"{'':<14}{'workers':>8}{'tasks':>7}{'wall time':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_tos_pdf(str(Path(tmp) / "tos.pdf"), pages=pages)
+
+        service = make_worker(fakeredis.FakeAsyncRedis(), latency, requests_per_second, 1)
+        started = time.perf_counter()
+        asyncio.run(single_task(service, path))
+        print(f"{'single task':<14}{1:>8}{1:>7}{time.perf_counter() - started:>10.1f} s")
+
+        for count in (1, 2, 4, 8):
+            redis = fakeredis.FakeAsyncRedis()
+            workers = [make_worker(redis, latency, requests_per_second, count)
+                       for _ in range(count)]
+            started = time.perf_counter()
+            plan = asyncio.run(fanned_out(workers, path))
+            print(f"{'fan-out':<14}{count:>8}{len(plan.slices):>7}"
+                  f"{time.perf_counter() - started:>10.1f} s")
+
+        by_reference, inlined = asyncio.run(message_sizes(workers[0], plan))
+        print(f"analysis task messages: {by_reference / 1024:.1f} KiB by reference, "
+              f"{inlined / 1024:.1f} KiB with chunks inlined")
+
+
+if __name__ == "__main__":
+    run(*(float(arg) if i == 1 else int(arg) for i, arg in enumerate(sys.argv[1:4])))
@@ -0,0 +1,79 @@
+"""Counts the invalid clauses that pattern-only heading detection leaves per document.
+
+Generates documents whose clauses flow across page breaks, with headings in
+each of the fixture styles (all caps, bold numbered, bold title case and
+numbered in the body font), and parses them with the all-caps patterns only and
+with the font-aware heading classifier. Chapters are split into chunks as
+LLMAnalyzer does. A chunk counts as invalid, as the model would judge it, when
+it holds a partial sentence or sentences from more than one clause, e.g. a page
+cut mid-clause or a heading merged into the text.
+
+Run with `python -m benchmarks.bench_heading_detection [documents_per_style]`.
+"""
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.analyzer.chunk_packer import ChunkPacker
+from app.analyzer.headings import HeadingClassifier
+from app.analyzer.pdf_parser import PDFParser
+from app.config import settings
+from benchmarks.fixtures import HEADING_STYLES, make_flowing_tos_pdf
+
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=\.)\s+")
+
+
+def is_valid_chunk(text: str, owners: Dict[str, int]) -> bool:
+    """Whether the chunk holds only whole sentences of a single clause."""
+    clauses = {owners.get(piece) for piece in _SENTENCE_BOUNDARY_RE.split(" ".join(text.split()))}
+    return None not in clauses and len(clauses) == 1
+
+
+def score(parser: PDFParser, packer: ChunkPacker, path: str,
+          sections: List[Tuple[str, List[str]]]) -> Tuple[int, int, int, float]:
+    """Returns chapters, chunks, invalid chunks and parse seconds of one document."""
+    owners = {text: index for index, (_, sentences) in enumerate(sections)
+              for text in sentences}
+    started = time.perf_counter()
+    parsed = parser.parse(path)
+    elapsed = time.perf_counter() - started
+    chunks = [text for chapter in parsed.chapters
+              for text, _ in packer.split(chapter.chapter_text)]
+    invalid = sum(not is_valid_chunk(text, owners) for text in chunks)
+    return len(parsed.chapters) if parsed.has_chapters else 0, len(chunks), invalid, elapsed
+
+
+def run(documents: int = 4) -> None:
+    packer = ChunkPacker(max_tokens=settings.LLM_MAX_CHUNK_TOKENS,
+                         overlap_tokens=settings.LLM_CHUNK_OVERLAP_TOKENS)
+    parsers = {"patterns": PDFParser(),
+               "classifier": PDFParser(heading_classifier=HeadingClassifier())}
+    print(f"{documents} documents per heading style, {settings.LLM_MAX_CHUNK_TOKENS}-token "
+          f"chunks; per document averages")
+    print(f"{'':<18}{'':<12}{'chapters':>10}{'chunks':>8}{'invalid':>9}{'parse':>10}")
+    totals = {name: [0, 0] for name in parsers}
+    with tempfile.TemporaryDirectory() as tmp:
+        for style in HEADING_STYLES:
+            corpus = []
+            for seed in range(documents):
+                path = str(Path(tmp) / f"{style.replace(' ', '_')}_{seed}.pdf")
+                corpus.append((path, make_flowing_tos_pdf(path, heading_style=style, seed=seed)))
+            for name, parser in parsers.items():
+                rows = [score(parser, packer, path, sections) for path, sections in corpus]
+                chapters, chunks, invalid, elapsed = (sum(column) / documents
+                                                      for column in zip(*rows))
+                totals[name][0] += chunks
+                totals[name][1] += invalid
+                print(f"{style:<18}{name:<12}{chapters:>10.1f}{chunks:>8.1f}{invalid:>9.1f}"
+                      f"{elapsed * 1000:>7.1f} ms")
+
+    for name, (chunks, invalid) in totals.items():
+        print(f"{name}: {invalid / len(HEADING_STYLES):.1f} invalid of "
+              f"{chunks / len(HEADING_STYLES):.1f} chunks per document")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,133 @@
+"""Compares the legacy two-pass PDF parsing flow with the single-pass layout model.
+
+Run with `python -m benchmarks.bench_pdf_parsing [pages] [workers]`.
+"""
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import pymupdf
+
+from app.analyzer.pdf_parser import PDFParser
+from benchmarks.fixtures import make_tos_pdf
+
+LEGACY_PATTERNS = [
+    r'^[A-Z][A-Z\s,;\–-]{8,}(?:\n|$)',
+    r'^[A-Z]\.\s+[A-Z][A-Z\s,;\-]{2,}$'
+]
+
+
+def _legacy_match(parser: PDFParser, text: str) -> bool:
+    stripped = text.strip()
+    return (
+        any((re.match(pattern, stripped) for pattern in LEGACY_PATTERNS))
+        and parser._is_heading_candidate(stripped)
+    )
+
+
+def _legacy_lines(doc):
+    for page_num in range(len(doc)):
+        for block in doc[page_num].get_text("dict")["blocks"]:
+            if "lines" not in block:
+                continue
+            for line in block["lines"]:
+                yield page_num, " ".join(span["text"] for span in line["spans"]).strip()
+
+
+def legacy_flow(parser: PDFParser, path: str) -> int:
+    """Baseline: `has_identifiable_chapters` and the parse step each lay out every page."""
+    doc = pymupdf.open(path)
+    has_chapters = any(_legacy_match(parser, line) for _, line in _legacy_lines(doc))
+
+    doc = pymupdf.open(path)
+    if not has_chapters:
+        return sum(len(page.get_text()) for page in doc)
+    headings = 0
+    for _, line in _legacy_lines(doc):
+        headings += _legacy_match(parser, line)
+    return headings
+
+
+def single_pass_flow(parser: PDFParser, path: str) -> int:
+    layout = parser.extract_layout(path)
+    if not parser.has_identifiable_chapters(layout):
+        return sum(len(text) for text in parser.iter_text(layout))
+    return sum(1 for _ in parser.parse_using_re(layout))
+
+
+class LayoutCounter:
+    """Counts `Page.get_text` calls and the bytes allocated while they run."""
+
+    def __init__(self):
+        self.calls = 0
+        self.allocated = 0
+        self._get_text = pymupdf.Page.get_text
+
+    def __enter__(self):
+        counter = self
+
+        def get_text(page, *args, **kwargs):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = counter._get_text(page, *args, **kwargs)
+            counter.calls += 1
+            counter.allocated += tracemalloc.get_traced_memory()[1] - before
+            return result
+
+        pymupdf.Page.get_text = get_text
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        tracemalloc.stop()
+        pymupdf.Page.get_text = self._get_text
+
+
+def measure(flow: Callable[[PDFParser, str], int], path: str,
+            parser: Optional[PDFParser] = None, repeat: int = 3) -> Tuple[float, LayoutCounter]:
+    """Returns best wall-clock seconds and the layout counters of one extra run."""
+    parser = parser or PDFParser()
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        flow(parser, path)
+        timings.append(time.perf_counter() - start)
+
+    with LayoutCounter() as counter:
+        flow(parser, path)
+    return min(timings), counter
+
+
+def run(pages: int = 300, workers: int = 4) -> None:
+    scenarios = {
+        # Headings only on the last pages: detection walks almost the whole file
+        "late headings": list(range(pages - 5, pages)),
+        "no headings": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, heading_pages in scenarios.items():
+            path = str(Path(tmp) / f"{name.replace(' ', '_')}.pdf")
+            make_tos_pdf(path, pages=pages, heading_pages=heading_pages)
+
+            legacy_time, legacy_layout = measure(legacy_flow, path)
+            new_time, new_layout = measure(single_pass_flow, path)
+            print(f"{name} ({pages} pages)")
+            for label, seconds, layout in (("legacy two-pass", legacy_time, legacy_layout),
+                                           ("single-pass", new_time, new_layout)):
+                print(f"  {label:<16} {seconds:7.3f}s  {layout.calls:4d} page layouts  "
+                      f"{layout.allocated / 2 ** 20:8.2f} MiB allocated")
+            print(f"  speedup x{legacy_time / new_time:.2f}")
+
+            # Page layouts happen in child processes, so only wall-clock is meaningful here
+            parallel = PDFParser(parallel_min_pages=1, parallel_workers=workers)
+            parallel_time, _ = measure(single_pass_flow, path, parser=parallel)
+            print(f"  {workers} process shards  {parallel_time:7.3f}s  "
+                  f"speedup x{legacy_time / parallel_time:.2f}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
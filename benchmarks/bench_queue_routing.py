@@ -0,0 +1,91 @@
+"""Measures the cost of size-aware routing, and simulates what separate lanes do for small jobs.
+
+Generates small and large PDFs and times `analysis_queue`, the metadata read
+the enqueue path now makes. Then replays a backlog of large documents followed
+by a stream of small ones through the same workers twice, with the queue each
+document was routed to: once as a single FIFO queue, and once as a small lane
+served by `small_workers` of them and a large lane served by the rest. The
+replay is a simulation: a document occupies its worker for a fixed cost plus a
+cost per page, which stands in for the LLM time measured by bench_end_to_end.
+Reports the time small documents take from queuing to done, and when the last
+large one finishes.
+
+Run with `python -m benchmarks.bench_queue_routing [workers] [small_workers]`.
+"""
+import heapq
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.config import settings
+from app.tasks import analysis_queue
+from benchmarks.fixtures import make_tos_pdf
+
+SECONDS_PER_DOCUMENT = 2.0
+SECONDS_PER_PAGE = 1.0
+LARGE_PAGES = (150, 300)
+SMALL_PAGES = (2, 5, 10)
+LARGE_BACKLOG = 12
+SMALL_ARRIVALS = 30
+SMALL_INTERVAL = 20.0
+
+# (arrival time, pages, queue)
+Job = Tuple[float, int, str]
+
+
+def simulate(jobs: List[Job], lanes: Dict[str, int]) -> Dict[str, List[Tuple[float, float]]]:
+    """Runs jobs first come, first served on each lane's workers; returns (arrival, done) per
+    queue. `lanes` maps each queue to its number of workers; a queue without a lane of its
+    own shares the "*" lane."""
+    done: Dict[str, List[Tuple[float, float]]] = {}
+    free = {lane: [0.0] * count for lane, count in lanes.items()}
+    for arrival, pages, queue in sorted(jobs):
+        workers = free[queue if queue in free else "*"]
+        start = max(arrival, heapq.heappop(workers))
+        finish = start + SECONDS_PER_DOCUMENT + SECONDS_PER_PAGE * pages
+        heapq.heappush(workers, finish)
+        done.setdefault(queue, []).append((arrival, finish))
+    return done
+
+
+def run(workers: int = 4, small_workers: int = 1) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {pages: make_tos_pdf(str(Path(tmp) / f"tos_{pages}.pdf"), pages=pages)
+                 for pages in SMALL_PAGES + LARGE_PAGES}
+        print("routing cost per document (metadata read)")
+        queues = {}
+        for pages, path in paths.items():
+            started = time.perf_counter()
+            for _ in range(20):
+                queues[pages] = analysis_queue(path)
+            elapsed = (time.perf_counter() - started) / 20
+            print(f"{pages:>5} pages {Path(path).stat().st_size / 1024:>8.0f} KiB"
+                  f"{elapsed * 1000:>8.2f} ms  -> {queues[pages]}")
+
+    jobs = []
+    for number in range(LARGE_BACKLOG):
+        pages = LARGE_PAGES[number % len(LARGE_PAGES)]
+        jobs.append((0.0, pages, queues[pages]))
+    for number in range(SMALL_ARRIVALS):
+        pages = SMALL_PAGES[number % len(SMALL_PAGES)]
+        jobs.append((SMALL_INTERVAL * (number + 1), pages, queues[pages]))
+
+    print(f"\n{LARGE_BACKLOG} large documents queued, then {SMALL_ARRIVALS} small ones every "
+          f"{SMALL_INTERVAL:.0f} s; {workers} workers")
+    print(f"{'':<28}{'small p50':>11}{'small p99':>11}{'large done':>12}")
+    for name, lanes in (("one queue", {"*": workers}),
+                        (f"lanes ({small_workers} small, {workers - small_workers} large)",
+                         {settings.ANALYSIS_SMALL_QUEUE: small_workers,
+                          "*": workers - small_workers})):
+        done = simulate(jobs, lanes)
+        small = sorted(finish - arrival for arrival, finish in done[settings.ANALYSIS_SMALL_QUEUE])
+        p99 = small[min(len(small) - 1, int(len(small) * 0.99))]
+        large_done = max(finish for _, finish in done[settings.ANALYSIS_LARGE_QUEUE])
+        print(f"{name:<28}{statistics.median(small):>9.0f} s{p99:>9.0f} s{large_done:>10.0f} s")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
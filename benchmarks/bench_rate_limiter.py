@@ -0,0 +1,96 @@
+"""Throughput and idle gaps: polling moving window vs reserved token-bucket slots.
+
+"Before" is the previous `_wait_for_rate_limit`: a synchronous moving-window hit
+(the `limits` package's in-memory moving window, reproduced here since the app no
+longer depends on it) and, when denied, a fixed RETRY_BACKOFF_BASE * 3 sleep
+followed by the call without checking again. "After" is RateLimiter reserving slots on a fakeredis
+stand-in. Time is compressed 60x, so the configured requests per minute are
+issued per second and the backoff shrinks accordingly.
+
+Run with `python -m benchmarks.bench_rate_limiter [requests_per_minute] [seconds]`.
+"""
+import asyncio
+import sys
+import time
+from collections import deque
+from typing import List
+
+import fakeredis
+
+from app.analyzer.rate_limiter import RateLimiter
+from app.config import settings
+
+COMPRESSION = 60
+WORKERS = 8
+LLM_LATENCY = 0.05
+
+
+class MovingWindow:
+    """At most `rate` hits in any one-second window."""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.hits = deque()
+
+    def hit(self) -> bool:
+        now = time.perf_counter()
+        while self.hits and self.hits[0] <= now - 1:
+            self.hits.popleft()
+        if len(self.hits) >= self.rate:
+            return False
+        self.hits.append(now)
+        return True
+
+
+async def before(rate: int, duration: float) -> List[float]:
+    limiter = MovingWindow(rate)
+    backoff = settings.RETRY_BACKOFF_BASE * 3 / COMPRESSION
+    starts = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            if not limiter.hit():
+                await asyncio.sleep(backoff)
+            starts.append(time.perf_counter())
+            await asyncio.sleep(LLM_LATENCY)
+
+    await asyncio.gather(*(worker() for _ in range(WORKERS)))
+    return starts
+
+
+async def after(rate: int, duration: float) -> List[float]:
+    limiter = RateLimiter(fakeredis.FakeAsyncRedis(), "llm", requests_per_minute=rate * 60)
+    starts = []
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await limiter.acquire()
+            starts.append(time.perf_counter())
+            await asyncio.sleep(LLM_LATENCY)
+
+    await asyncio.gather(*(worker() for _ in range(WORKERS)))
+    return starts
+
+
+def report(name: str, starts: List[float], rate: int) -> None:
+    starts.sort()
+    elapsed = starts[-1] - starts[0]
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    busiest = max(sum(1 for t in starts[i:] if t < start + 1) for i, start in enumerate(starts))
+    print(f"{name:<8}{len(starts) / elapsed:>10.1f}/s{max(gaps) * 1000:>14.0f} ms"
+          f"{busiest:>12} (limit {rate})")
+
+
+def run(requests_per_minute: int = 20, duration: float = 5.0) -> None:
+    rate = requests_per_minute
+    print(f"{requests_per_minute} requests per minute, compressed {COMPRESSION}x, "
+          f"{WORKERS} workers, {duration:.0f}s")
+    print(f"{'':<8}{'throughput':>12}{'max idle gap':>17}{'busiest second':>15}")
+    report("before", asyncio.run(before(rate, duration)), rate)
+    report("after", asyncio.run(after(rate, duration)), rate)
+
+
+if __name__ == "__main__":
+    run(*(float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:])))
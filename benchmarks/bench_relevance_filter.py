@@ -0,0 +1,55 @@
+"""Request savings vs recall of the relevance pre-filter across thresholds.
+
+Scores the labelled chunks in `benchmarks.fixtures.LABELLED_CHUNKS` (substantive
+clauses next to tables of contents, contact blocks, glossaries, preambles and
+page furniture) and reports, per threshold, the share of LLM requests saved, the
+recall of substantive chunks (the share still analyzed) and how many of the
+skipped chunks really were non-substantive. "Before" is no filter: every chunk
+costs a request at full recall.
+
+Run with `python -m benchmarks.bench_relevance_filter`.
+"""
+import time
+
+from app.analyzer.relevance import RelevanceFilter
+from app.config import settings
+from benchmarks.fixtures import LABELLED_CHUNKS
+
+THRESHOLDS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+
+
+def evaluate(threshold: float):
+    relevance_filter = RelevanceFilter(threshold=threshold)
+    kept = skipped = missed = 0
+    for chapter_name, text, relevant in LABELLED_CHUNKS:
+        if relevance_filter.is_relevant(text, chapter_name):
+            kept += relevant
+        else:
+            skipped += 1
+            missed += relevant
+    relevant_total = sum(relevant for _, _, relevant in LABELLED_CHUNKS)
+    return (skipped / len(LABELLED_CHUNKS), kept / relevant_total,
+            (skipped - missed) / skipped if skipped else 1.0)
+
+
+def run() -> None:
+    relevant_total = sum(relevant for _, _, relevant in LABELLED_CHUNKS)
+    print(f"{len(LABELLED_CHUNKS)} labelled chunks, {relevant_total} substantive")
+    print(f"{'threshold':>10}{'requests saved':>16}{'recall':>9}{'skip precision':>16}")
+    print(f"{'none':>10}{0:>16.0%}{1:>9.0%}{'-':>16}")
+    for threshold in THRESHOLDS:
+        saved, recall, precision = evaluate(threshold)
+        marker = "  (configured)" if threshold == settings.LLM_RELEVANCE_THRESHOLD else ""
+        print(f"{threshold:>10.2f}{saved:>16.0%}{recall:>9.0%}{precision:>16.0%}{marker}")
+
+    relevance_filter = RelevanceFilter()
+    started = time.perf_counter()
+    for _ in range(100):
+        for chapter_name, text, _ in LABELLED_CHUNKS:
+            relevance_filter.score(text, chapter_name)
+    elapsed = (time.perf_counter() - started) / (100 * len(LABELLED_CHUNKS))
+    print(f"scoring takes {elapsed * 1e6:.0f} µs per chunk")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,111 @@
+"""Compares one document per worker process with many documents per process on one event loop.
+
+Analyzes the same corpus with the two worker pools. "prefork" forks one process
+per slot, each with its own WorkerRuntime taking one document at a time, as
+Celery's prefork pool does. "threads" forks a single process with one
+WorkerRuntime, and as many threads as slots submit documents to it, as
+Celery's threads pool does. Its concurrency limiter (initial window and
+ceiling) and scheduler are sized to the prefork processes' combined limits, so
+both pools may keep as many LLM requests in flight. The LLM is FakeChatModel,
+and the rate limit is set high enough not to bind, since each process has its
+own Redis stand-in. Reports throughput, processes, and the memory of the worker
+processes as their summed proportional set size (shared pages split between
+the processes sharing them) and summed peak RSS.
+
+Run with `python -m benchmarks.bench_worker_pool [documents] [slots] [latency_ms]`.
+"""
+import logging
+import multiprocessing
+import queue
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Tuple
+
+from app.analyzer.fair_scheduler import Flow, current_flow
+from app.analyzer.result_store import ResultStore
+from app.analyzer.service import AnalyzerService
+from app.config import settings
+from app.worker_runtime import WorkerRuntime
+from benchmarks.bench_end_to_end import MemoryCollection, make_corpus, make_service
+
+REQUESTS_PER_SECOND = 1000
+ERROR_RATE = 0.02
+
+
+async def analyze(service: AnalyzerService, document_id: int, path: str) -> None:
+    current_flow.set(Flow(user_id=document_id, document_id=document_id))
+    store = ResultStore(MemoryCollection(), MemoryCollection(), document_id)
+    await service.stream(path, "I am a regular user", store.save)
+
+
+def memory() -> Tuple[int, int]:
+    """Proportional set size and peak RSS of this process, in KiB."""
+    pss = 0
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            pss = next(int(line.split()[1]) for line in smaps if line.startswith("Pss:"))
+    except OSError:
+        pass
+    return pss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def worker(documents: multiprocessing.Queue, results: multiprocessing.Queue, latency: float,
+           slots: int) -> None:
+    """A worker process analyzing `slots` documents at a time until the queue is empty."""
+    logging.disable(logging.WARNING)
+    runtime = WorkerRuntime(lambda: make_service(
+        latency, ERROR_RATE, requests_per_second=REQUESTS_PER_SECOND,
+        scheduler_capacity=settings.LLM_MAX_CONCURRENT_REQUESTS * slots, slots=slots)).start()
+
+    def take() -> None:
+        while True:
+            try:
+                document_id, path = documents.get(timeout=0.1)
+            except queue.Empty:
+                return
+            runtime.run(analyze(runtime.service, document_id, path))
+
+    threads = [threading.Thread(target=take) for _ in range(slots)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(memory())
+    runtime.stop()
+
+
+def run_pool(paths, processes: int, slots: int, latency: float) -> Tuple[float, int, int]:
+    context = multiprocessing.get_context("fork")
+    documents, results = context.Queue(), context.Queue()
+    for document_id, path in enumerate(paths, start=1):
+        documents.put((document_id, path))
+    started = time.perf_counter()
+    workers = [context.Process(target=worker, args=(documents, results, latency, slots))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    usage = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - started
+    for process in workers:
+        process.join()
+    return elapsed, sum(pss for pss, _ in usage), sum(rss for _, rss in usage)
+
+
+def run(documents: int = 16, slots: int = 8, latency_ms: float = 200) -> None:
+    logging.disable(logging.WARNING)
+    print(f"{documents} documents, {slots} at a time, fake LLM median {latency_ms:.0f} ms")
+    print(f"{'':<10}{'processes':>10}{'documents/min':>15}{'PSS':>12}{'peak RSS':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(Path(tmp), documents)
+        for name, processes, per_process in (("prefork", slots, 1), ("threads", 1, slots)):
+            elapsed, pss, rss = run_pool(paths, processes, per_process, latency_ms / 1000)
+            print(f"{name:<10}{processes:>10}{documents / elapsed * 60:>15.1f}"
+                  f"{pss / 1024:>8.0f} MiB{rss / 1024:>8.0f} MiB")
+
+
+if __name__ == "__main__":
+    run(*(float(arg) if i == 2 else int(arg) for i, arg in enumerate(sys.argv[1:4])))
@@ -0,0 +1,95 @@
+"""Measures the fixed per-task overhead of the analysis task, with and without the worker runtime.
+
+Runs the same short document through the task's steps again and again, once
+the way tasks used to, building a new AnalyzerService and event loop for every
+task, and once submitting every task to a single WorkerRuntime. The fake LLM
+answers in a millisecond, so what remains is mostly the fixed cost of a task.
+The Gemini client a real service builds is measured on its own, since it can't
+answer offline: the time to construct it with its chains and open its channel
+on a fresh loop, which every task used to pay on top (the TLS handshake of its
+first request is not included).
+
+Run with `python -m benchmarks.bench_worker_runtime [tasks]`.
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.analyzer import schemas
+from app.analyzer.llm_backends import warm_up
+from app.analyzer.service import AnalyzerService
+from app.config import settings
+from app.worker_runtime import WorkerRuntime
+from benchmarks.bench_end_to_end import analyze_corpus, make_service
+from benchmarks.fixtures import make_tos_pdf
+
+LATENCY = 0.001
+# High enough that the shared rate limit never delays a task
+REQUESTS_PER_SECOND = 10_000
+
+
+def fake_service() -> AnalyzerService:
+    return make_service(LATENCY, 0, requests_per_second=REQUESTS_PER_SECOND)
+
+
+def per_task(path: str) -> None:
+    service = fake_service()
+    asyncio.run(analyze_corpus(service, [path]))
+
+
+def build_gemini_client() -> None:
+    llm = ChatGoogleGenerativeAI(model=settings.LLM_MODEL_NAME, google_api_key="offline")
+    llm.with_structured_output(schemas.ClauseAnalysis, include_raw=True)
+    llm.with_structured_output(schemas.ClauseAnalysisBatch, include_raw=True)
+
+    async def open_channel() -> None:
+        warm_up(llm)
+    asyncio.run(open_channel())
+
+
+def timings(task: Callable[[], None], tasks: int) -> List[float]:
+    task()  # imports and first-use costs are paid once per process either way
+    durations = []
+    for _ in range(tasks):
+        started = time.perf_counter()
+        task()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def run(tasks: int = 50) -> None:
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_tos_pdf(str(Path(tmp) / "tos.pdf"), pages=1, heading_pages=[])
+        runtime = WorkerRuntime(fake_service).start()
+        try:
+            rows = {
+                "per task": timings(lambda: per_task(path), tasks),
+                "runtime": timings(
+                    lambda: runtime.run(analyze_corpus(runtime.service, [path])), tasks),
+            }
+        finally:
+            runtime.stop()
+        gemini = timings(build_gemini_client, tasks)
+
+    print(f"{tasks} tasks of a one-page document, fake LLM median {LATENCY * 1000:.0f} ms")
+    print(f"{'':<10}{'mean':>10}{'p50':>10}{'p99':>10}")
+    for name, durations in rows.items():
+        durations.sort()
+        p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+        print(f"{name:<10}{statistics.mean(durations) * 1000:>7.1f} ms"
+              f"{statistics.median(durations) * 1000:>7.1f} ms{p99 * 1000:>7.1f} ms")
+    saved = statistics.mean(rows["per task"]) - statistics.mean(rows["runtime"])
+    print(f"fixed overhead saved per task: {saved * 1000:.1f} ms, plus "
+          f"{statistics.mean(gemini) * 1000:.1f} ms building the Gemini client")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,182 @@
+import random
+import textwrap
+import pymupdf
+from typing import Dict, List, Optional, Sequence, Tuple
+
+WORDS = (
+    "service user account agreement terms party data license content provider "
+    "may shall not any all such other right rights notice law liability use access "
+    "third information without limited including subscription fee payment period"
+).split()
+
+HEADINGS = (
+    "TERMS OF SERVICE", "ACCOUNT REGISTRATION", "USER OBLIGATIONS", "PRIVACY AND DATA",
+    "PAYMENT AND FEES", "AUTOMATIC RENEWAL", "TERMINATION", "LIMITATION OF LIABILITY",
+    "DISPUTE RESOLUTION", "GOVERNING LAW", "INTELLECTUAL PROPERTY", "MODIFICATIONS",
+)
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def make_tos_pdf(path: str, pages: int = 50, paragraphs_per_page: int = 4,
+                 heading_pages: Optional[Sequence[int]] = None,
+                 paragraphs_per_section: Optional[int] = None, seed: int = 0,
+                 header: Optional[str] = None, page_numbers: bool = False) -> str:
+    """Writes a synthetic Terms of Service PDF.
+
+    `heading_pages` lists zero-based pages that start with an all-caps heading;
+    by default every third page does. `paragraphs_per_section` instead puts a
+    heading before every n-th paragraph, producing many short chapters.
+    `header` is repeated at the top of every page and `page_numbers` adds a
+    "Page n of N" footer.
+    """
+    rng = random.Random(seed)
+    if heading_pages is None:
+        heading_pages = range(0, pages, 3)
+    heading_pages = set(heading_pages)
+
+    doc = pymupdf.open()
+    paragraph_num = 0
+    for page_num in range(pages):
+        page = doc.new_page()
+        if header:
+            page.insert_text((72, 40), header, fontsize=9)
+        if page_numbers:
+            page.insert_text((270, 810), f"Page {page_num + 1} of {pages}", fontsize=9)
+        y = 72
+        if page_num in heading_pages and paragraphs_per_section is None:
+            page.insert_text((72, y), rng.choice(HEADINGS), fontsize=14)
+            y += 28
+        for _ in range(paragraphs_per_page):
+            if paragraphs_per_section and paragraph_num % paragraphs_per_section == 0:
+                page.insert_text((72, y + 14), rng.choice(HEADINGS), fontsize=14)
+                y += 28
+            paragraph_num += 1
+            paragraph = " ".join(sentence(rng) for _ in range(4))
+            rect = pymupdf.Rect(72, y, 523, y + 150)
+            page.insert_textbox(rect, paragraph, fontsize=10)
+            y += 160
+    doc.save(path)
+    doc.close()
+    return path
+
+
+# Heading styles of make_flowing_tos_pdf: (font, size, numbered, all caps). Body text is
+# 10-point Helvetica.
+HEADING_STYLES: Dict[str, Tuple[str, float, bool, bool]] = {
+    "all caps": ("helv", 10, False, True),
+    "bold numbered": ("hebo", 12, True, False),
+    "bold title case": ("hebo", 10, False, False),
+    "plain numbered": ("helv", 10, True, False),
+}
+
+
+def title_case(heading: str) -> str:
+    return " ".join(word.lower() if word in ("OF", "AND") else word.capitalize()
+                    for word in heading.split())
+
+
+def make_flowing_tos_pdf(path: str, sections: int = 24, heading_style: str = "bold numbered",
+                         seed: int = 0) -> List[Tuple[str, List[str]]]:
+    """Writes a Terms of Service PDF whose clauses flow across page breaks.
+
+    Every section is a heading in one of HEADING_STYLES, set apart by extra
+    space, followed by a paragraph wrapped into lines, so page breaks fall in the
+    middle of sentences. Returns the sections as (heading, sentences).
+    """
+    rng = random.Random(seed)
+    font, size, numbered, upper = HEADING_STYLES[heading_style]
+    doc = pymupdf.open()
+    page = doc.new_page()
+    y = 72
+
+    def write_line(text: str, fontname: str, fontsize: float, space_before: float = 0) -> None:
+        nonlocal page, y
+        y += space_before
+        if y > 770:
+            page = doc.new_page()
+            y = 72
+        page.insert_text((72, y), text, fontname=fontname, fontsize=fontsize)
+        y += 14
+
+    written = []
+    for number in range(1, sections + 1):
+        heading = rng.choice(HEADINGS)
+        if not upper:
+            heading = title_case(heading)
+        if numbered:
+            heading = f"{number}. {heading}"
+        sentences = [sentence(rng) for _ in range(rng.randint(4, 12))]
+        write_line(heading, font, size, space_before=10)
+        for text in textwrap.wrap(" ".join(sentences), 95):
+            write_line(text, "helv", 10)
+        written.append((heading, sentences))
+    doc.save(path)
+    doc.close()
+    return written
+
+
+# Chunks as the parser produces them, labelled by whether they deserve an LLM request.
+# Tuples of (chapter name, text, relevant).
+LABELLED_CHUNKS = [
+    ("TERMINATION", "We may suspend or terminate your account at any time, with or without "
+     "notice, if we believe you have violated these Terms. Upon termination your right to use "
+     "the Service ceases immediately and we may delete your content.", True),
+    ("AUTOMATIC RENEWAL", "Your subscription renews automatically for successive 12-month "
+     "periods at the then-current fee unless you cancel at least 30 days before the end of "
+     "the current period.", True),
+    ("PAYMENT AND FEES", "All fees are non-refundable. We may change our prices on 14 days' "
+     "notice; the new price of $9.99 per month applies from your next billing cycle.", True),
+    ("DISPUTE RESOLUTION", "Any dispute arising out of these Terms shall be resolved by "
+     "binding arbitration. You waive your right to participate in a class action or a jury "
+     "trial.", True),
+    ("LIMITATION OF LIABILITY", "To the maximum extent permitted by law, our total liability "
+     "shall not exceed the amount you paid us in the 12 months preceding the claim, and we "
+     "are not liable for indirect or consequential damages.", True),
+    ("PRIVACY AND DATA", "We collect your personal data, including location and contacts, and "
+     "may share it with third-party advertising partners without further consent.", True),
+    ("INTELLECTUAL PROPERTY", "By uploading content you grant us a worldwide, perpetual, "
+     "irrevocable, royalty-free licence to use, modify and distribute it for any purpose.",
+     True),
+    ("MODIFICATIONS", "We reserve the right to modify these Terms at any time. Continued use "
+     "of the Service after changes are posted constitutes your acceptance.", True),
+    ("GOVERNING LAW", "These Terms are governed by the laws of the State of Delaware, and you "
+     "submit to the exclusive jurisdiction of its courts.", True),
+    ("USER OBLIGATIONS", "You must not reverse engineer, resell or scrape the Service, and you "
+     "are responsible for all activity under your account.", True),
+    ("CANCELLATION", "To cancel, email support@example.com at least 7 days before renewal. "
+     "Refunds are issued within 30 days to the original payment method.", True),
+    ("WARRANTIES", "The Service is provided \"as is\" without warranties of any kind, express "
+     "or implied, including merchantability and fitness for a particular purpose.", True),
+    ("INDEMNIFICATION", "You agree to indemnify and hold us harmless from any claims, losses "
+     "and legal fees arising from your use of the Service.", True),
+    ("ACCOUNT REGISTRATION", "You must be at least 18 years old to create an account. You agree "
+     "to provide accurate information and to keep your password confidential.", True),
+    ("Page 3", "3.2 We may assign these Terms to any affiliate or successor without your "
+     "consent. You may not assign your rights under these Terms.", True),
+    ("File beginning", "By accessing or using the Service you agree to be bound by these Terms. "
+     "If you do not agree, you may not use the Service.", True),
+    ("THIRD-PARTY SERVICES", "Links to third-party websites are provided for convenience only; "
+     "we are not responsible for their content or practices.", True),
+    ("File beginning", "TERMS OF SERVICE Last updated: 1 March 2024 Acme Cloud Inc.", False),
+    ("Page 1", "Table of Contents 1. Introduction 2 2. Accounts 3 3. Payment and Fees 5 "
+     "4. Termination 7 5. Limitation of Liability 9 6. Governing Law 11 7. Contact 12", False),
+    ("Page 1", "1 Introduction .......... 2 2 Accounts .......... 3 3 Fees .......... 5 "
+     "4 Termination .......... 7 5 Liability .......... 9", False),
+    ("CONTACT US", "Acme Cloud Inc., 123 Market Street, Suite 400, San Francisco, CA 94105. "
+     "Phone: +1 (415) 555-0100. Email: legal@acme.example. Web: https://acme.example", False),
+    ("DEFINITIONS", "\"Account\" means the account you create. \"Content\" means any text, "
+     "images or data. \"Service\" refers to the Acme platform. \"User\" means any person who "
+     "accesses the Service. \"Affiliate\" means any entity under common control.", False),
+    ("File beginning", "Acme Cloud Terms of Use Version 4.2 Effective date: 2024-03-01", False),
+    ("Page 12", "Page 12 of 14", False),
+    ("HEADINGS", "Section headings are for convenience only.", False),
+    ("Page 14", "Acme Cloud Inc. © 2024. All trademarks belong to their owners. "
+     "www.acme.example | support@acme.example | 1-800-555-0199", False),
+    ("Page 2", "2 3 4 5 6 7 8 9 10 11 12 13 14", False),
+    ("DEFINITIONS", "In these Terms: 'we', 'us' and 'our' refers to Acme Cloud Inc.; 'you' "
+     "refers to the person using the Service; 'Materials' means documentation.", False),
+]
@@ -1,6 +1,10 @@
 import pytest
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
+from app.analyzer import schemas as analyzer_schemas
+from app.analyzer.concurrency_limiter import ConcurrencyLimiter
+from app.analyzer.llm_analyzer import LLMAnalyzer
 from app.analyzer.pdf_parser import PDFParser
+from app.enums import RiskLevel
 from app.auth.service import AuthService
 from app.auth import schemas
 from app import models
@@ -51,3 +55,30 @@ def user_create_data():
         username="newuser",
         password="password123"
     )
+
+
+@pytest.fixture
+def clause_analysis():
+    """Schema-valid clause analysis as returned by the LLM."""
+    return analyzer_schemas.ClauseAnalysis(
+        category=["Termination"],
+        risk_level=RiskLevel.MEDIUM,
+        reason="The provider may terminate without notice",
+        key_points=["Termination without notice"],
+        conclusion="Keep backups of your data",
+        is_valid=True
+    )
+
+
+@pytest.fixture
+def llm_analyzer(clause_analysis):
+    """LLMAnalyzer whose chain returns `clause_analysis` without calling a model."""
+    analyzer = LLMAnalyzer(
+        llm=Mock(),
+        max_chunk_tokens=250,
+        chunk_overlap_tokens=0,
+        limiter=ConcurrencyLimiter(max_concurrent=2)
+    )
+    analyzer.chain = Mock()
+    analyzer.chain.ainvoke = AsyncMock(return_value=clause_analysis)
+    return analyzer
@@ -0,0 +1,261 @@
+import asyncio
+import io
+from unittest.mock import AsyncMock, Mock, patch
+import fakeredis
+import pytest
+from celery.exceptions import Retry
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.datastructures import Headers
+from app import models, tasks, worker_runtime
+from app.analyzer import routes
+from app.analyzer.analysis_lock import AnalysisLock
+from app.analyzer.document_repository import DocumentRepository
+from app.db.db import Base
+from app.enums import DocumentStatus
+from app.worker_runtime import WorkerRuntime
+from benchmarks.fixtures import make_tos_pdf
+
+RESTARTABLE = [DocumentStatus.UPLOADED, DocumentStatus.FAILED]
+
+
+@pytest.fixture
+def sessions():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add(models.User(id=1, username="user", hashed_password="x"))
+        session.add(models.Document(id=7, user_id=1, user_context="", file_url="tos.pdf",
+                                    status=DocumentStatus.UPLOADED))
+        session.commit()
+    return Session
+
+
+def status_of(sessions):
+    with sessions() as session:
+        return session.get(models.Document, 7).status
+
+
+class TestDocumentRepository:
+    def test_only_one_of_concurrent_requests_queues_an_analysis(self, sessions):
+        first, second = DocumentRepository(sessions()), DocumentRepository(sessions())
+        # Both requests saw the document as uploaded before either queued it
+        assert first.get_by_id(7).status == second.get_by_id(7).status == DocumentStatus.UPLOADED
+
+        run_id = first.queue_for_analysis(7, RESTARTABLE)
+
+        assert run_id
+        assert second.queue_for_analysis(7, RESTARTABLE) is None
+        assert status_of(sessions) == DocumentStatus.QUED_FOR_ANALYSIS
+
+    def test_transitions_of_a_superseded_run_are_refused(self, sessions):
+        repo = DocumentRepository(sessions())
+        old = repo.queue_for_analysis(7, RESTARTABLE)
+        repo.transition_status(7, old, [DocumentStatus.QUED_FOR_ANALYSIS], DocumentStatus.FAILED)
+        new = repo.queue_for_analysis(7, RESTARTABLE)
+
+        assert not repo.transition_status(7, old, tasks.STARTABLE, DocumentStatus.PROCESSING)
+        assert repo.transition_status(7, new, tasks.STARTABLE, DocumentStatus.PROCESSING)
+        assert status_of(sessions) == DocumentStatus.PROCESSING
+
+
+class TestAnalysisLock:
+    def test_only_its_holder_renews_or_releases_the_lock(self):
+        lock = AnalysisLock(fakeredis.FakeAsyncRedis(), ttl_seconds=60)
+
+        async def scenario():
+            assert await lock.acquire(7, "run")
+            # Not even a redelivery of the same run takes a held lock
+            assert not await lock.acquire(7, "run")
+            assert not await lock.extend(7, "other")
+            await lock.release(7, "other")
+            assert await lock.extend(7, "run")
+            await lock.release(7, "run")
+            return await lock.acquire(7, "other")
+
+        assert asyncio.run(scenario())
+
+    def test_kept_renews_the_lock_while_the_block_runs(self):
+        redis = fakeredis.FakeAsyncRedis()
+        lock = AnalysisLock(redis, ttl_seconds=1)
+        lock.ttl_ms = 150
+
+        async def scenario():
+            await lock.acquire(7, "run")
+            async with lock.kept(7, "run"):
+                await asyncio.sleep(0.4)
+                return await redis.get(AnalysisLock.key(7))
+
+        assert asyncio.run(scenario()) == b"run"
+
+
+@pytest.fixture
+def runtime():
+    service = Mock(chunk_store=None, analysis_lock=AnalysisLock(fakeredis.FakeAsyncRedis(), 60))
+    runtime = WorkerRuntime(lambda: service).start()
+    with patch.object(worker_runtime, "_runtime", runtime):
+        yield runtime
+    runtime.stop()
+
+
+def deliver(sessions, run_id, analysis):
+    with patch.object(tasks, "get_db", lambda: iter([sessions()])), \
+            patch.object(tasks, "analyze_and_save", analysis):
+        tasks.analyze_document.apply(args=(7,), kwargs={"run_id": run_id})
+
+
+class TestAnalyzeDocument:
+    def test_redelivered_messages_of_a_finished_run_do_nothing(self, sessions, runtime):
+        run_id = DocumentRepository(sessions()).queue_for_analysis(7, RESTARTABLE)
+        analysis = AsyncMock(return_value=DocumentStatus.ANALYZED)
+
+        deliver(sessions, run_id, analysis)
+        deliver(sessions, run_id, analysis)
+
+        assert analysis.await_count == 1
+        assert status_of(sessions) == DocumentStatus.ANALYZED
+        assert not runtime.run(runtime.service.analysis_lock.redis.exists(AnalysisLock.key(7)))
+
+    def test_messages_of_a_superseded_run_do_nothing(self, sessions, runtime):
+        repo = DocumentRepository(sessions())
+        old = repo.queue_for_analysis(7, RESTARTABLE)
+        repo.transition_status(7, old, [DocumentStatus.QUED_FOR_ANALYSIS], DocumentStatus.FAILED)
+        repo.queue_for_analysis(7, RESTARTABLE)
+        analysis = AsyncMock(return_value=DocumentStatus.ANALYZED)
+
+        deliver(sessions, old, analysis)
+
+        analysis.assert_not_awaited()
+        assert status_of(sessions) == DocumentStatus.QUED_FOR_ANALYSIS
+
+    def test_a_locked_document_is_retried_after_the_running_analysis(self, sessions, runtime):
+        run_id = DocumentRepository(sessions()).queue_for_analysis(7, RESTARTABLE)
+        lock = runtime.service.analysis_lock
+        runtime.run(lock.acquire(7, run_id))
+        analysis = AsyncMock(return_value=DocumentStatus.ANALYZED)
+
+        with patch.object(tasks.analyze_document, "retry", side_effect=Retry()) as retry:
+            deliver(sessions, run_id, analysis)
+
+        analysis.assert_not_awaited()
+        assert retry.call_args.kwargs["max_retries"] is None
+        # The running analysis keeps its lock
+        assert runtime.run(lock.extend(7, run_id))
+
+    def test_the_lock_is_released_before_the_final_status(self, sessions, runtime):
+        run_id = DocumentRepository(sessions()).queue_for_analysis(7, RESTARTABLE)
+        lock = runtime.service.analysis_lock
+        held = []
+        transition = DocumentRepository.transition_status
+
+        def record(repo, document_id, run, from_statuses, status):
+            if status != DocumentStatus.PROCESSING:
+                held.append(runtime.run(lock.held(7)))
+            return transition(repo, document_id, run, from_statuses, status)
+
+        with patch.object(DocumentRepository, "transition_status", record):
+            deliver(sessions, run_id, AsyncMock(side_effect=RuntimeError("boom")))
+
+        assert held == [False]
+        assert status_of(sessions) == DocumentStatus.FAILED
+
+
+class TestFannedOutRuns:
+    def test_chunk_tasks_survive_their_worker_and_renew_the_lock(self, runtime):
+        lock = runtime.service.analysis_lock
+        runtime.run(lock.acquire(7, "run"))
+        with patch.object(tasks, "analyze_and_save_slice", AsyncMock(return_value={})):
+            tasks.analyze_chunks(7, 1, "normal", "chunks:7", 0, 8, True, "", "run")
+
+        assert tasks.analyze_chunks.acks_late and tasks.analyze_chunks.reject_on_worker_lost
+        ttl = runtime.run(lock.redis.pttl(AnalysisLock.key(7)))
+        assert 60_000 < ttl <= tasks.settings.ANALYSIS_SLICE_DEADLINE_SECONDS * 1000
+
+    def test_the_chord_callback_releases_the_lock_before_the_status(self, runtime):
+        runtime.service.chunk_store = Mock(delete=AsyncMock())
+        lock = runtime.service.analysis_lock
+        runtime.run(lock.acquire(7, "run"))
+        held = []
+        with patch.object(tasks, "set_status",
+                          side_effect=lambda *args: held.append(runtime.run(lock.held(7)))):
+            tasks.finish_document([{"saved": 2}], 7, "chunks:7", {}, "run", "run")
+
+        assert held == [False]
+
+
+def start(sessions, lock=None):
+    lock = lock or AnalysisLock(fakeredis.FakeAsyncRedis(), 60)
+    return asyncio.run(routes.start_analysis(7, False, Mock(id=1), sessions(), lock))
+
+
+class TestStartAnalysis:
+    def test_a_retried_request_does_not_queue_a_second_analysis(self, sessions):
+        with patch.object(routes, "queue_analysis") as queue_analysis:
+            response = start(sessions)
+            with pytest.raises(HTTPException) as error:
+                start(sessions)
+
+        assert response == {"status": DocumentStatus.QUED_FOR_ANALYSIS}
+        assert error.value.status_code == 400
+        queue_analysis.assert_called_once()
+        with sessions() as session:
+            run_id = session.get(models.Document, 7).analysis_run_id
+        assert queue_analysis.call_args.args[3] == run_id
+        # Routed on the page count stored at upload, none for this document
+        assert queue_analysis.call_args.args[4] is None
+
+    def test_a_failed_enqueue_marks_the_document_failed(self, sessions):
+        with patch.object(routes, "queue_analysis", side_effect=ConnectionError), \
+                pytest.raises(HTTPException):
+            start(sessions)
+
+        assert status_of(sessions) == DocumentStatus.FAILED
+
+    @pytest.mark.parametrize("locked", [True, False])
+    def test_a_processing_document_is_restartable_once_its_lock_lapsed(self, sessions, locked):
+        repo = DocumentRepository(sessions())
+        old = repo.queue_for_analysis(7, RESTARTABLE)
+        repo.transition_status(7, old, tasks.STARTABLE, DocumentStatus.PROCESSING)
+        lock = AnalysisLock(fakeredis.FakeAsyncRedis(), 60)
+        if locked:
+            asyncio.run(lock.acquire(7, old))
+
+        with patch.object(routes, "queue_analysis") as queue_analysis:
+            if locked:
+                with pytest.raises(HTTPException):
+                    start(sessions, lock)
+            else:
+                start(sessions, lock)
+
+        assert queue_analysis.called != locked
+        assert (status_of(sessions) == DocumentStatus.PROCESSING) == locked
+
+
+class TestUploadDocument:
+    def test_the_page_count_is_stored_at_upload(self, sessions, tmp_path):
+        pdf = make_tos_pdf(str(tmp_path / "source.pdf"), pages=6)
+        with open(pdf, "rb") as f:
+            upload = UploadFile(io.BytesIO(f.read()), filename="tos.pdf",
+                                headers=Headers({"content-type": "application/pdf"}))
+
+        with patch.object(routes.utils.settings, "UPLOADS_FOLDER", tmp_path / "uploads"):
+            document = asyncio.run(routes.upload_document(Mock(id=1), sessions(), upload, ""))
+
+        assert document.page_count == 6
+        with patch.object(routes, "queue_analysis") as queue_analysis:
+            asyncio.run(routes.start_analysis(document.id, False, Mock(id=1), sessions(),
+                                              AnalysisLock(fakeredis.FakeAsyncRedis(), 60)))
+        assert queue_analysis.call_args.args[4] == 6
+
+    def test_an_unreadable_upload_is_stored_without_a_page_count(self, sessions, tmp_path):
+        upload = UploadFile(io.BytesIO(b"not a pdf"), filename="broken.pdf",
+                            headers=Headers({"content-type": "application/pdf"}))
+
+        with patch.object(routes.utils.settings, "UPLOADS_FOLDER", tmp_path):
+            document = asyncio.run(routes.upload_document(Mock(id=1), sessions(), upload, ""))
+
+        assert document.page_count is None
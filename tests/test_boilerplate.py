@@ -0,0 +1,84 @@
+from collections import Counter
+from app.analyzer.boilerplate import BoilerplateFilter, line_signature
+from app.analyzer.layout import PageLayout
+from app.analyzer.pdf_parser import PDFParser
+from benchmarks.fixtures import make_tos_pdf
+
+HEADER = "ACME CLOUD TERMS OF SERVICE"
+
+
+def page(number, body, total=4):
+    lines = ["ACME TERMS", "Last updated: 1 March 2024"] + body + [f"Page {number + 1} of {total}"]
+    positions = [(0.1, 0.04), (0.1, 0.06)] + [(0.1, 0.2 + 0.05 * i) for i in range(len(body))]
+    return PageLayout(number, lines, positions + [(0.45, 0.96)])
+
+
+class TestBoilerplateFilter:
+    def test_signature_masks_numbers(self):
+        assert line_signature("Page 3 of  9") == line_signature("page 12 of 9") == "page # of #"
+
+    def test_strips_lines_repeated_at_the_same_position(self):
+        pages = [page(number, [f"Clause {number} may terminate the account."])
+                 for number in range(4)]
+        stats = Counter()
+
+        stripped = list(BoilerplateFilter().strip(pages, stats))
+
+        assert [p.lines for p in stripped] == [[f"Clause {number} may terminate the account."]
+                                               for number in range(4)]
+        assert stats["boilerplate_lines"] == 12
+        assert stats["boilerplate_chars"] == sum(len(line) for p in pages for line in p.lines
+                                                 if not line.startswith("Clause"))
+
+    def test_keeps_repeated_text_at_other_positions(self):
+        pages = [page(0, ["ACME TERMS"]), page(1, ["Other text."])]
+        pages[0].positions[2] = (0.1, 0.1)
+
+        stripped = list(BoilerplateFilter().strip(pages))
+
+        assert stripped[0].lines == ["ACME TERMS"]
+
+    def test_single_pages_and_pages_without_geometry_are_unchanged(self):
+        single = page(0, ["Body."], total=1)
+        plain = PageLayout(0, ["ACME TERMS", "Body."])
+
+        assert list(BoilerplateFilter().strip([single])) == [single]
+        assert list(BoilerplateFilter().strip([plain, plain._replace(number=1)]))[0] == plain
+
+    def test_counts_chunks_emptied_pages_no_longer_need(self):
+        pages = [page(number, [] if number == 3 else ["Body text."]) for number in range(4)]
+        stats = Counter()
+
+        list(BoilerplateFilter(chunk_tokens=100, estimate_chunks=True).strip(pages, stats))
+
+        assert stats["boilerplate_chunks"] == 1
+
+    def test_chunks_are_only_estimated_on_request(self):
+        pages = [page(number, [] if number == 3 else ["Body text."]) for number in range(4)]
+        stats = Counter()
+
+        def is_heading(text):
+            raise AssertionError("lines are matched against headings")
+
+        list(BoilerplateFilter(chunk_tokens=100).strip(pages, stats, is_heading))
+
+        assert stats["boilerplate_lines"] == 12
+        assert "boilerplate_chunks" not in stats
+
+
+class TestParserBoilerplate:
+    def test_running_header_is_not_a_chapter_heading(self, tmp_path):
+        path = make_tos_pdf(str(tmp_path / "tos.pdf"), pages=6, heading_pages=[0, 3],
+                            header=HEADER, page_numbers=True)
+        stats = Counter()
+
+        plain = PDFParser().parse(path)
+        stripped = PDFParser(boilerplate_filter=BoilerplateFilter(estimate_chunks=True)).parse(
+            path, stats)
+
+        assert HEADER in [chapter.chapter_name for chapter in plain.chapters]
+        assert HEADER not in [chapter.chapter_name for chapter in stripped.chapters]
+        assert not any("Page" in chapter.chapter_text for chapter in stripped.chapters)
+        assert stats["boilerplate_lines"] == 12
+        # Chapters fit in one chunk, so every spurious chapter cost a chunk
+        assert stats["boilerplate_chunks"] == len(plain.chapters) - len(stripped.chapters)
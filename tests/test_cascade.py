@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from google.api_core import exceptions as google_exceptions
+from app.analyzer import schemas
+from app.analyzer.cascade import PRIMARY_TIER, TRIAGE_TIER, TriageTier
+from app.analyzer.concurrency_limiter import ConcurrencyLimiter
+from app.analyzer.retry_policy import RetryPolicy
+from app.enums import RiskLevel
+
+
+def triaged(risk_level=RiskLevel.LOW, confidence=0.9):
+    return schemas.TriageAnalysis(category=["Payment"], risk_level=risk_level,
+                                  reason="Fees are listed", key_points=["Monthly fee"],
+                                  conclusion="Check the price", is_valid=True,
+                                  confidence=confidence)
+
+
+@pytest.fixture
+def triage():
+    tier = TriageTier(llm=Mock(), limiter=ConcurrencyLimiter(max_concurrent=2),
+                      rate_limiter=Mock(acquire=AsyncMock()))
+    tier.chain = Mock(ainvoke=AsyncMock(return_value=triaged()))
+    return tier
+
+
+@pytest.fixture
+def cascade_analyzer(llm_analyzer, triage):
+    llm_analyzer.triage = triage
+    llm_analyzer.rate_limiter = Mock(acquire=AsyncMock())
+    llm_analyzer.retry_policy = RetryPolicy(max_attempts=2, base_delay=0, max_delay=0)
+    return llm_analyzer
+
+
+def analyze(analyzer, texts):
+    chunks = [schemas.DocumentChunk(index=index, text=text, tokens=10)
+              for index, text in enumerate(texts)]
+    return asyncio.run(analyzer._analyze_chunks(chunks, "ctx", with_chapter=False))
+
+
+class TestTriageTier:
+    @pytest.mark.parametrize("risk_level, confidence, escalate", [
+        (RiskLevel.STANDART_PRACTICE, 0.9, False),
+        (RiskLevel.LOW, 0.7, False),
+        (RiskLevel.MEDIUM, 0.9, True),
+        (RiskLevel.CRITICAL, 1.0, True),
+        (RiskLevel.LOW, 0.5, True),
+    ])
+    def test_escalates_risky_or_doubtful_clauses(self, triage, risk_level, confidence,
+                                                 escalate):
+        assert triage.should_escalate(triaged(risk_level, confidence)) is escalate
+
+    def test_result_records_tier_without_confidence(self):
+        result = TriageTier.to_result(triaged())
+
+        assert type(result) is schemas.ClauseAnalysis
+        assert result.tier == TRIAGE_TIER
+
+
+class TestLLMAnalyzerCascade:
+    def test_confident_low_risk_answer_is_final(self, cascade_analyzer, triage):
+        results = analyze(cascade_analyzer, ["You pay a monthly fee."])
+
+        assert results[0].tier == TRIAGE_TIER
+        cascade_analyzer.chain.ainvoke.assert_not_awaited()
+        triage.rate_limiter.acquire.assert_awaited_once()
+        cascade_analyzer.rate_limiter.acquire.assert_not_awaited()
+
+    @pytest.mark.parametrize("answer", [
+        triaged(RiskLevel.HIGH),
+        triaged(confidence=0.3),
+        google_exceptions.ClientError("bad request"),
+    ])
+    def test_risky_doubtful_or_failed_triage_escalates(self, cascade_analyzer, triage, answer):
+        triage.chain.ainvoke = AsyncMock(side_effect=[answer])
+
+        results = analyze(cascade_analyzer, ["The provider may end the service at any time."])
+
+        assert results[0].tier == PRIMARY_TIER
+        cascade_analyzer.chain.ainvoke.assert_awaited_once()
+        cascade_analyzer.rate_limiter.acquire.assert_awaited_once()
+
+    def test_escalated_chunks_of_a_group_share_one_request(self, cascade_analyzer, triage,
+                                                           clause_analysis):
+        cascade_analyzer.batch_max_items = 4
+        cascade_analyzer.batch_max_chunk_tokens = 50
+        triage.chain.ainvoke = AsyncMock(side_effect=[
+            triaged(), triaged(RiskLevel.HIGH), triaged(), triaged(confidence=0.2)])
+        cascade_analyzer.batch_chain = Mock(ainvoke=AsyncMock(
+            return_value=schemas.ClauseAnalysisBatch(analyses=[
+                schemas.BatchClauseAnalysis(clause_id=clause_id, **clause_analysis.model_dump())
+                for clause_id in (1, 2)])))
+
+        results = analyze(cascade_analyzer, ["First.", "Second.", "Third.", "Fourth."])
+
+        assert [result.tier for result in results] == [TRIAGE_TIER, PRIMARY_TIER,
+                                                       TRIAGE_TIER, PRIMARY_TIER]
+        prompt = cascade_analyzer.batch_chain.ainvoke.await_args.args[0]["clauses"]
+        assert "Second." in prompt and "Fourth." in prompt and "First." not in prompt
+        cascade_analyzer.chain.ainvoke.assert_not_awaited()
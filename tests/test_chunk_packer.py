@@ -0,0 +1,73 @@
+from app.analyzer import schemas
+from app.analyzer.chunk_packer import ChunkPacker, estimate_tokens
+
+
+class TestEstimateTokens:
+    def test_counts_words_and_punctuation(self):
+        assert estimate_tokens("You may cancel.") == 5
+        assert estimate_tokens("subscription") == 3
+        assert estimate_tokens("") == 0
+
+
+class TestChunkPackerSplit:
+    def test_small_text_is_one_piece(self):
+        packer = ChunkPacker(max_tokens=100)
+
+        assert packer.split("  You may cancel at any time.  ") == [
+            ("You may cancel at any time.", 8)]
+
+    def test_blank_text_yields_nothing(self):
+        assert ChunkPacker(max_tokens=100).split(" \n ") == []
+
+    def test_oversized_text_splits_on_sentence_boundaries(self):
+        sentences = [f"Sentence number {i} is about fees." for i in range(10)]
+        packer = ChunkPacker(max_tokens=20)
+
+        pieces = packer.split(" ".join(sentences))
+
+        assert all(tokens <= 20 for _, tokens in pieces)
+        assert [text for text, _ in pieces] == [
+            " ".join(sentences[i:i + 2]) for i in range(0, 10, 2)]
+
+    def test_overlap_carries_trailing_sentences(self):
+        sentences = [f"Sentence number {i} is about fees." for i in range(4)]
+        packer = ChunkPacker(max_tokens=20, overlap_tokens=10)
+
+        pieces = [text for text, _ in packer.split(" ".join(sentences))]
+
+        assert pieces == [
+            " ".join(sentences[0:2]), " ".join(sentences[1:3]), " ".join(sentences[2:4])]
+
+    def test_sentence_above_budget_splits_on_words(self):
+        packer = ChunkPacker(max_tokens=5)
+
+        pieces = packer.split("one two six ten red sky big cat dog ant bee")
+
+        assert [text for text, _ in pieces] == [
+            "one two six ten red", "sky big cat dog ant", "bee"]
+
+
+class TestChunkPackerPack:
+    def test_packs_consecutive_small_chunks_within_budget(self):
+        tokens = [10, 10, 10, 10, 10, 80, 10, 10]
+        chunks = [schemas.DocumentChunk(index=i, text="", tokens=n) for i, n in enumerate(tokens)]
+        packer = ChunkPacker(max_tokens=35)
+
+        groups = packer.pack(chunks, max_items=4, max_item_tokens=50)
+
+        assert [[chunk.index for chunk in group] for group in groups] == [
+            [0, 1, 2], [5], [3, 4, 6], [7]]
+
+    def test_max_items_limits_group_size(self):
+        chunks = [schemas.DocumentChunk(index=i, text="", tokens=1) for i in range(5)]
+
+        groups = ChunkPacker(max_tokens=100).pack(chunks, max_items=2, max_item_tokens=50)
+
+        assert [len(group) for group in groups] == [2, 2, 1]
+
+    def test_batching_disabled(self):
+        chunks = [schemas.DocumentChunk(index=i, text="", tokens=1) for i in range(3)]
+
+        groups = ChunkPacker(max_tokens=100).pack(chunks, max_items=1, max_item_tokens=50)
+
+        assert [len(group) for group in groups] == [1, 1, 1]
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted
+from app.analyzer.concurrency_limiter import AdaptiveConcurrencyLimiter, is_overload_error
+
+
+def throttled():
+    try:
+        raise ResourceExhausted("quota exceeded")
+    except ResourceExhausted as e:
+        try:
+            raise RuntimeError("Failed to analyze chunk after 4 retries") from e
+        except RuntimeError as wrapped:
+            return wrapped
+
+
+async def succeed():
+    await asyncio.sleep(0)
+    return "ok"
+
+
+async def fail(error):
+    await asyncio.sleep(0)
+    raise error
+
+
+class TestAdaptiveConcurrencyLimiter:
+    def test_overload_errors_are_found_through_the_cause_chain(self):
+        assert is_overload_error(throttled())
+        assert is_overload_error(TimeoutError())
+        assert not is_overload_error(RuntimeError("bad output"))
+
+    def test_successes_widen_up_to_the_ceiling(self):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrent=3, initial_concurrent=1)
+
+        async def scenario():
+            for _ in range(20):
+                await limiter.limit(succeed())
+
+        asyncio.run(scenario())
+
+        assert limiter.window == 3
+        assert limiter.stats()["in_flight"] == 0
+
+    def test_overload_cuts_window_once_per_generation(self):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrent=8, initial_concurrent=8)
+
+        results = asyncio.run(limiter.execute([fail(throttled()) for _ in range(8)]))
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert limiter.window == 4
+        assert limiter.cuts == 1
+
+    def test_other_errors_leave_window_alone(self):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrent=8, initial_concurrent=4)
+
+        asyncio.run(limiter.limit(fail(InvalidArgument("bad request"))))
+
+        assert limiter.window == 4
+
+    def test_observed_attempts_cut_even_if_task_recovers(self):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrent=8, initial_concurrent=4)
+
+        async def retried():
+            limiter.observe(ResourceExhausted("quota exceeded"))
+            return "ok"
+
+        assert asyncio.run(limiter.limit(retried())) == "ok"
+        assert limiter.window == pytest.approx(2.5)
+
+    def test_in_flight_never_exceeds_window(self):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrent=2, initial_concurrent=2)
+        peak = 0
+
+        async def task():
+            nonlocal peak
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(limiter.execute([task() for _ in range(10)]))
+
+        assert peak == 2
+
+    def test_cancelled_tasks_free_their_slot_without_moving_the_window(self):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrent=4, initial_concurrent=2)
+
+        async def scenario():
+            tasks = [asyncio.create_task(limiter.limit(asyncio.sleep(10))) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            assert limiter.in_flight == 2
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            assert limiter.in_flight == 0
+            return await asyncio.wait_for(limiter.limit(succeed()), timeout=1)
+
+        assert asyncio.run(scenario()) == "ok"
+        assert limiter.window == pytest.approx(2.5)
+        assert limiter.cuts == 0
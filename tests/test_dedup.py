@@ -0,0 +1,46 @@
+import pytest
+from app.analyzer.dedup import ChunkDeduplicator
+
+BOILERPLATE = (
+    "To the maximum extent permitted by applicable law, in no event shall the company "
+    "be liable for any indirect, incidental, special, consequential or punitive damages, "
+    "or any loss of profits or revenues, whether incurred directly or indirectly, or any "
+    "loss of data, use, goodwill, or other intangible losses resulting from your access "
+    "to or use of or inability to access or use the services."
+)
+
+
+class TestChunkDeduplicator:
+    def test_exact_duplicates_share_representative(self):
+        deduplicator = ChunkDeduplicator()
+
+        texts = [BOILERPLATE, "Something else entirely.", BOILERPLATE]
+
+        assert deduplicator.group(texts) == [0, 1, 0]
+
+    def test_near_duplicates_share_representative(self):
+        deduplicator = ChunkDeduplicator(threshold=0.7)
+        variant = BOILERPLATE.replace("the company", "Acme Inc.") + " Some states disagree."
+
+        assert deduplicator.group([BOILERPLATE, variant]) == [0, 0]
+
+    def test_threshold_is_respected(self):
+        variant = BOILERPLATE.replace("the company", "Acme Inc.") + " Some states disagree."
+
+        assert ChunkDeduplicator(threshold=1.0).group([BOILERPLATE, variant]) == [0, 1]
+
+    def test_distinct_chunks_stay_separate(self):
+        texts = [
+            "You may cancel your subscription at any time through your account settings.",
+            "We may share your personal data with advertising partners.",
+            "Disputes will be resolved by binding arbitration in Delaware.",
+        ]
+
+        assert ChunkDeduplicator().group(texts) == [0, 1, 2]
+
+    def test_short_and_empty_texts(self):
+        assert ChunkDeduplicator().group(["", "Fees", "", "Fees"]) == [0, 1, 0, 1]
+
+    def test_invalid_band_configuration(self):
+        with pytest.raises(ValueError):
+            ChunkDeduplicator(num_perm=64, bands=5)
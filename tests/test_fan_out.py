@@ -0,0 +1,178 @@
+import asyncio
+from collections import Counter
+from unittest.mock import AsyncMock, Mock, patch
+import fakeredis
+import pytest
+from app.analyzer import schemas
+from app.analyzer.analysis_lock import AnalysisLock
+from app.analyzer.chunk_store import ChunkStore, ChunkStoreMissError
+from app.analyzer.fan_out import analyze_slice, plan_fan_out
+from app.analyzer.pdf_parser import PDFParser
+from app.analyzer.result_store import ResultStore
+from app.analyzer.service import AnalyzerService
+from app.enums import DocumentStatus
+from app.worker_runtime import WorkerRuntime
+from app import celery_app, tasks, worker_runtime
+from benchmarks.fixtures import make_tos_pdf
+
+
+def mock_collection(completed=()):
+    collection = Mock()
+    collection.create_index = AsyncMock()
+    collection.distinct = AsyncMock(return_value=list(completed))
+    collection.replace_one = AsyncMock()
+    collection.delete_one = AsyncMock()
+    collection.delete_many = AsyncMock(return_value=Mock(deleted_count=0))
+    return collection
+
+
+@pytest.fixture
+def chunk_store():
+    return ChunkStore(fakeredis.FakeAsyncRedis(), ttl_seconds=60)
+
+
+@pytest.fixture
+def service(llm_analyzer, chunk_store):
+    return AnalyzerService(llm_analyzer, PDFParser(), chunk_store=chunk_store,
+                           analysis_lock=AnalysisLock(chunk_store.redis, ttl_seconds=60))
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return make_tos_pdf(str(tmp_path / "tos.pdf"), pages=6)
+
+
+def chunk(index):
+    chapter = schemas.DocumentChapter(chapter_name="TERMINATION", chapter_text="Long text.",
+                                      page_start=1, page_end=2)
+    return schemas.DocumentChunk(index=index, text=f"Clause {index}.", tokens=3, chapter=chapter)
+
+
+class TestChunkStore:
+    def test_returns_chunks_by_position_without_chapter_text(self, chunk_store):
+        async def scenario():
+            key = await chunk_store.put(7, [chunk(4), chunk(9), chunk(12)])
+            return await chunk_store.get(key, 1, 3)
+
+        stored = asyncio.run(scenario())
+
+        assert [c.index for c in stored] == [9, 12]
+        assert stored[0].text == "Clause 9."
+        assert stored[0].chapter.chapter_name == "TERMINATION"
+        assert stored[0].chapter.chapter_text == ""
+
+    def test_deleted_chunks_are_a_miss(self, chunk_store):
+        async def scenario():
+            key = await chunk_store.put(7, [chunk(0)])
+            await chunk_store.delete(key)
+            await chunk_store.get(key, 0, 1)
+
+        with pytest.raises(ChunkStoreMissError):
+            asyncio.run(scenario())
+
+
+class TestFanOut:
+    def test_split_numbers_chunks_like_streaming(self, service, pdf_path):
+        streamed = []
+
+        async def sink(chunk, result):
+            streamed.append(chunk)
+
+        asyncio.run(service.stream(pdf_path, "", sink))
+        has_chapters, chunks = service.split(pdf_path, Counter())
+
+        assert has_chapters
+        assert [(c.index, c.text) for c in chunks] == sorted(
+            (c.index, c.text) for c in streamed)
+
+    def test_plan_stores_only_chunks_without_a_result(self, service, pdf_path):
+        _, chunks = service.split(pdf_path, Counter())
+        chunks = list(chunks)
+        keys = ResultStore(mock_collection(), mock_collection(), 7)
+        clauses = mock_collection([keys.chunk_key(chunks[0])])
+        store = ResultStore(clauses, mock_collection(), 7)
+
+        async def scenario():
+            await store.load_completed()
+            plan = await plan_fan_out(service, store, pdf_path, chunks_per_task=2)
+            return plan, [await service.chunk_store.get(plan.key, start, stop)
+                          for start, stop in plan.slices]
+
+        plan, slices = asyncio.run(scenario())
+
+        assert plan.with_chapter
+        assert len(plan.slices) > 1
+        assert [c.index for part in slices for c in part] == [c.index for c in chunks[1:]]
+        assert all(len(part) <= 2 for part in slices)
+        assert plan.stats["skipped"] == 1
+        # Stale results are pruned against every chunk of the run, stored or not
+        query = clauses.delete_many.await_args.args[0]
+        assert sorted(query["chunk_key"]["$nin"]) == sorted(map(keys.chunk_key, chunks))
+
+    def test_slices_save_their_results(self, service, pdf_path, llm_analyzer):
+        clauses = mock_collection()
+
+        async def scenario():
+            plan = await plan_fan_out(service, ResultStore(clauses, mock_collection(), 7),
+                                      pdf_path, chunks_per_task=2)
+            start, stop = plan.slices[0]
+            return await analyze_slice(service, ResultStore(clauses, mock_collection(), 7),
+                                       plan.key, start, stop, plan.with_chapter, "")
+
+        stats = asyncio.run(scenario())
+
+        assert stats["saved"] == 2
+        saved = [call.args[1] for call in clauses.replace_one.await_args_list]
+        assert [document["chunk_index"] for document in saved] == [0, 1]
+        assert all(document["chapter_name"] for document in saved)
+
+
+@pytest.fixture
+def eager():
+    celery_app.conf.task_always_eager = True
+    yield
+    celery_app.conf.task_always_eager = False
+
+
+class TestFanOutTasks:
+    # Documents uploaded before page counts were stored have none
+    @pytest.mark.parametrize("page_count", [6, None])
+    @pytest.mark.parametrize("min_pages, fanned_out", [(5, True), (50, False)])
+    def test_documents_from_min_pages_are_analyzed_by_a_chord(self, eager, service, pdf_path,
+                                                              min_pages, fanned_out, page_count):
+        runtime = WorkerRuntime(lambda: service).start()
+        doc = Mock(id=7, user_id=1, user_context="", file_url=pdf_path, page_count=page_count,
+                   status=DocumentStatus.QUED_FOR_ANALYSIS, analysis_run_id="run")
+        repo = Mock()
+        repo.get_by_id.return_value = doc
+        repo.transition_status.return_value = True
+        clauses = mock_collection()
+        with patch.object(tasks.settings, "ANALYSIS_FANOUT_MIN_PAGES", min_pages), \
+                patch.object(tasks.settings, "ANALYSIS_FANOUT_CHUNKS_PER_TASK", 2), \
+                patch.object(worker_runtime, "_runtime", runtime), \
+                patch.object(tasks, "get_db", lambda: iter([Mock()])), \
+                patch.object(tasks, "DocumentRepository", return_value=repo), \
+                patch.object(tasks, "clauses_collection", clauses), \
+                patch.object(tasks, "failed_chunks_collection", mock_collection()), \
+                patch.object(tasks, "analyze_chunks", wraps=tasks.analyze_chunks) as analyze_chunks:
+            tasks.analyze_document.apply(args=(7,), kwargs={"run_id": "run"})
+            locked = runtime.run(service.analysis_lock.redis.exists(AnalysisLock.key(7)))
+        runtime.stop()
+
+        assert [call.args[1:] for call in repo.transition_status.call_args_list] == [
+            ("run", tasks.STARTABLE, DocumentStatus.PROCESSING),
+            ("run", [DocumentStatus.PROCESSING], DocumentStatus.ANALYZED)]
+        assert not locked
+        assert analyze_chunks.s.called == fanned_out
+        _, chunks = service.split(pdf_path, Counter())
+        assert clauses.replace_one.await_count == len(list(chunks))
+
+    def test_a_stored_page_count_decides_without_opening_the_pdf(self, service, pdf_path):
+        doc = Mock(file_url=pdf_path, page_count=6)
+        with patch.object(tasks, "count_pages", side_effect=AssertionError) as count_pages, \
+                patch.object(tasks.settings, "ANALYSIS_FANOUT_MIN_PAGES", 6):
+            assert tasks.fans_out(service, doc)
+            doc.page_count = 5
+            assert not tasks.fans_out(service, doc)
+
+        count_pages.assert_not_called()
@@ -0,0 +1,65 @@
+import pytest
+from app.analyzer.headings import HeadingClassifier, HeadingModel
+from app.analyzer.layout import LineStyle, PageLayout
+from app.analyzer.pdf_parser import PDFParser
+from benchmarks.fixtures import HEADING_STYLES, make_flowing_tos_pdf
+
+BODY = LineStyle(10.0, False, 2.5)
+SPACED = LineStyle(10.0, False, 12.0)
+
+
+@pytest.fixture
+def model():
+    return HeadingModel(body_size=10.0, body_bold=False, levels=[(14.0, True), (12.0, True)])
+
+
+class TestHeadingClassifier:
+    def test_fit_learns_body_and_heading_levels(self):
+        page = PageLayout(0, ["Terms", "1. Accounts", "Body text " * 20, "More body text " * 20],
+                          styles=[LineStyle(14.0, True, None), LineStyle(12.0, True, 9.0),
+                                  BODY, BODY])
+
+        assert HeadingClassifier().fit([page]) == HeadingModel(10.0, False,
+                                                               [(14.0, True), (12.0, True)])
+
+    def test_pages_without_font_metadata_are_unchanged(self):
+        page = PageLayout(0, ["TERMS", "Body."])
+
+        assert HeadingClassifier().fit([page]) is None
+        assert list(HeadingClassifier().classify([page])) == [page]
+
+    @pytest.mark.parametrize("text, style, level", [
+        ("Limitation of Liability", LineStyle(14.0, True, 8.0), 1),
+        ("1.2 Fees", LineStyle(12.0, True, 8.0), 2),
+        ("Refunds", LineStyle(13.0, True, 8.0), 2),  # unseen style between two levels
+        ("Account Registration", LineStyle(10.0, True, 2.5), 3),
+        ("4. Limitation of Liability", SPACED, 3),
+        ("Section 4 Governing Law", SPACED, 3),
+        ("4.1 Late Payments", SPACED, 4),
+    ])
+    def test_headings_by_style_and_numbering(self, model, text, style, level):
+        assert HeadingClassifier().level(model, text, style) == level
+
+    @pytest.mark.parametrize("text, style", [
+        ("4. Limitation of Liability", BODY),  # not set apart
+        ("1. You may not resell the service to anyone", SPACED),  # a list item
+        ("You must be at least 18 years old.", LineStyle(14.0, True, 8.0)),
+        ("1 Introduction .......... 2", SPACED),
+        ("governing law", LineStyle(14.0, True, 8.0)),
+        ("Limitation of Liability", SPACED),
+    ])
+    def test_body_text_is_not_a_heading(self, model, text, style):
+        assert HeadingClassifier().level(model, text, style) is None
+
+    @pytest.mark.parametrize("style", HEADING_STYLES)
+    def test_parser_finds_clauses_of_every_heading_style(self, tmp_path, style):
+        path = str(tmp_path / "tos.pdf")
+        sections = make_flowing_tos_pdf(path, sections=8, heading_style=style)
+
+        parsed = PDFParser(heading_classifier=HeadingClassifier()).parse(path)
+
+        assert parsed.has_chapters
+        assert [chapter.chapter_name for chapter in parsed.chapters] == [
+            heading for heading, _ in sections]
+        assert [chapter.chapter_text for chapter in parsed.chapters] == [
+            " ".join(sentences) for _, sentences in sections]
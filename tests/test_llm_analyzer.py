@@ -0,0 +1,269 @@
+import asyncio
+import pytest
+from collections import Counter
+from unittest.mock import AsyncMock, Mock
+import fakeredis
+from google.api_core.exceptions import InvalidArgument
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.analyzer import schemas
+from app.analyzer.dedup import ChunkDeduplicator
+from app.analyzer.result_cache import ResultCache
+
+
+@pytest.fixture
+def result_cache():
+    return ResultCache(
+        redis=fakeredis.FakeAsyncRedis(),
+        model_name="gemini-2.0-flash",
+        temperature=0.2,
+        prompt_version=1,
+        ttl_seconds=60,
+        max_entries=2
+    )
+
+
+class TestResultCache:
+    def test_key_ignores_whitespace_differences(self, result_cache):
+        assert (result_cache.key("You may  cancel\nat any time.", "ctx")
+                == result_cache.key(" You may cancel at any time. ", "ctx"))
+
+    def test_key_depends_on_context_and_model_settings(self, result_cache):
+        key = result_cache.key("clause", "ctx")
+
+        assert key != result_cache.key("clause", "other ctx")
+        result_cache.temperature = 0.5
+        assert key != result_cache.key("clause", "ctx")
+        result_cache.temperature = 0.2
+        result_cache.prompt_version = 2
+        assert key != result_cache.key("clause", "ctx")
+
+    def test_round_trip_strips_chapter_metadata(self, result_cache, clause_analysis):
+        chapter_analysis = schemas.ChapterAnalysis(chapter_name="TERMINATION",
+                                                   **clause_analysis.model_dump())
+
+        async def scenario():
+            await result_cache.set("llm_cache:a", chapter_analysis)
+            return await result_cache.get("llm_cache:a")
+
+        assert asyncio.run(scenario()) == clause_analysis
+
+    def test_evicts_least_recently_used(self, result_cache, clause_analysis):
+        async def scenario():
+            await result_cache.set("llm_cache:a", clause_analysis)
+            await result_cache.set("llm_cache:b", clause_analysis)
+            await result_cache.get("llm_cache:a")  # "b" is now the least recently used
+            await result_cache.set("llm_cache:c", clause_analysis)
+            return [await result_cache.get(key) is not None
+                    for key in ("llm_cache:a", "llm_cache:b", "llm_cache:c")]
+
+        assert asyncio.run(scenario()) == [True, False, True]
+
+    def test_redis_errors_are_misses(self, result_cache, clause_analysis):
+        result_cache.redis.get = AsyncMock(side_effect=RedisConnectionError("down"))
+
+        assert asyncio.run(result_cache.get("llm_cache:a")) is None
+
+
+class TestLLMAnalyzerResultCache:
+    def test_hit_skips_llm_and_rate_limit(self, llm_analyzer, result_cache, clause_analysis):
+        llm_analyzer.result_cache = result_cache
+        llm_analyzer.rate_limiter = Mock(acquire=AsyncMock())
+        stats = Counter()
+
+        async def scenario():
+            await llm_analyzer._analyze_chunk("clause text", "ctx", stats)
+            return await llm_analyzer._analyze_chunk("clause  text", "ctx", stats)
+
+        assert asyncio.run(scenario()) == clause_analysis
+        llm_analyzer.chain.ainvoke.assert_awaited_once()
+        llm_analyzer.rate_limiter.acquire.assert_awaited_once()
+        assert stats == Counter(cache_hits=1, cache_misses=1, llm_requests=1)
+
+
+class TestLLMAnalyzerDeduplication:
+    def test_duplicates_are_fanned_out_to_every_chapter(self, llm_analyzer):
+        llm_analyzer.deduplicator = ChunkDeduplicator()
+        boilerplate = "The company shall not be liable for any indirect damages whatsoever."
+        chapters = [
+            schemas.DocumentChapter(chapter_name="LIABILITY", chapter_text=boilerplate,
+                                    page_start=1, page_end=1),
+            schemas.DocumentChapter(chapter_name="PRIVACY",
+                                    chapter_text="We sell your data to partners.",
+                                    page_start=2, page_end=2),
+            schemas.DocumentChapter(chapter_name="WARRANTY", chapter_text=boilerplate,
+                                    page_start=5, page_end=6),
+        ]
+
+        results = asyncio.run(llm_analyzer.analyze_document_per_chapter(chapters, "ctx"))
+
+        assert llm_analyzer.chain.ainvoke.await_count == 2
+        assert [(r.chapter_name, r.page_start, r.page_end) for r in results] == [
+            ("LIABILITY", 1, 1), ("PRIVACY", 2, 2), ("WARRANTY", 5, 6)]
+
+    def test_failures_are_fanned_out(self, llm_analyzer):
+        llm_analyzer.deduplicator = ChunkDeduplicator()
+        failure = RuntimeError("boom")
+        llm_analyzer._analyze_chunk = AsyncMock(side_effect=failure)
+        chunks = [schemas.DocumentChunk(index=i, text="same text") for i in range(3)]
+
+        results = asyncio.run(llm_analyzer._analyze_chunks(chunks, "ctx", with_chapter=False))
+
+        assert results == [failure, failure, failure]
+        llm_analyzer._analyze_chunk.assert_awaited_once()
+
+
+class TestLLMAnalyzerBatching:
+    @pytest.fixture
+    def batching_analyzer(self, llm_analyzer):
+        llm_analyzer.batch_max_items = 4
+        llm_analyzer.batch_max_chunk_tokens = 50
+        llm_analyzer.batch_chain = Mock()
+        return llm_analyzer
+
+    @staticmethod
+    def batch_of(clause_analysis, clause_ids):
+        return schemas.ClauseAnalysisBatch(analyses=[
+            schemas.BatchClauseAnalysis(clause_id=clause_id, **clause_analysis.model_dump())
+            for clause_id in clause_ids
+        ])
+
+    def test_short_chapters_share_one_request(self, batching_analyzer, clause_analysis):
+        batching_analyzer.batch_chain.ainvoke = AsyncMock(
+            return_value=self.batch_of(clause_analysis, [1, 2, 3, 4]))
+        chapters = [
+            schemas.DocumentChapter(chapter_name=f"SECTION {i}", chapter_text=f"Clause {i} text")
+            for i in range(8)
+        ]
+
+        results = asyncio.run(batching_analyzer.analyze_document_per_chapter(chapters, "ctx"))
+
+        assert batching_analyzer.batch_chain.ainvoke.await_count == 2
+        batching_analyzer.chain.ainvoke.assert_not_awaited()
+        assert [r.chapter_name for r in results] == [f"SECTION {i}" for i in range(8)]
+        prompt = batching_analyzer.batch_chain.ainvoke.await_args_list[0].args[0]["clauses"]
+        assert 'Clause 4:\n"""Clause 3 text"""' in prompt
+
+    def test_missing_and_duplicate_answers_are_redispatched(self, batching_analyzer,
+                                                            clause_analysis):
+        # Clause 2 is answered twice and clause 3 not at all
+        batching_analyzer.batch_chain.ainvoke = AsyncMock(
+            return_value=self.batch_of(clause_analysis, [1, 2, 2, 4]))
+        chunks = [schemas.DocumentChunk(index=i, text=f"Clause {i}") for i in range(4)]
+
+        results = asyncio.run(batching_analyzer._analyze_chunks(chunks, "ctx", with_chapter=False))
+
+        assert results == [clause_analysis] * 4
+        texts = [call.args[0]["text"] for call in batching_analyzer.chain.ainvoke.await_args_list]
+        assert sorted(texts) == ["Clause 1", "Clause 2"]
+
+    def test_failed_batch_falls_back_to_single_requests(self, batching_analyzer, clause_analysis):
+        async def invoke(chain, schema, inputs, stats):
+            if chain is batching_analyzer.batch_chain:
+                raise RuntimeError("Failed to analyze chunk after 4 retries")
+            return clause_analysis
+
+        batching_analyzer._invoke_with_retries = AsyncMock(side_effect=invoke)
+        chunks = [schemas.DocumentChunk(index=i, text=f"Clause {i}") for i in range(3)]
+
+        results = asyncio.run(batching_analyzer._analyze_chunks(chunks, "ctx", with_chapter=False))
+
+        assert results == [clause_analysis] * 3
+        assert batching_analyzer._invoke_with_retries.await_count == 4
+
+    def test_a_single_uncached_chunk_fails_without_redispatch(self, batching_analyzer,
+                                                              result_cache, clause_analysis):
+        batching_analyzer.result_cache = result_cache
+        failure = InvalidArgument("bad request")
+        batching_analyzer.chain.ainvoke = AsyncMock(side_effect=failure)
+        chunks = [schemas.DocumentChunk(index=i, text=f"Clause {i}") for i in range(3)]
+
+        results = {}
+
+        async def collect(chunk, result):
+            results[chunk.index] = result
+
+        async def scenario():
+            for chunk in chunks[:2]:
+                await result_cache.set(result_cache.key(chunk.text, "ctx"), clause_analysis)
+            return await batching_analyzer._run_pipeline(chunks, "ctx", False, collect)
+
+        stats = asyncio.run(scenario())
+
+        assert [results[0], results[1]] == [clause_analysis] * 2
+        assert isinstance(results[2].__cause__, InvalidArgument)
+        assert (stats["cache_hits"], stats["cache_misses"], stats["llm_requests"]) == (2, 1, 1)
+        assert "batch_redispatched" not in stats
+        batching_analyzer.batch_chain.ainvoke.assert_not_called()
+
+
+class TestLLMAnalyzerPipeline:
+    def test_results_reach_sink_before_parsing_finishes(self, llm_analyzer):
+        llm_analyzer.pipeline_workers = 1
+        llm_analyzer.pipeline_queue_depth = 1
+        pulled = []
+        pulled_at_first_result = []
+
+        def pages():
+            for i in range(10):
+                pulled.append(i)
+                yield f"Page {i} says we may change these terms."
+
+        async def sink(chunk, result):
+            pulled_at_first_result.append(len(pulled))
+
+        asyncio.run(llm_analyzer.stream_document_per_page(pages(), "ctx", sink))
+
+        assert len(pulled_at_first_result) == 10
+        # The bounded queue keeps the producer at most a few chunks ahead of the consumer
+        assert pulled_at_first_result[0] <= 3
+
+    def test_every_outcome_reaches_sink(self, llm_analyzer, clause_analysis):
+        llm_analyzer.deduplicator = ChunkDeduplicator()
+        failure = RuntimeError("boom")
+
+        async def invoke(chain, schema, inputs, stats):
+            if inputs["text"].startswith("Broken"):
+                raise failure
+            return clause_analysis
+
+        llm_analyzer._invoke_with_retries = AsyncMock(side_effect=invoke)
+        boilerplate = "The company shall not be liable for any indirect damages whatsoever."
+        chapters = [
+            schemas.DocumentChapter(chapter_name=name, chapter_text=text)
+            for name, text in [("LIABILITY", boilerplate), ("BROKEN", "Broken clause"),
+                               ("WARRANTY", boilerplate)]
+        ]
+        received = {}
+
+        async def sink(chunk, result):
+            received[chunk.index] = result
+
+        stats = asyncio.run(llm_analyzer.stream_document_per_chapter(chapters, "ctx", sink))
+
+        assert received[0].chapter_name == "LIABILITY"
+        assert received[1] is failure
+        assert received[2].chapter_name == "WARRANTY"
+        assert stats["dedup_saved_calls"] == 1
+
+    def test_sink_errors_abort_the_pipeline(self, llm_analyzer):
+        async def sink(chunk, result):
+            raise ConnectionError("mongo down")
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(llm_analyzer.stream_document_per_page(["Some clause."] * 5, "ctx", sink))
+
+    def test_skipped_chunks_are_not_analyzed(self, llm_analyzer):
+        llm_analyzer.deduplicator = ChunkDeduplicator()
+        pages = ["Stored clause text here.", "New clause text here.", "Stored clause text here."]
+        received = []
+
+        async def sink(chunk, result):
+            received.append(chunk.index)
+
+        stats = asyncio.run(llm_analyzer.stream_document_per_page(
+            pages, "ctx", sink, skip=lambda chunk: chunk.index == 0))
+
+        # Chunk 2 duplicates a stored chunk but has no stored result of its own
+        assert sorted(received) == [1, 2]
+        assert llm_analyzer.chain.ainvoke.await_count == 2
+        assert stats["skipped_chunks"] == 1
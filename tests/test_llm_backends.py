@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from collections import Counter
+from google.api_core import exceptions as google_exceptions
+from app.analyzer import schemas
+from app.analyzer.concurrency_limiter import ConcurrencyLimiter
+from app.analyzer.llm_analyzer import LLMAnalyzer
+from app.analyzer.llm_backends import CassetteChatModel, CassetteMissError, FakeChatModel
+from app.analyzer.retry_policy import ErrorClass, RetryPolicy
+from app.analyzer.templates import batch_prompt_template, format_batch_clauses, prompt_template
+
+
+def ask(llm, text="You may cancel at any time.", schema=schemas.ClauseAnalysis,
+        include_raw=False):
+    chain = prompt_template | llm.with_structured_output(schema, include_raw=include_raw)
+    return asyncio.run(chain.ainvoke({"text": text, "user_context": "ctx"}))
+
+
+class TestFakeChatModel:
+    def test_answers_are_schema_valid_and_deterministic(self):
+        first = ask(FakeChatModel(latency_median=0, seed=3))
+
+        assert isinstance(first, schemas.ClauseAnalysis)
+        assert first == ask(FakeChatModel(latency_median=0, seed=3))
+
+    def test_raw_output_has_tool_call(self):
+        result = ask(FakeChatModel(latency_median=0), include_raw=True)
+
+        assert result["parsing_error"] is None
+        assert result["raw"].tool_calls[0]["args"] == result["parsed"].model_dump(
+            mode="json", exclude={"tier"})
+
+    def test_batch_gets_one_answer_per_clause(self):
+        llm = FakeChatModel(latency_median=0)
+        chain = batch_prompt_template | llm.with_structured_output(schemas.ClauseAnalysisBatch)
+
+        batch = asyncio.run(chain.ainvoke({
+            "clauses": format_batch_clauses(["First clause.", "Second.", "Third."]),
+            "user_context": "ctx"}))
+
+        assert [analysis.clause_id for analysis in batch.analyses] == [1, 2, 3]
+
+    @pytest.mark.parametrize("rates, error", [
+        ({"throttle_rate": 1.0}, google_exceptions.ResourceExhausted),
+        ({"error_rate": 1.0}, google_exceptions.ServiceUnavailable),
+    ])
+    def test_injects_failures(self, rates, error):
+        with pytest.raises(error):
+            ask(FakeChatModel(latency_median=0, **rates))
+
+    def test_failure_rate_is_roughly_configured(self):
+        llm = FakeChatModel(latency_median=0, error_rate=0.3)
+        outcomes = Counter()
+        for i in range(200):
+            try:
+                ask(llm, text=f"Clause number {i}.")
+                outcomes["ok"] += 1
+            except google_exceptions.ServiceUnavailable:
+                outcomes["error"] += 1
+
+        assert 40 <= outcomes["error"] <= 80
+
+    def test_analyzer_runs_end_to_end_on_fake(self):
+        llm = FakeChatModel(latency_median=0.001, error_rate=0.2)
+        analyzer = LLMAnalyzer(llm=llm,
+                               max_chunk_tokens=50, chunk_overlap_tokens=0,
+                               limiter=ConcurrencyLimiter(max_concurrent=4),
+                               retry_policy=RetryPolicy(base_delay=0.001, max_delay=0.01))
+        pages = [f"Page {page}. " + "The provider may change these terms. " * 20
+                 for page in range(5)]
+
+        results = asyncio.run(analyzer.analyze_document_per_page(pages, "ctx"))
+
+        assert results and all(isinstance(clause, schemas.ClauseAnalysis) for clause in results)
+        # Injected errors were retried until every request succeeded
+        assert sum(llm.requests.values()) > len(llm.requests)
+
+
+class TestCassetteChatModel:
+    def test_replays_recorded_responses(self, tmp_path):
+        recorded = ask(CassetteChatModel(tmp_path, FakeChatModel(latency_median=0, seed=1)))
+
+        replayed = ask(CassetteChatModel(tmp_path))
+
+        assert replayed == recorded
+        assert len(list(tmp_path.glob("*.json"))) == 1
+
+    def test_missing_cassette_is_not_retried(self, tmp_path):
+        with pytest.raises(CassetteMissError) as error:
+            ask(CassetteChatModel(tmp_path))
+
+        assert RetryPolicy().classify(error.value) == ErrorClass.PERMANENT
@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+from collections import Counter
+from unittest.mock import AsyncMock, patch
+from langchain_core.messages import AIMessage
+from app.analyzer import schemas
+from app.analyzer.output_repair import OutputRepairError, OutputRepairer
+from app.enums import RiskLevel
+
+
+@pytest.fixture
+def repairer():
+    return OutputRepairer()
+
+
+@pytest.fixture
+def answer():
+    return {
+        "category": ["Termination"],
+        "risk_level": "medium",
+        "reason": "The provider may terminate without notice",
+        "key_points": ["Termination without notice"],
+        "conclusion": "Keep backups of your data",
+        "is_valid": True,
+    }
+
+
+def tool_call(args):
+    return AIMessage(content="", tool_calls=[{"name": "ClauseAnalysis", "args": args, "id": "1"}])
+
+
+class TestOutputRepairer:
+    @pytest.mark.parametrize("spelling, expected", [
+        ("Medium", RiskLevel.MEDIUM),
+        ("standard practice", RiskLevel.STANDART_PRACTICE),
+        ("standart_practice", RiskLevel.STANDART_PRACTICE),
+        ("critcal", RiskLevel.CRITICAL),
+    ])
+    def test_risk_level_spellings(self, repairer, answer, spelling, expected):
+        stats = Counter()
+
+        result = repairer.repair(tool_call({**answer, "risk_level": spelling}),
+                                 schemas.ClauseAnalysis, stats)
+
+        assert result.risk_level == expected
+        assert stats == Counter(repaired_risk_level=1)
+
+    def test_categories_are_matched_or_dropped(self, repairer, answer):
+        stats = Counter()
+        categories = ["termination", "Auto Renewal", "Limitation of Liabilty", "Weather"]
+
+        result = repairer.repair(tool_call({**answer, "category": categories,
+                                            "risk_level": "hgh"}),
+                                 schemas.ClauseAnalysis, stats)
+
+        assert result.category == ["Termination", "Automatic Renewal"]
+        assert stats["repaired_category"] == 2
+        assert stats["dropped_category"] == 2
+
+    def test_missing_fields_get_defaults(self, repairer, answer):
+        stats = Counter()
+        del answer["is_valid"], answer["key_points"]
+
+        result = repairer.repair(tool_call(answer), schemas.ClauseAnalysis, stats)
+
+        assert result.is_valid is True
+        assert result.key_points == []
+        assert stats == Counter(repaired_missing_is_valid=1, repaired_missing_key_points=1)
+
+    def test_single_values_become_lists(self, repairer, answer):
+        stats = Counter()
+
+        result = repairer.repair(tool_call({**answer, "category": "Termination",
+                                            "key_points": "No notice"}),
+                                 schemas.ClauseAnalysis, stats)
+
+        assert result.category == ["Termination"]
+        assert result.key_points == ["No notice"]
+        assert stats["repaired_list_coercion"] == 2
+
+    def test_json_syntax_is_repaired(self, repairer):
+        stats = Counter()
+        text = ('Here you go:\n```json\n{"category": ["Termination"], "risk_level": "high", '
+                '"reason": None, "key_points": ["a",], "conclusion": "Avoid", "is_valid": True')
+
+        result = repairer.repair(AIMessage(content=text), schemas.ClauseAnalysis, stats)
+
+        assert result.risk_level == RiskLevel.HIGH
+        assert result.key_points == ["a"]
+        assert stats == Counter(repaired_json_syntax=1)
+
+    def test_batch_items_are_repaired(self, repairer, answer):
+        stats = Counter()
+        output = {"analyses": [{**answer, "clause_id": 1, "risk_level": "LOW"},
+                               {**answer, "clause_id": 2, "category": "termination"}]}
+
+        result = repairer.repair(output, schemas.ClauseAnalysisBatch, stats)
+
+        assert [analysis.risk_level for analysis in result.analyses] == [RiskLevel.LOW,
+                                                                         RiskLevel.MEDIUM]
+        assert result.analyses[1].category == ["Termination"]
+
+    @pytest.mark.parametrize("raw", [
+        AIMessage(content="I can't analyze this clause."),
+        tool_call({"risk_level": "medium", "category": []}),
+        tool_call({"risk_level": "unknown", "conclusion": "?"}),
+    ])
+    def test_unrecoverable_output_raises(self, repairer, raw):
+        with pytest.raises(OutputRepairError):
+            repairer.repair(raw, schemas.ClauseAnalysis, Counter())
+
+
+class TestAnalyzerRepairsOutput:
+    def test_repaired_output_needs_no_second_request(self, llm_analyzer, answer):
+        llm_analyzer.chain.ainvoke = AsyncMock(return_value={
+            "raw": tool_call({**answer, "risk_level": "High risk"}),
+            "parsed": None,
+            "parsing_error": ValueError("risk_level: Input should be 'standard_practice', ...")
+        })
+        stats = Counter()
+
+        result = asyncio.run(llm_analyzer._request_analysis("clause", "ctx", stats))
+
+        assert result.risk_level == RiskLevel.HIGH
+        llm_analyzer.chain.ainvoke.assert_awaited_once()
+        assert stats["invalid_outputs"] == 1 and stats["unrepairable_outputs"] == 0
+
+    def test_unrecoverable_output_is_requested_again(self, llm_analyzer, answer,
+                                                     clause_analysis):
+        broken = {"raw": AIMessage(content="Sorry, no."), "parsed": None,
+                  "parsing_error": None}
+        parsed = {"raw": tool_call(answer), "parsed": clause_analysis, "parsing_error": None}
+        llm_analyzer.chain.ainvoke = AsyncMock(side_effect=[broken, parsed])
+        stats = Counter()
+
+        with patch("app.analyzer.llm_analyzer.asyncio.sleep", AsyncMock()):
+            result = asyncio.run(llm_analyzer._request_analysis("clause", "ctx", stats))
+
+        assert result == clause_analysis
+        assert llm_analyzer.chain.ainvoke.await_count == 2
+        assert stats["unrepairable_outputs"] == 1
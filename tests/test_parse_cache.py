@@ -0,0 +1,140 @@
+import asyncio
+import errno
+import os
+import pytest
+from collections import Counter
+from unittest.mock import AsyncMock, Mock, patch
+from app.analyzer import schemas
+from app.analyzer.parse_cache import ParseCache
+from app.analyzer.pdf_parser import PDFParser
+from app.analyzer.service import AnalyzerService
+
+
+@pytest.fixture
+def parsed_document():
+    return schemas.ParsedDocument(
+        has_chapters=True,
+        chapters=[
+            schemas.DocumentChapter(chapter_name="TERMINATION",
+                                    chapter_text="We may terminate " * 20,
+                                    page_start=1, page_end=2),
+        ]
+    )
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = tmp_path / "tos.pdf"
+    path.write_bytes(b"%PDF-1.7 fake document bytes")
+    return str(path)
+
+
+class TestParseCache:
+    def test_miss_then_hit(self, tmp_path, pdf_file, parsed_document):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        key = cache.key(pdf_file, PDFParser().config_fingerprint)
+
+        assert cache.get(key) is None
+        cache.put(key, parsed_document)
+
+        assert cache.get(key) == parsed_document
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_key_depends_on_parser_configuration(self, tmp_path, pdf_file):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+
+        default_key = cache.key(pdf_file, PDFParser().config_fingerprint)
+        strict_key = cache.key(pdf_file, PDFParser(min_chapter_lenght=500).config_fingerprint)
+        parallel_key = cache.key(pdf_file, PDFParser(parallel_workers=4).config_fingerprint)
+
+        assert default_key != strict_key
+        assert default_key == parallel_key  # Parallel extraction doesn't change output
+
+    def test_evicts_least_recently_used_entries(self, tmp_path, parsed_document):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        cache.put("old", parsed_document)
+        cache.put("new", parsed_document)
+        os.utime(cache._path("old"), (0, 0))
+        entry_size = cache._path("new").stat().st_size
+
+        cache.max_bytes = 2 * entry_size
+        cache.put("newest", parsed_document)
+
+        assert not cache._path("old").exists()
+        assert cache._path("new").exists()
+        assert cache._path("newest").exists()
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path, parsed_document):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        cache.put("key", parsed_document)
+        cache._path("key").write_bytes(b"not zlib")
+
+        assert cache.get("key") is None
+        assert not cache._path("key").exists()
+
+    def test_failed_store_is_dropped_with_its_temp_file(self, tmp_path, parsed_document):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        full = OSError(errno.ENOSPC, "No space left on device")
+
+        with patch("app.analyzer.parse_cache.os.replace", side_effect=full):
+            cache.put("key", parsed_document)
+
+        assert cache.get("key") is None
+        assert list((tmp_path / "cache").iterdir()) == []
+
+
+class TestAnalyzerServiceParseCache:
+    def test_cached_document_skips_parser(self, tmp_path, pdf_file, parsed_document):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        parser = Mock(spec=PDFParser)
+        parser.config_fingerprint = "fingerprint"
+        parser.parse.return_value = parsed_document
+        analyzer = Mock()
+        analyzer.analyze_document_per_chapter = AsyncMock(return_value=[])
+        service = AnalyzerService(analyzer, parser, cache)
+
+        asyncio.run(service.analyze(pdf_file, ""))
+        asyncio.run(service.analyze(pdf_file, ""))
+
+        parser.parse.assert_called_once_with(pdf_file)
+        assert analyzer.analyze_document_per_chapter.await_count == 2
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_streamed_parse_is_cached_once_consumed(self, tmp_path, pdf_file, parsed_document):
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        parser = Mock(spec=PDFParser)
+        parser.config_fingerprint = "fingerprint"
+        parser.iter_parse.return_value = (True, iter(parsed_document.chapters))
+        analyzer = Mock()
+
+        async def consume(chapters, user_context, sink, skip):
+            list(chapters)
+
+        analyzer.stream_document_per_chapter = AsyncMock(side_effect=consume)
+        service = AnalyzerService(analyzer, parser, cache)
+
+        asyncio.run(service.stream(pdf_file, "", AsyncMock()))
+        asyncio.run(service.stream(pdf_file, "", AsyncMock()))
+
+        parser.iter_parse.assert_called_once_with(pdf_file, Counter())
+        assert cache.get(cache.key(pdf_file, "fingerprint")) == parsed_document
+
+    def test_unwritable_cache_does_not_fail_the_analysis(self, tmp_path, pdf_file,
+                                                         parsed_document):
+        # A file where the cache directory should be, like a read-only mount, fails every write
+        (tmp_path / "cache").write_bytes(b"")
+        cache = ParseCache(tmp_path / "cache", max_bytes=1024 * 1024)
+        parser = Mock(spec=PDFParser)
+        parser.config_fingerprint = "fingerprint"
+        parser.iter_parse.return_value = (True, iter(parsed_document.chapters))
+        analyzer = Mock()
+
+        async def consume(chapters, user_context, sink, skip):
+            list(chapters)
+
+        analyzer.stream_document_per_chapter = AsyncMock(side_effect=consume)
+        service = AnalyzerService(analyzer, parser, cache)
+
+        asyncio.run(service.stream(pdf_file, "", AsyncMock()))
+
+        analyzer.stream_document_per_chapter.assert_awaited_once()
@@ -1,6 +1,12 @@
 import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 from app.analyzer import schemas
+from app.analyzer import layout
+from app.analyzer.layout import PDF_LOCK, PageLayout
+from app.analyzer.pdf_parser import PDFParser
+from benchmarks.fixtures import make_tos_pdf
 
 
 class TestPDFParser:
@@ -45,9 +51,13 @@ class TestPDFParser:
         """Test that iter_text correctly yields text from each page."""
         # Setup mock
         mock_page1 = Mock()
-        mock_page1.get_text.return_value = "Page 1 content"
+        mock_page1.get_text.return_value = {
+            "blocks": [{"lines": [{"spans": [{"text": "Page 1 content"}]}]}]
+        }
         mock_page2 = Mock()
-        mock_page2.get_text.return_value = "Page 2 content"
+        mock_page2.get_text.return_value = {
+            "blocks": [{"lines": [{"spans": [{"text": "Page 2 content"}]}]}]
+        }
 
         mock_doc = Mock()
         mock_doc.__iter__ = Mock(return_value=iter([mock_page1, mock_page2]))
@@ -183,6 +193,54 @@ class TestPDFParser:
         result = parser.has_identifiable_chapters("dummy.pdf")
         assert result is False  # Should handle gracefully
 
+    @patch('pymupdf.open')
+    def test_layout_is_extracted_once_and_shared(self, mock_pymupdf_open, parser):
+        """Test that detection and parsing reuse one extracted layout."""
+        mock_page = Mock()
+        mock_page.get_text.return_value = {
+            "blocks": [{
+                "lines": [
+                    {"spans": [{"text": "INTRODUCTION"}]},
+                    {"spans": [{"text": "This is the introduction content " * 5}]}
+                ]
+            }]
+        }
+
+        mock_doc = Mock()
+        mock_doc.__iter__ = Mock(return_value=iter([mock_page]))
+        mock_pymupdf_open.return_value = mock_doc
+
+        layout = parser.extract_layout("dummy.pdf")
+
+        assert parser.has_identifiable_chapters(layout) is True
+        chapters = list(parser.parse_using_re(layout))
+        pages = list(parser.iter_text(layout))
+
+        mock_pymupdf_open.assert_called_once_with("dummy.pdf")
+        mock_page.get_text.assert_called_once()
+        mock_doc.close.assert_called_once()
+        assert [chapter.chapter_name for chapter in chapters] == ["INTRODUCTION"]
+        assert pages == ["INTRODUCTION\n" + ("This is the introduction content " * 5).strip()]
+
+    def test_page_matcher_agrees_with_line_matcher(self, parser):
+        """Test that whole-page heading matching finds the same lines as per-line matching."""
+        lines = [
+            "TERMS AND CONDITIONS",
+            "PRIVACY POLICY OVERVIEW",
+            "Regular body text that follows a heading.",
+            "",
+            "A. TERMS; PRIVACY",
+            "lowercase heading",
+            "USER RESPONSIBILITIES",
+            "THIS HEADING HAS FAR TOO MANY WORDS",
+        ]
+        page = PageLayout(0, lines)
+
+        expected = [i for i, line in enumerate(lines) if parser._match_any_pattern(line)]
+
+        assert list(parser._iter_heading_indexes(page)) == expected
+        assert expected == [0, 1, 4, 6]
+
     def test_chapter_validation_edge_cases(self, parser):
         """Test chapter validation with edge cases."""
         # Exactly at minimum length
@@ -198,3 +256,82 @@ class TestPDFParser:
 
         # Whitespace only
         assert not parser._is_chapter_valid("   ")
+
+
+class TestParallelExtraction:
+    def test_parallel_chapters_match_serial(self, tmp_path):
+        """Test that sharded extraction yields the same chapters, incl. ones crossing shards."""
+        path = make_tos_pdf(str(tmp_path / "tos.pdf"), pages=9, heading_pages=[0, 4, 7])
+        serial = PDFParser()
+        parallel = PDFParser(parallel_min_pages=2, parallel_workers=2)
+
+        serial_chapters = list(serial.parse_using_re(path))
+        parallel_chapters = list(parallel.parse_using_re(path))
+
+        assert len(serial_chapters) == 3
+        assert parallel_chapters == serial_chapters
+        assert list(parallel.iter_text(path)) == list(serial.iter_text(path))
+
+    @patch('app.analyzer.pdf_parser.extract_layout_parallel')
+    def test_small_documents_use_serial_path(self, mock_parallel, tmp_path):
+        """Test that documents below the page threshold skip the process pool."""
+        path = make_tos_pdf(str(tmp_path / "tos.pdf"), pages=3)
+        parser = PDFParser(parallel_min_pages=10, parallel_workers=4)
+
+        layout = parser.extract_layout(path)
+
+        assert layout.page_count == 3
+        mock_parallel.assert_not_called()
+
+    def test_shards_come_from_a_fork_server_where_process_pools_are_allowed(self, tmp_path):
+        """Test that shard processes come from a fork server, not from a threaded process."""
+        path = make_tos_pdf(str(tmp_path / "tos.pdf"), pages=4)
+        with patch('app.analyzer.layout.ProcessPoolExecutor') as pool:
+            pool.return_value.__enter__.return_value.submit.return_value.result.return_value = []
+            layout.extract_layout_parallel(path, 4, 2)
+            layout.allow_process_pool(False)
+            try:
+                assert layout.extract_layout_parallel(path, 4, 2).page_count == 4
+            finally:
+                layout.allow_process_pool(True)
+
+        pool.assert_called_once()
+        assert pool.call_args.kwargs["mp_context"].get_start_method() == "forkserver"
+
+    def test_parse_falls_back_to_pages(self, tmp_path):
+        """Test that documents without headings are parsed into one pseudo-chapter per page."""
+        path = make_tos_pdf(str(tmp_path / "tos.pdf"), pages=2, heading_pages=[])
+        parser = PDFParser()
+
+        parsed = parser.parse(path)
+
+        assert parsed.has_chapters is False
+        assert [page.chapter_name for page in parsed.chapters] == ["Page 1", "Page 2"]
+        assert [page.chapter_text for page in parsed.chapters] == list(parser.iter_text(path))
+
+
+class TestThreadedParsing:
+    def test_documents_parsed_on_several_threads_match_serial(self, tmp_path):
+        """Test that threads parsing at once, as in a threads pool worker, interleave safely."""
+        paths = [make_tos_pdf(str(tmp_path / f"tos_{i}.pdf"), pages=6, heading_pages=[0, i])
+                 for i in range(1, 5)]
+        parser = PDFParser()
+        serial = [parser.parse(path) for path in paths]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            threaded = list(pool.map(parser.parse, paths * 2))
+
+        assert threaded == serial * 2
+
+    def test_pages_are_extracted_under_the_process_wide_lock(self, tmp_path):
+        """Test that a thread does not call into PyMuPDF while another one holds the lock."""
+        path = make_tos_pdf(str(tmp_path / "tos.pdf"), pages=2)
+        pages = []
+        with PDF_LOCK:
+            thread = threading.Thread(target=lambda: pages.extend(PDFParser().iter_text(path)))
+            thread.start()
+            thread.join(timeout=0.2)
+            assert pages == []
+        thread.join()
+
+        assert len(pages) == 2
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+import fakeredis
+from app.analyzer.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis()
+
+
+class TestRateLimiter:
+    def test_slots_are_spaced_by_the_rate(self, redis):
+        limiter = RateLimiter(redis, "llm", requests_per_minute=60)
+
+        waits = asyncio.run(limiter.reserve(3))
+
+        assert waits[0] == 0
+        assert waits[1] == pytest.approx(1.0, abs=0.05)
+        assert waits[2] == pytest.approx(2.0, abs=0.05)
+
+    def test_reservations_are_shared_through_redis(self, redis):
+        first = RateLimiter(redis, "llm", requests_per_minute=60)
+        second = RateLimiter(redis, "llm", requests_per_minute=60)
+
+        async def scenario():
+            await first.reserve(2)
+            return await second.reserve()
+
+        assert asyncio.run(scenario())[0] == pytest.approx(2.0, abs=0.05)
+
+    def test_burst_starts_without_waiting(self, redis):
+        limiter = RateLimiter(redis, "llm", requests_per_minute=60, burst=3)
+
+        waits = asyncio.run(limiter.reserve(4))
+
+        assert waits[:3] == [0, 0, 0]
+        assert waits[3] == pytest.approx(1.0, abs=0.05)
+
+    def test_idle_time_is_not_banked_beyond_burst(self, redis):
+        limiter = RateLimiter(redis, "llm", requests_per_minute=6000)
+
+        async def scenario():
+            await limiter.reserve()
+            await asyncio.sleep(0.1)  # ten intervals
+            return await limiter.reserve(2)
+
+        waits = asyncio.run(scenario())
+        assert waits[0] == 0
+        assert waits[1] == pytest.approx(0.01, abs=0.005)
+
+    def test_key_expires_when_idle(self, redis):
+        limiter = RateLimiter(redis, "llm", requests_per_minute=60)
+
+        async def scenario():
+            await limiter.reserve(2)
+            return await redis.pttl("rate_limit:llm")
+
+        assert 0 < asyncio.run(scenario()) <= 2001
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.analyzer import schemas
+from app.analyzer.relevance import RelevanceFilter
+
+CLAUSE = ("We may suspend or terminate your account at any time without notice, and you "
+          "waive any claim for damages arising from the termination.")
+TABLE_OF_CONTENTS = ("Table of Contents 1. Introduction 2 2. Accounts 3 3. Payment and Fees 5 "
+                     "4. Termination 7 5. Limitation of Liability 9 6. Governing Law 11")
+CONTACT = ("Acme Cloud Inc., 123 Market Street, Suite 400, San Francisco, CA 94105. "
+           "Phone: +1 (415) 555-0100. Email: legal@acme.example")
+GLOSSARY = ("\"Account\" means the account you create. \"Content\" means any text, images or "
+            "data. \"Service\" refers to the Acme platform.")
+
+
+@pytest.fixture
+def relevance_filter():
+    return RelevanceFilter(threshold=0.3)
+
+
+class TestRelevanceFilter:
+    def test_substantive_clause_is_relevant(self, relevance_filter):
+        assert relevance_filter.is_relevant(CLAUSE, "TERMINATION")
+
+    @pytest.mark.parametrize("text", [TABLE_OF_CONTENTS, CONTACT, GLOSSARY, "Page 12 of 14"])
+    def test_non_substantive_chunks_are_not(self, relevance_filter, text):
+        assert not relevance_filter.is_relevant(text)
+
+    def test_preamble_lowers_score(self, relevance_filter):
+        text = "Acme Cloud Terms of Use, last updated in March."
+
+        assert relevance_filter.score(text, "File beginning") < relevance_filter.score(text)
+
+    def test_threshold_is_tunable(self):
+        score = RelevanceFilter().score(CLAUSE)
+
+        assert RelevanceFilter(threshold=score).is_relevant(CLAUSE)
+        assert not RelevanceFilter(threshold=min(score + 0.01, 1.0)).is_relevant(CLAUSE)
+
+
+class TestPipelineRelevance:
+    def test_irrelevant_chunks_are_recorded_not_requested(self, llm_analyzer, relevance_filter,
+                                                          clause_analysis):
+        llm_analyzer.relevance_filter = relevance_filter
+        chapters = [schemas.DocumentChapter(chapter_name=name, chapter_text=text)
+                    for name, text in [("CONTENTS", TABLE_OF_CONTENTS),
+                                       ("TERMINATION", CLAUSE), ("CONTACT US", CONTACT)]]
+        received = {}
+
+        async def sink(chunk, result):
+            received[chunk.index] = result
+
+        stats = asyncio.run(llm_analyzer.stream_document_per_chapter(chapters, "ctx", sink))
+
+        assert llm_analyzer.chain.ainvoke.await_count == 1
+        assert isinstance(received[1], schemas.ChapterAnalysis)
+        assert [type(received[index]) for index in (0, 2)] == [schemas.SkippedChunk] * 2
+        assert received[0].threshold == 0.3
+        assert stats["irrelevant_chunks"] == 2
+
+    def test_stored_chunks_are_not_scored(self, llm_analyzer):
+        llm_analyzer.relevance_filter = RelevanceFilter()
+        llm_analyzer.relevance_filter.score = Mock()
+        sink = AsyncMock()
+
+        asyncio.run(llm_analyzer.stream_document_per_page([TABLE_OF_CONTENTS], "ctx", sink,
+                                                          skip=lambda chunk: True))
+
+        llm_analyzer.relevance_filter.score.assert_not_called()
+        sink.assert_not_awaited()
@@ -0,0 +1,154 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.analyzer import schemas
+from app.analyzer.result_store import ResultStore, ensure_indexes
+from app.enums import DocumentStatus
+from pymongo.errors import DuplicateKeyError
+
+
+def mock_collection():
+    collection = Mock()
+    collection.create_index = AsyncMock()
+    collection.distinct = AsyncMock(return_value=[])
+    collection.replace_one = AsyncMock()
+    collection.delete_one = AsyncMock()
+    collection.delete_many = AsyncMock(return_value=Mock(deleted_count=0))
+    return collection
+
+
+class IndexedCollection:
+    """Documents with Mongo's unique index rules: a document without the field is indexed
+    under a null key, unless a partial filter requiring the field leaves it out."""
+
+    def __init__(self, documents):
+        self.documents = list(documents)
+
+    async def create_index(self, field, unique=False, partialFilterExpression=None):
+        indexed = [document for document in self.documents
+                   if partialFilterExpression is None or field in document]
+        keys = [document.get(field) for document in indexed]
+        if unique and len(set(keys)) < len(keys):
+            raise DuplicateKeyError(f"E11000 duplicate key error index: {field}_1")
+
+
+@pytest.fixture
+def collection():
+    return mock_collection()
+
+
+@pytest.fixture
+def failures():
+    return mock_collection()
+
+
+@pytest.fixture
+def store(collection, failures):
+    return ResultStore(collection, failures, document_id=7)
+
+
+def chunk(index, text="You may cancel at any time."):
+    return schemas.DocumentChunk(index=index, text=text)
+
+
+class TestResultStore:
+    def test_key_depends_on_document_index_and_text(self, store, collection, failures):
+        assert store.chunk_key(chunk(0)) == store.chunk_key(chunk(0))
+        assert store.chunk_key(chunk(0)) != store.chunk_key(chunk(1))
+        assert store.chunk_key(chunk(0)) != store.chunk_key(chunk(0, "Other text."))
+        assert store.chunk_key(chunk(0)) != ResultStore(collection, failures, 8).chunk_key(chunk(0))
+
+    def test_stored_chunks_are_completed(self, store, collection):
+        collection.distinct.return_value = [store.chunk_key(chunk(0))]
+
+        asyncio.run(store.load_completed())
+
+        assert store.is_completed(chunk(0))
+        assert not store.is_completed(chunk(0, "Edited text."))
+        assert not store.is_completed(chunk(1))
+
+    def test_save_upserts_by_chunk_key(self, store, collection, failures, clause_analysis):
+        asyncio.run(store.save(chunk(3), clause_analysis))
+
+        collection.replace_one.assert_awaited_once()
+        query, document = collection.replace_one.await_args.args
+        assert query == {"chunk_key": store.chunk_key(chunk(3))}
+        assert document["document_id"] == 7
+        assert document["chunk_index"] == 3
+        assert collection.replace_one.await_args.kwargs == {"upsert": True}
+        failures.delete_one.assert_awaited_once_with(query)
+
+    def test_failures_are_recorded_with_root_error_class(self, store, collection, failures):
+        chapter = schemas.DocumentChapter(chapter_name="FEES", chapter_text="", page_start=3)
+        try:
+            try:
+                raise TimeoutError("deadline exceeded")
+            except TimeoutError as e:
+                raise RuntimeError("Failed to analyze chunk after 4 retries") from e
+        except RuntimeError as e:
+            error = e
+
+        asyncio.run(store.save(
+            schemas.DocumentChunk(index=2, text="Fees apply.", chapter=chapter), error))
+
+        collection.replace_one.assert_not_awaited()
+        failure = failures.replace_one.await_args.args[1]
+        assert failure["error_class"] == "TimeoutError"
+        assert (failure["chunk_index"], failure["chapter_name"], failure["page_start"]) == (
+            2, "FEES", 3)
+        assert store.document_status() == DocumentStatus.FAILED
+
+    def test_status_is_partial_when_some_chunks_failed(self, store, clause_analysis):
+        assert store.document_status() == DocumentStatus.ANALYZED
+
+        asyncio.run(store.save(chunk(0), clause_analysis))
+        asyncio.run(store.save(chunk(1), RuntimeError("boom")))
+
+        assert store.document_status() == DocumentStatus.PARTIALLY_ANALYZED
+
+    def test_retry_invalid_only_skips_valid_clauses(self, store, collection):
+        asyncio.run(store.load_completed(retry_invalid=True))
+
+        assert collection.distinct.await_args.args == (
+            "chunk_key", {"document_id": 7, "is_valid": True})
+
+    def test_prune_keeps_chunks_of_this_run(self, store, collection, failures):
+        store.is_completed(chunk(0))
+
+        asyncio.run(store.prune())
+
+        query = collection.delete_many.await_args.args[0]
+        assert query == {"document_id": 7, "chunk_key": {"$nin": [store.chunk_key(chunk(0))]}}
+        failures.delete_many.assert_awaited_once_with(query)
+
+    def test_skipped_chunks_are_stored_without_clause_fields(self, store, collection):
+        chapter = schemas.DocumentChapter(chapter_name="CONTACT US", chapter_text="")
+        skipped = schemas.SkippedChunk(relevance=0.01, threshold=0.3)
+
+        asyncio.run(store.save(
+            schemas.DocumentChunk(index=4, text="Email: legal@acme.example", chapter=chapter),
+            skipped))
+
+        document = collection.replace_one.await_args.args[1]
+        assert document["skipped"] is True
+        assert document["chapter_name"] == "CONTACT US"
+        assert "is_valid" not in document
+        assert store.stats == {"skipped_irrelevant": 1}
+
+
+class TestIndexes:
+    def test_legacy_clauses_without_chunk_key_do_not_break_the_index(self):
+        legacy = [{"document_id": 1, "chunk_index": index, "is_valid": True}
+                  for index in range(3)]
+        clauses = IndexedCollection(legacy + [{"document_id": 2, "chunk_key": "2:0:ab"}])
+
+        asyncio.run(ensure_indexes(clauses, IndexedCollection([])))
+
+        # A plain unique index indexes every legacy clause under the same null key
+        with pytest.raises(DuplicateKeyError):
+            asyncio.run(clauses.create_index("chunk_key", unique=True))
+
+    def test_loading_completed_chunks_does_not_build_indexes(self, store, collection):
+        asyncio.run(store.load_completed())
+
+        collection.create_index.assert_not_awaited()
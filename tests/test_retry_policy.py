@@ -0,0 +1,159 @@
+import asyncio
+import random
+import pytest
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+import fakeredis
+from google.api_core import exceptions as google_exceptions
+from app.analyzer.retry_policy import (ErrorClass, RetryPolicy, SharedRetryBudget,
+                                       current_retry_budget, retry_hint)
+
+
+@pytest.fixture
+def policy():
+    return RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0,
+                       budget_min_retries=2, budget_ratio=0.5, rng=random.Random(0))
+
+
+class TestRetryPolicy:
+    @pytest.mark.parametrize("error, expected", [
+        (google_exceptions.ResourceExhausted("quota"), ErrorClass.THROTTLE),
+        (google_exceptions.TooManyRequests("slow down"), ErrorClass.THROTTLE),
+        (google_exceptions.ServiceUnavailable("overloaded"), ErrorClass.TRANSIENT),
+        (TimeoutError(), ErrorClass.TRANSIENT),
+        (google_exceptions.InvalidArgument("bad request"), ErrorClass.PERMANENT),
+        (google_exceptions.PermissionDenied("bad key"), ErrorClass.PERMANENT),
+        (ValueError("output does not match the schema"), ErrorClass.TRANSIENT),
+        (RuntimeError("unknown"), ErrorClass.TRANSIENT),
+    ])
+    def test_classify(self, policy, error, expected):
+        assert policy.classify(error) == expected
+
+    def test_classify_follows_cause_chain(self, policy):
+        try:
+            try:
+                raise google_exceptions.ResourceExhausted("quota")
+            except Exception as e:
+                raise RuntimeError("wrapped by the client library") from e
+        except RuntimeError as wrapped:
+            assert policy.classify(wrapped) == ErrorClass.THROTTLE
+
+    def test_backoff_is_jittered_within_bounds(self, policy):
+        delay = 0.0
+        for _ in range(50):
+            previous, delay = delay, policy.backoff(delay)
+            assert 1.0 <= delay <= min(30.0, max(previous * 3, 1.0))
+
+    def test_hint_from_retry_after_header(self):
+        error = google_exceptions.TooManyRequests(
+            "slow down", response=SimpleNamespace(headers={"retry-after": "7"}))
+
+        assert retry_hint(error) == 7
+
+    def test_hint_from_retry_info_detail(self):
+        detail = SimpleNamespace(retry_delay=SimpleNamespace(seconds=12, nanos=500_000_000))
+        error = google_exceptions.ResourceExhausted("quota", details=[detail])
+
+        assert retry_hint(error) == 12.5
+
+    def test_hint_from_message(self):
+        error = google_exceptions.ResourceExhausted("quota exceeded [retry_delay { seconds: 27 }]")
+
+        assert retry_hint(error) == 27
+        assert retry_hint(google_exceptions.ResourceExhausted("quota")) is None
+
+    def test_hint_overrides_backoff(self, policy):
+        error = google_exceptions.TooManyRequests(
+            "slow down", response=SimpleNamespace(headers={"retry-after": "7"}))
+
+        assert policy.delay(error, 0.0) == 7
+
+    def test_budget_grows_with_first_attempts(self, policy):
+        assert policy.within_budget(Counter(llm_requests=3, retries=1))
+        assert not policy.within_budget(Counter(llm_requests=4, retries=3))
+        assert policy.within_budget(Counter(llm_requests=8, retries=2))
+
+
+class TestRetriesWithFakeLLM:
+    """The chain plays a fake LLM that fails with scripted errors before answering."""
+
+    def run(self, llm_analyzer, policy, *errors):
+        llm_analyzer.retry_policy = policy
+        answer = llm_analyzer.chain.ainvoke.return_value
+        llm_analyzer.chain.ainvoke.side_effect = [*errors, answer]
+        stats = Counter()
+        with patch("app.analyzer.llm_analyzer.asyncio.sleep", AsyncMock()) as sleep:
+            try:
+                result = asyncio.run(llm_analyzer._request_analysis("clause", "ctx", stats))
+            except RuntimeError as e:
+                result = e
+        return result, stats, [call.args[0] for call in sleep.await_args_list]
+
+    def test_throttle_waits_for_server_hint(self, llm_analyzer, policy, clause_analysis):
+        throttle = google_exceptions.ResourceExhausted("quota [retry_delay { seconds: 20 }]")
+
+        result, stats, sleeps = self.run(llm_analyzer, policy, throttle)
+
+        assert result == clause_analysis
+        assert sleeps == [20]
+        assert stats == Counter(llm_requests=2, retries=1, throttle_errors=1)
+
+    def test_transient_errors_back_off(self, llm_analyzer, policy, clause_analysis):
+        result, stats, sleeps = self.run(
+            llm_analyzer, policy,
+            google_exceptions.ServiceUnavailable("overloaded"), TimeoutError())
+
+        assert result == clause_analysis
+        assert len(sleeps) == 2 and all(1.0 <= delay <= 3.0 for delay in sleeps)
+        assert stats["transient_errors"] == 2
+
+    def test_permanent_error_is_not_retried(self, llm_analyzer, policy):
+        result, stats, sleeps = self.run(
+            llm_analyzer, policy, google_exceptions.InvalidArgument("bad request"))
+
+        assert isinstance(result, RuntimeError)
+        assert llm_analyzer.chain.ainvoke.await_count == 1
+        assert sleeps == []
+        assert stats["permanent_errors"] == 1
+
+    def test_gives_up_after_max_attempts(self, llm_analyzer, policy):
+        policy.budget_min_retries = 10
+        result, stats, sleeps = self.run(
+            llm_analyzer, policy, *[TimeoutError()] * policy.max_attempts)
+
+        assert isinstance(result, RuntimeError)
+        assert llm_analyzer.chain.ainvoke.await_count == policy.max_attempts
+        assert len(sleeps) == policy.max_attempts - 1
+
+    def test_exhausted_budget_fails_fast(self, llm_analyzer, policy):
+        policy.budget_min_retries, policy.budget_ratio = 1, 0
+        result, stats, sleeps = self.run(
+            llm_analyzer, policy, *[google_exceptions.ServiceUnavailable("down")] * 3)
+
+        assert isinstance(result, RuntimeError)
+        assert "budget" in str(result)
+        assert stats["retries"] == policy.budget_min_retries
+
+    def test_chunk_tasks_of_a_document_share_its_budget(self, llm_analyzer, policy):
+        policy.budget_min_retries, policy.budget_ratio = 1, 0
+        answer = llm_analyzer.chain.ainvoke.return_value
+        down = google_exceptions.ServiceUnavailable("down")
+        llm_analyzer.retry_policy = policy
+        llm_analyzer.chain.ainvoke.side_effect = [down, answer, down, answer]
+        redis = fakeredis.FakeAsyncRedis()
+
+        async def chunk_task():
+            current_retry_budget.set(SharedRetryBudget(redis, "chunks:7:run", 60))
+            try:
+                return await llm_analyzer._request_analysis("clause", "ctx", Counter())
+            except RuntimeError as e:
+                return e
+
+        with patch("app.analyzer.llm_analyzer.asyncio.sleep", AsyncMock()):
+            first, second = asyncio.run(chunk_task()), asyncio.run(chunk_task())
+
+        assert first == answer
+        # The first task spent the document's only retry
+        assert "retry budget exhausted" in str(second)
+        assert llm_analyzer.chain.ainvoke.await_count == 3
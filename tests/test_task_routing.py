@@ -0,0 +1,51 @@
+from unittest.mock import patch
+import pytest
+from app import celery_app, tasks
+from app.config import settings
+from benchmarks.fixtures import make_tos_pdf
+
+SMALL = settings.ANALYSIS_SMALL_QUEUE
+LARGE = settings.ANALYSIS_LARGE_QUEUE
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return make_tos_pdf(str(tmp_path / "tos.pdf"), pages=6)
+
+
+class TestAnalysisQueue:
+    @pytest.mark.parametrize("max_pages, max_bytes, queue", [
+        (6, 1024 * 1024, SMALL),
+        (5, 1024 * 1024, LARGE),
+        (6, 1024, LARGE),
+    ])
+    def test_routes_by_page_count_and_size(self, pdf_path, max_pages, max_bytes, queue):
+        with patch.object(settings, "ANALYSIS_SMALL_MAX_PAGES", max_pages), \
+                patch.object(settings, "ANALYSIS_SMALL_MAX_BYTES", max_bytes):
+            assert tasks.analysis_queue(pdf_path) == queue
+
+    def test_unreadable_documents_go_to_the_large_queue(self, tmp_path):
+        broken = tmp_path / "broken.pdf"
+        broken.write_bytes(b"not a pdf")
+
+        assert tasks.analysis_queue(str(broken)) == LARGE
+        assert tasks.analysis_queue(str(tmp_path / "missing.pdf")) == LARGE
+
+    def test_a_stored_page_count_routes_without_opening_the_pdf(self, pdf_path):
+        with patch.object(tasks, "count_pages", side_effect=AssertionError) as count_pages:
+            assert tasks.analysis_queue(pdf_path, page_count=6) == SMALL
+            assert tasks.analysis_queue(pdf_path, page_count=10_000) == LARGE
+
+        count_pages.assert_not_called()
+
+    def test_queue_analysis_sends_the_task_to_its_queue(self, pdf_path):
+        with patch.object(tasks.analyze_document, "apply_async") as apply_async:
+            tasks.queue_analysis(7, pdf_path, retry_invalid=True, run_id="run")
+
+        apply_async.assert_called_once_with((7, True), {"run_id": "run"}, queue=SMALL)
+
+    def test_chunk_tasks_of_fanned_out_documents_take_the_large_queue(self):
+        router = celery_app.amqp.router
+
+        assert router.route({}, "analyze_chunks")["queue"].name == LARGE
+        assert router.route({}, "finish_document")["queue"].name == SMALL
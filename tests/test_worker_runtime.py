@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+import pytest
+from langchain_google_genai import ChatGoogleGenerativeAI
+from app.analyzer.pdf_parser import PDFParser
+from app.analyzer.service import AnalyzerService
+from app import worker_runtime
+from app.worker_runtime import WorkerRuntime
+from benchmarks.fixtures import make_tos_pdf
+
+
+def make_service(llm=None):
+    return Mock(analyzer=Mock(llm=llm or Mock(), triage=None))
+
+
+@pytest.fixture
+def runtime():
+    runtime = WorkerRuntime(make_service).start()
+    yield runtime
+    runtime.stop()
+
+
+class TestWorkerRuntime:
+    def test_tasks_from_any_thread_run_on_the_runtime_loop(self, runtime):
+        async def task():
+            await asyncio.sleep(0.01)
+            return asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(4) as pool:
+            loops = list(pool.map(lambda _: runtime.run(task()), range(8)))
+
+        assert set(loops) == {runtime.loop}
+
+    def test_service_is_built_on_the_runtime_loop(self):
+        built_on = []
+
+        def factory():
+            built_on.append(asyncio.get_running_loop())
+            return make_service()
+
+        runtime = WorkerRuntime(factory).start()
+        runtime.stop()
+
+        assert built_on == [runtime.loop]
+
+    def test_gemini_client_is_opened_at_start(self):
+        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key="test")
+        runtime = WorkerRuntime(lambda: make_service(llm)).start()
+        runtime.stop()
+
+        assert llm.async_client_running is not None
+
+    def test_stop_cancels_pending_tasks_and_closes_the_loop(self, runtime):
+        pending = runtime.submit(asyncio.sleep(60))
+
+        runtime.stop()
+
+        assert pending.cancelled()
+        assert runtime.loop.is_closed()
+
+    def test_worker_process_starts_a_fresh_runtime(self):
+        inherited = Mock()
+        with patch.object(worker_runtime, "_runtime", inherited), \
+                patch.object(worker_runtime.utils, "create_analyzer_service", make_service):
+            worker_runtime.start_runtime()
+            started = worker_runtime.get_runtime()
+            worker_runtime.stop_runtime()
+
+            assert started is not inherited
+            assert isinstance(started, WorkerRuntime)
+            assert started.loop.is_closed()
+
+    @pytest.mark.parametrize("in_workers", [True, False])
+    def test_workers_shard_pages_over_processes_only_if_configured(self, in_workers):
+        with patch.object(worker_runtime.settings, "PDF_PARALLEL_IN_WORKERS", in_workers), \
+                patch.object(worker_runtime, "allow_process_pool") as allow_process_pool:
+            worker_runtime.configure_worker()
+
+        allow_process_pool.assert_called_once_with(in_workers)
+
+    def test_documents_from_several_threads_share_the_limiter(self, llm_analyzer, tmp_path,
+                                                              clause_analysis):
+        in_flight = []
+        running = 0
+
+        async def answer(*args, **kwargs):
+            nonlocal running
+            running += 1
+            in_flight.append(running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return clause_analysis
+
+        llm_analyzer.chain.ainvoke = answer
+        # One request at a time per document, so concurrent requests mean concurrent documents
+        llm_analyzer.pipeline_workers = 1
+        service = AnalyzerService(llm_analyzer, PDFParser())
+        paths = [make_tos_pdf(str(tmp_path / f"tos_{number}.pdf"), pages=4, seed=number)
+                 for number in range(3)]
+        runtime = WorkerRuntime(lambda: service).start()
+
+        async def analyze(path):
+            saved = []
+
+            async def sink(chunk, result):
+                saved.append(result)
+            await service.stream(path, "", sink)
+            return saved
+
+        with ThreadPoolExecutor(3) as pool:
+            results = list(pool.map(lambda path: runtime.run(analyze(path)), paths))
+        runtime.stop()
+
+        assert all(saved for saved in results)
+        # Three documents at once, together held to the process-wide limit
+        assert max(in_flight) == llm_analyzer.limiter.max_concurrent == 2